@@ -0,0 +1,48 @@
+"""
+Compares decklist page metadata extraction with the regex scanner and the full HTML
+parser on the saved decklist pages in benchmarks/fixtures/decklist_pages.
+
+    python -m benchmarks.metadata_extraction --iterations 200
+"""
+
+import argparse
+from pathlib import Path
+from time import perf_counter
+
+from decks.metadata import (
+    extract_decklist_metadata_fast,
+    extract_decklist_metadata_soup,
+)
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "decklist_pages"
+
+
+def time_per_page(extract, html: str, iterations: int) -> float:
+    started_at = perf_counter()
+    for _ in range(iterations):
+        extract(html)
+    return (perf_counter() - started_at) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--iterations", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'page':<28}{'size':>8}{'soup (ms)':>12}{'fast (ms)':>12}{'speedup':>10}")
+    for fixture in sorted(FIXTURES_DIR.glob("*.html")):
+        html = fixture.read_text()
+        fast = extract_decklist_metadata_fast(html)
+        soup = extract_decklist_metadata_soup(html)
+        if fast != soup:
+            raise SystemExit(f"{fixture.name}: extractors disagree, {fast} != {soup}")
+        soup_time = time_per_page(extract_decklist_metadata_soup, html, args.iterations)
+        fast_time = time_per_page(extract_decklist_metadata_fast, html, args.iterations)
+        print(
+            f"{fixture.name:<28}{len(html):>8}{soup_time * 1000:>12.3f}"
+            f"{fast_time * 1000:>12.3f}{soup_time / fast_time:>9.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Checks the player count classifier against the labeled decks in
+benchmarks/fixtures/player_count_decks.json and compares its throughput with the
+original per keyword fuzzywuzzy implementation.
+
+    python -m benchmarks.player_count --repeat 3
+"""
+
+import argparse
+import json
+from pathlib import Path
+from time import perf_counter
+
+from fuzzywuzzy import fuzz
+
+from constants import PlayerCounts
+from decks.constants import PLAYER_COUNT_KEYWORDS
+from decks.player_count import PlayerCountClassifier
+
+FIXTURE = Path(__file__).parent / "fixtures" / "player_count_decks.json"
+
+
+def fuzzywuzzy_player_count(
+    deck_title: str, deck_description: str | None, tags: list[str]
+) -> PlayerCounts:
+    """The original decks.api.determine_player_count, kept as the baseline"""
+    keyword_dict = PLAYER_COUNT_KEYWORDS
+    if "solo" in [tag.lower() for tag in tags]:
+        return PlayerCounts.SOLO
+    elif "multiplayer" in [tag.lower() for tag in tags]:
+        keyword_dict = {2: keyword_dict[2], 4: keyword_dict[4]}
+
+    highest_score = 0
+    num_players = PlayerCounts.UNKNOWN
+    for players, keywords in keyword_dict.items():
+        for keyword in keywords:
+            score = fuzz.partial_ratio(keyword, deck_title.lower())
+            if score > highest_score:
+                highest_score = score
+                num_players = players
+    if highest_score > 60:
+        return {
+            1: PlayerCounts.SOLO,
+            2: PlayerCounts.TWO_PLAYER,
+            4: PlayerCounts.FOUR_PLAYER,
+        }[num_players]
+
+    for players, keywords in keyword_dict.items():
+        for keyword in keywords:
+            score = fuzz.partial_ratio(keyword, deck_description.lower())
+            if score > highest_score:
+                highest_score = score
+                num_players = players
+    if highest_score > 60:
+        return {
+            1: PlayerCounts.SOLO,
+            2: PlayerCounts.TWO_PLAYER,
+            4: PlayerCounts.FOUR_PLAYER,
+        }[num_players]
+    return PlayerCounts.UNKNOWN
+
+
+def decks_per_sec(classify, decks: list[tuple], repeat: int) -> float:
+    started_at = perf_counter()
+    for _ in range(repeat):
+        classify(decks)
+    return len(decks) * repeat / (perf_counter() - started_at)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    labeled_decks = json.loads(FIXTURE.read_text())
+    decks = [
+        (deck["title"], deck["description"], deck["tags"]) for deck in labeled_decks
+    ]
+    labels = [PlayerCounts(deck["player_count"]) for deck in labeled_decks]
+
+    classifier = PlayerCountClassifier()
+    for name, classify in [
+        (
+            "fuzzywuzzy",
+            lambda decks: [fuzzywuzzy_player_count(*deck) for deck in decks],
+        ),
+        ("classifier", classifier.classify_many),
+    ]:
+        mismatches = [
+            (deck[0], label, player_count)
+            for deck, label, player_count in zip(decks, labels, classify(decks))
+            if player_count != label
+        ]
+        if mismatches:
+            raise SystemExit(f"{name} disagrees with the labels: {mismatches[:5]}")
+        print(
+            f"{name:<12}{decks_per_sec(classify, decks, args.repeat):>10.0f} decks/sec"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Records ArkhamDB responses into benchmarks/fixtures/arkhamdb, where the stub server
+replays them instead of making them up.
+
+    python -m benchmarks.record_arkhamdb --start 2023-03-01 --end 2023-03-08 --pages
+"""
+
+import argparse
+import json
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import requests
+
+from benchmarks.stub_arkhamdb import FIXTURES_DIR, fixture_path
+
+ALL_CARDS_PATH = "/api/public/cards/"
+
+
+class Recorder:
+    def __init__(self, base_url: str, fixtures_dir: Path, delay: float):
+        self.base_url = base_url.rstrip("/")
+        self.fixtures_dir = fixtures_dir
+        self.delay = delay
+        self.session = requests.Session()
+
+    def record(self, path: str, params: dict | None = None, empty: str | None = None):
+        """
+        Saves the response to path, or empty if ArkhamDB answered 500 (which it does
+        for dates without decklists). Returns the saved body.
+        """
+        # Spread the requests out, this runs against the real site
+        time.sleep(self.delay)
+        response = self.session.get(f"{self.base_url}{path}", params=params, timeout=60)
+        if response.status_code == 500 and empty is not None:
+            body = empty
+        else:
+            response.raise_for_status()
+            body = response.text
+        recorded = fixture_path(self.fixtures_dir, path)
+        recorded.parent.mkdir(parents=True, exist_ok=True)
+        recorded.write_text(body)
+        return body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--base-url", default="https://arkhamdb.com")
+    parser.add_argument(
+        "--start",
+        type=date.fromisoformat,
+        required=True,
+        help="First date to record the decklists of",
+    )
+    parser.add_argument(
+        "--end",
+        type=date.fromisoformat,
+        required=True,
+        help="Date to stop recording at, not included",
+    )
+    parser.add_argument(
+        "--pages",
+        action="store_true",
+        help="Also record the page of each decklist, where likes and comments are "
+        "scraped from",
+    )
+    parser.add_argument(
+        "--delay", type=float, default=1.0, help="Seconds to wait between requests"
+    )
+    parser.add_argument("--fixtures", type=Path, default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    recorder = Recorder(args.base_url, args.fixtures, args.delay)
+    recorder.record(ALL_CARDS_PATH, params={"_format": "json", "encounter": 0})
+    print(f"Recorded the all cards dump to {args.fixtures}")
+    day = args.start
+    while day < args.end:
+        decklists = json.loads(
+            recorder.record(
+                f"/api/public/decklists/by_date/{day.isoformat()}.json", empty="[]"
+            )
+        )
+        if args.pages:
+            for decklist in decklists:
+                recorder.record(f"/decklist/view/{decklist['id']}")
+        print(f"Recorded {len(decklists)} decklists of {day}")
+        day += timedelta(days=1)
+
+
+if __name__ == "__main__":
+    main()
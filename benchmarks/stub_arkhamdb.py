@@ -0,0 +1,305 @@
+"""
+Local stand-in for the ArkhamDB endpoints used by the fetchers.
+
+Responses recorded by benchmarks.record_arkhamdb are replayed from
+benchmarks/fixtures/arkhamdb, anything that was not recorded is made up.
+
+Run it and point ARKHAMDB_BASE_URL at it to crawl without touching arkhamdb.com:
+
+    python -m benchmarks.stub_arkhamdb --port 8001 --latency 0.05
+    ARKHAMDB_BASE_URL=http://127.0.0.1:8001 python manage.py crawl_decklists --start 2016-09-02 --end 2016-12-01
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from random import Random
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "arkhamdb"
+
+STUB_CARD_CODES = [f"01{number:03d}" for number in range(16, 96)]
+STUB_INVESTIGATORS = [
+    ("01001", "Roland Banks"),
+    ("01002", "Daisy Walker"),
+    ("01003", '"Skids" O\'Toole'),
+    ("01004", "Agnes Baker"),
+    ("01005", "Wendy Adams"),
+]
+# Packs of made up cards after the core set ones, for a dump about the size of the real one
+STUB_EXTRA_PACKS = range(2, 20)
+STUB_TRAITS = [
+    "Item. Tool.",
+    "Ally. Miskatonic.",
+    "Spell.",
+    "Talent.",
+    "Tactic.",
+    "Insight.",
+]
+MAX_DECKS_PER_DAY = 12
+
+DECKLIST_PAGE_TEMPLATE = """<!DOCTYPE html>
+<html><head><title>{name} :: ArkhamDB</title></head>
+<body><div class="main white container">
+<h1 class="decklist-name">{name}</h1>
+<div class="social">
+<span class="social-icons">
+<a id="social-icon-like" class="social-icon-like" title="Like"><span class="fa fa-heart"></span> <span class="num">{likes}</span></a>
+<a id="social-icon-favorite" class="social-icon-favorite" title="Favorite"><span class="fa fa-star"></span> <span class="num">{favorites}</span></a>
+<a id="social-icon-comments" class="social-icon-comments" href="#comment-form" title="Comment"><span class="fa fa-comment"></span> <span class="num">{comments}</span></a>
+</span>
+<a href="/user/profile/{user_id}/stub-user-{user_id}" class="username fg-rogue">stub-user-{user_id}</a>
+</div>
+<div class="description">{description}</div>
+</div></body></html>
+"""
+
+
+def fixture_path(fixtures_dir: Path, url_path: str) -> Path:
+    """Where the recorded response to a request for url_path is kept"""
+    name = url_path.strip("/")
+    if not Path(name).suffix:
+        name += ".json" if name.startswith("api/") else ".html"
+    return fixtures_dir / name
+
+
+def stub_card(code: str) -> dict:
+    rng = Random(code)
+    faction = rng.choice(
+        ["guardian", "seeker", "rogue", "mystic", "survivor", "neutral"]
+    )
+    type_code = rng.choice(["asset", "asset", "event", "skill"])
+    return {
+        "pack_code": f"stub{code[:2]}",
+        "pack_name": f"Stub pack {code[:2]}",
+        "type_code": type_code,
+        "type_name": type_code.title(),
+        "subtype_code": None,
+        "subtype_name": None,
+        "faction_code": faction,
+        "faction_name": faction.title(),
+        "position": int(code[2:]),
+        "exceptional": False,
+        "myriad": False,
+        "code": code,
+        "name": f"Stub card {code}",
+        "real_name": f"Stub card {code}",
+        "subname": None,
+        "cost": None if type_code == "skill" else rng.randint(0, 5),
+        "text": "<b>Fast.</b> Play after you fail a skill test by 2 or more.",
+        "quantity": 2,
+        "skill_willpower": rng.randint(0, 2),
+        "skill_intellect": rng.randint(0, 2),
+        "skill_combat": rng.randint(0, 2),
+        "skill_agility": rng.randint(0, 2),
+        "skill_wild": 0,
+        "xp": rng.choice([0, 0, 0, 1, 2, 3, 4, 5]),
+        "deck_limit": 2,
+        "traits": rng.choice(STUB_TRAITS),
+        "is_unique": False,
+        "permanent": False,
+        "double_sided": False,
+        "octgn_id": None,
+        "url": f"https://arkhamdb.com/card/{code}",
+        "imagesrc": f"/bundles/cards/{code}.png",
+    }
+
+
+def stub_cards() -> list[dict]:
+    """The all cards dump: investigators, then the player cards decks are built from"""
+    investigators = [
+        {"code": code, "name": name, "type_code": "investigator"}
+        for code, name in STUB_INVESTIGATORS
+    ]
+    extra_codes = [
+        f"{pack:02d}{number:03d}"
+        for pack in STUB_EXTRA_PACKS
+        for number in range(1, 80)
+    ]
+    return investigators + [stub_card(code) for code in STUB_CARD_CODES + extra_codes]
+
+
+def stub_decklist(deck_id: int, creation_date: date) -> dict:
+    rng = Random(deck_id)
+    investigator_code, investigator_name = rng.choice(STUB_INVESTIGATORS)
+    slots = {
+        card_code: rng.randint(1, 2)
+        for card_code in rng.sample(STUB_CARD_CODES, rng.randint(15, 25))
+    }
+    timestamp = f"{creation_date.isoformat()}T{rng.randint(0, 23):02d}:00:00+00:00"
+    return {
+        "id": deck_id,
+        "name": f"Stub deck {deck_id} {rng.choice(['solo', 'two-player', 'team', ''])}",
+        "date_creation": timestamp,
+        "date_update": timestamp,
+        "description_md": f"Stub description for deck {deck_id}",
+        "user_id": rng.randint(1, 5000),
+        "investigator_code": investigator_code,
+        "investigator_name": investigator_name,
+        "slots": slots,
+        "sideSlots": {},
+        "ignoreDeckLimitSlots": None,
+        "version": "1.0",
+        "xp": None,
+        "xp_spent": None,
+        "xp_adjustment": None,
+        "exile_string": None,
+        "taboo_id": None,
+        "meta": "",
+        "tags": rng.choice(["", "solo", "multiplayer", "beginner, theme"]),
+        "previous_deck": None,
+        "next_deck": None,
+    }
+
+
+def stub_decklists_by_date(creation_date: date) -> list[dict]:
+    deck_count = Random(creation_date.toordinal()).randint(0, MAX_DECKS_PER_DAY)
+    return [
+        stub_decklist(creation_date.toordinal() * 100 + index, creation_date)
+        for index in range(deck_count)
+    ]
+
+
+def stub_decklist_page(deck_id: int) -> str:
+    rng = Random(deck_id)
+    return DECKLIST_PAGE_TEMPLATE.format(
+        name=f"Stub deck {deck_id}",
+        likes=rng.randint(0, 200),
+        favorites=rng.randint(0, 100),
+        comments=rng.randint(0, 30),
+        user_id=rng.randint(1, 5000),
+        description="<p>Lorem ipsum dolor sit amet.</p>" * 200,
+    )
+
+
+class StubArkhamDBHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    fixtures_dir = FIXTURES_DIR
+
+    routes = [
+        (re.compile(r"^/api/public/cards/?$"), "cards"),
+        (re.compile(r"^/api/public/card/(\d{5})$"), "card"),
+        (
+            re.compile(r"^/api/public/decklists/by_date/(\d{4}-\d{2}-\d{2})\.json$"),
+            "by_date",
+        ),
+        (re.compile(r"^/api/public/decklist/(\d+)\.json$"), "by_id"),
+        (re.compile(r"^/decklist/view/(\d+)"), "decklist_page"),
+    ]
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        path = self.path.split("?", 1)[0]
+        for pattern, route in self.routes:
+            if match := pattern.match(path):
+                return getattr(self, f"_{route}")(path, *match.groups())
+        self._respond(404, "text/plain", "Not found")
+
+    def _recorded(self, path: str) -> str | None:
+        recorded = fixture_path(self.fixtures_dir, path)
+        return recorded.read_text() if recorded.is_file() else None
+
+    def _cards(self, path: str):
+        self._respond(
+            200, "application/json", self._recorded(path) or json.dumps(stub_cards())
+        )
+
+    def _card(self, path: str, code: str):
+        self._respond(
+            200, "application/json", self._recorded(path) or json.dumps(stub_card(code))
+        )
+
+    def _by_date(self, path: str, value: str):
+        if (recorded := self._recorded(path)) is not None:
+            decklists = json.loads(recorded)
+        else:
+            decklists = stub_decklists_by_date(date.fromisoformat(value))
+        # ArkhamDB answers 500 for dates without any decklists
+        if not decklists:
+            return self._respond(500, "application/json", json.dumps({"error": "none"}))
+        self._respond(200, "application/json", json.dumps(decklists))
+
+    def _by_id(self, path: str, value: str):
+        if (recorded := self._recorded(path)) is not None:
+            return self._respond(200, "application/json", recorded)
+        deck_id = int(value)
+        creation_date = date.fromordinal(deck_id // 100)
+        self._respond(
+            200, "application/json", json.dumps(stub_decklist(deck_id, creation_date))
+        )
+
+    def _decklist_page(self, path: str, value: str):
+        page = self._recorded(path) or stub_decklist_page(int(value))
+        # Pages support conditional requests, like a CDN in front of ArkhamDB would
+        etag = f'"{hashlib.sha1(page.encode()).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self._respond(200, "text/html; charset=utf-8", page, {"ETag": etag})
+
+    def _respond(
+        self,
+        status: int,
+        content_type: str,
+        body: str,
+        headers: dict[str, str] | None = None,
+    ):
+        payload = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubArkhamDBServer(ThreadingHTTPServer):
+    # The default backlog of 5 drops connections from concurrent clients
+    request_queue_size = 1024
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8001,
+    latency: float = 0.0,
+    fixtures_dir: Path = FIXTURES_DIR,
+):
+    handler = type(
+        "Handler",
+        (StubArkhamDBHandler,),
+        {"latency": latency, "fixtures_dir": fixtures_dir},
+    )
+    return StubArkhamDBServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds to wait before answering"
+    )
+    parser.add_argument(
+        "--fixtures",
+        type=Path,
+        default=FIXTURES_DIR,
+        help="Directory of recorded responses to replay",
+    )
+    args = parser.parse_args()
+    server = serve(args.host, args.port, args.latency, args.fixtures)
+    print(f"Stub ArkhamDB listening on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
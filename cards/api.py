@@ -1,35 +1,97 @@
-from ninja import Router
+from datetime import date
 
-from cards.arkhamdb import (
-    retrieve_card_info_from_arkhamdb,
-    retrieve_all_card_info_from_arkhamdb,
+from asgiref.sync import sync_to_async
+from ninja import Query, Router
+from ninja.errors import HttpError
+
+from cards.catalogue import aget_cards, card_catalogue
+from cards.schemas import (
+    CardInfoSchema,
+    CardSynergiesSchema,
+    SimilarCardSchema,
 )
-from cards.models import CardInfo
-from cards.schemas import CardInfoSchema
+from decks.analytics import get_card_embeddings, get_synergy_index
+from jobs.queue import enqueue
+from jobs.schemas import JobSchema
 
 router = Router()
 
+# Enough for any deck, with its side deck
+CARD_INFO_BATCH_MAX_IDS = 200
+
+
+@router.get("/card_info", response=list[CardInfoSchema])
+async def card_infos(request, ids: str) -> list[CardInfoSchema]:
+    """
+    The cards with the given comma separated ids, in that order. Cards that are
+    neither catalogued nor on ArkhamDB are left out.
+    """
+    card_ids = [card_id for card_id in ids.split(",") if card_id]
+    if len(card_ids) > CARD_INFO_BATCH_MAX_IDS:
+        raise HttpError(400, f"At most {CARD_INFO_BATCH_MAX_IDS} ids can be requested")
+    cards = await aget_cards(card_ids)
+    return [cards[card_id] for card_id in card_ids if card_id in cards]
+
 
 @router.get("/card_info/{card_id}", response=CardInfoSchema)
-def card_info(request, card_id: str):
-    try:
-        return CardInfo.objects.get(card_id=card_id)
-    except CardInfo.DoesNotExist:
-        card_info = retrieve_card_info_from_arkhamdb(card_id).dict(by_alias=False)
-        card_info.pop("card_id")
-        return CardInfo.objects.create(
-            card_id=card_id,
-            **card_info,
-        )
-
-
-@router.post("/fetch_cards", response=list[CardInfoSchema])
-def fetch_cards(request) -> list[CardInfoSchema]:
-    results = []
-    cards = retrieve_all_card_info_from_arkhamdb()
-    for card_info in cards:
-        card_info = card_info.dict(by_alias=False)
-        card_id = card_info.pop("card_id")
-        card, _ = CardInfo.objects.get_or_create(card_id=card_id, defaults=card_info)
-        results.append(card)
-    return results
+async def card_info(request, card_id: str):
+    cards = await aget_cards([card_id])
+    if card_id not in cards:
+        raise HttpError(404, f"Card {card_id} could not be found")
+    return cards[card_id]
+
+
+@router.post("/fetch_cards", response={202: JobSchema})
+async def fetch_cards(request):
+    """
+    Queues a sync of the card catalogue with ArkhamDB, or returns the one already
+    queued. Poll /jobs/{job_id} for its report.
+    """
+    job, _ = await sync_to_async(enqueue)("fetch_cards")
+    return 202, job
+
+
+@router.get("/{card_id}/synergies", response=CardSynergiesSchema)
+async def card_synergies(
+    request,
+    card_id: str,
+    k: int = Query(10, ge=1, le=100),
+    investigator_name: str | None = None,
+    since: date | None = None,
+    until: date | None = None,
+) -> CardSynergiesSchema:
+    """
+    Cards most often played with card_id, from the index built for the investigator
+    (or all investigators) and the time window by manage.py build_synergy_index.
+    The index counts reprints as their first printing.
+    """
+    printings = await sync_to_async(card_catalogue.printings)([card_id])
+    canonical_card_id = printings[card_id]
+    synergy_index = await sync_to_async(get_synergy_index, thread_sensitive=False)(
+        investigator_name, since, until
+    )
+    if synergy_index is None:
+        raise HttpError(404, "No synergy index has been built for these decks")
+    return CardSynergiesSchema(
+        card_id=card_id,
+        num_decks=synergy_index.num_decks,
+        card_decks=synergy_index.decks_with(canonical_card_id),
+        built_at=synergy_index.built_at,
+        synergies=[
+            synergy._asdict() for synergy in synergy_index.top(canonical_card_id, k)
+        ],
+    )
+
+
+@router.get("/{card_id}/similar", response=list[SimilarCardSchema])
+async def similar_cards(
+    request, card_id: str, k: int = Query(10, ge=1, le=100)
+) -> list[SimilarCardSchema]:
+    """
+    Cards played in the most similar decks to card_id, from the embeddings trained by
+    manage.py train_card_embeddings
+    """
+    card_embeddings = await sync_to_async(get_card_embeddings, thread_sensitive=False)()
+    if card_embeddings is None:
+        raise HttpError(404, "No card embeddings have been trained")
+    return [similar._asdict() for similar in card_embeddings.similar_cards(card_id, k)]
@@ -1,41 +1,56 @@
 from string import Template
 from logging import getLogger
+from typing import Iterator
 
-import requests
+import httpx
+from django.conf import settings
 from requests.exceptions import RequestException
-from pydantic import ValidationError, root_validator, Field
+from pydantic import ValidationError, model_validator, Field
 from ninja import Schema
 
 from exceptions import CardDataRetrievalError
 from constants import Faction, Skill, PlayerCardType
+from miskatonic.arkhamdb import (
+    get_arkhamdb_client,
+    get_async_arkhamdb_client,
+    response_ok,
+)
+from miskatonic.instrumentation import instrumented
+from miskatonic.singleflight import single_flight
+from miskatonic.streaming import iter_json_array
 
 logger = getLogger(__name__)
 
-ARKHAMDB_CARD_INFO_API = Template("https://arkhamdb.com/api/public/card/$card_code")
-ARKHAMDB_ALL_CARDS_API = "https://arkhamdb.com/api/public/cards"
+ARKHAMDB_CARD_INFO_API = Template(
+    f"{settings.ARKHAMDB_BASE_URL}/api/public/card/$card_code"
+)
+ARKHAMDB_ALL_CARDS_API = f"{settings.ARKHAMDB_BASE_URL}/api/public/cards"
+ALL_CARDS_CHUNK_SIZE = 64 * 1024
+PLAYER_CARD_TYPES = {str(card_type) for card_type in PlayerCardType}
 
 
 class ArkhamDBCardInfoResponse(Schema):
+    # ArkhamDB leaves out the fields a card has no value for
     name: str
-    subname: str | None
+    subname: str | None = None
     pack_name: str
     type_name: str
-    subtype_name: str | None
+    subtype_name: str | None = None
     factions: list[Faction]
     exceptional: bool
     myriad: bool
     card_id: str = Field(..., alias="code")
-    cost: int | None
-    text: str | None
-    skills: dict[Skill, int] | None
-    xp: int | None
-    deck_limit: int | None
-    traits: list[str] | None
+    cost: int | None = None
+    text: str | None = None
+    skills: dict[Skill, int] | None = None
+    xp: int | None = None
+    deck_limit: int | None = None
+    traits: list[str] | None = None
     is_unique: bool
     permanent: bool
-    octgn_id: str | None
+    octgn_id: str | None = None
     url: str
-    imagesrc: str | None
+    imagesrc: str | None = None
     restrictions: dict | None = Field(default_factory=dict)
 
     class Config:
@@ -44,7 +59,18 @@ class ArkhamDBCardInfoResponse(Schema):
 
     #     fields = {"value": ""}
 
-    @root_validator(pre=True)
+    @model_validator(mode="wrap")
+    @classmethod
+    def reshape_payload(cls, values, handler):
+        # Runs before ninja wraps the payload in a read only DjangoGetter for the
+        # other validators, so a copy of the plain dict is reshaped here
+        if isinstance(values, dict):
+            values = dict(values)
+            for reshape in (cls.set_skills, cls.set_traits, cls.set_factions):
+                values = reshape(values)
+        return handler(values)
+
+    @classmethod
     def set_skills(cls, values):
         values["skills"] = {}
         logger.debug(f"values: {values}")
@@ -55,7 +81,7 @@ class ArkhamDBCardInfoResponse(Schema):
 
         return values
 
-    @root_validator(pre=True)
+    @classmethod
     def set_traits(cls, values):
         if isinstance((traits := values.get("traits", "")), str) is False:
             raise ValueError(
@@ -66,7 +92,7 @@ class ArkhamDBCardInfoResponse(Schema):
         )
         return values
 
-    @root_validator(pre=True)
+    @classmethod
     def set_factions(cls, values):
         values["factions"] = []
         for faction_field_name in [
@@ -87,33 +113,71 @@ class ArkhamDBCardInfoSchema(Schema):
     pass
 
 
+def _parse_card_info(response) -> ArkhamDBCardInfoResponse:
+    if not response_ok(response):
+        raise CardDataRetrievalError(
+            f"Failed to retrieve card info from API with status code: {response.status_code}"
+        )
+    card_info = response.json()
+    logger.info(f"Response length: {len(card_info)}")
+    try:
+        return ArkhamDBCardInfoResponse(**card_info)
+    except ValidationError as exc:
+        raise CardDataRetrievalError(
+            f"Failed to validate response from card data retrieval API: {card_info}"
+        ) from exc
+
+
+@instrumented()
+@single_flight("card")
 def retrieve_card_info_from_arkhamdb(card_id: str) -> ArkhamDBCardInfoResponse:
     try:
-        response = requests.get(ARKHAMDB_CARD_INFO_API.substitute(card_code=card_id))
+        response = get_arkhamdb_client().get(
+            ARKHAMDB_CARD_INFO_API.substitute(card_code=card_id), endpoint="card"
+        )
     except RequestException as exc:
         raise CardDataRetrievalError(
             f"Failed to retrieve card info from API: {exc}"
         ) from exc
-    if not response.ok:
-        raise CardDataRetrievalError(
-            f"Failed to retrieve card info from API with status code: {response.status_code}"
-        )
-    logger.info(f"Response length: {len(response.json())}")
+    return _parse_card_info(response)
+
+
+@instrumented()
+@single_flight("card")
+async def aretrieve_card_info_from_arkhamdb(card_id: str) -> ArkhamDBCardInfoResponse:
     try:
-        return ArkhamDBCardInfoResponse(**response.json())
-    except ValidationError as exc:
+        response = await get_async_arkhamdb_client().get(
+            ARKHAMDB_CARD_INFO_API.substitute(card_code=card_id), endpoint="card"
+        )
+    except httpx.HTTPError as exc:
         raise CardDataRetrievalError(
-            f"Failed to validate response from card data retrieval API: {response.json()}"
+            f"Failed to retrieve card info from API: {exc!r}"
         ) from exc
+    return _parse_card_info(response)
 
 
-def retrieve_all_card_info_from_arkhamdb() -> list[ArkhamDBCardInfoResponse]:
+def is_player_card(card_info: dict) -> bool:
+    return card_info.get("type_code") in PLAYER_CARD_TYPES or card_info.get(
+        "subtype_code"
+    ) in ("basicweakness", "weakness")
+
+
+def iter_all_card_info_from_arkhamdb() -> Iterator[ArkhamDBCardInfoResponse]:
+    """
+    Streams the player cards of the all cards dump as they are downloaded.
+
+    Non-player cards are dropped before any model is built, so only one card is held
+    in memory at a time and callers can start writing before the download finishes.
+    """
     try:
-        response = requests.get(
-            ARKHAMDB_ALL_CARDS_API, {"_format": "json", "encounter": 0}
+        response = get_arkhamdb_client().get(
+            ARKHAMDB_ALL_CARDS_API,
+            endpoint="cards",
+            params={"_format": "json", "encounter": 0},
+            stream=True,
         )
-        logger.info(f"Response length: {len(response.json())}")
-        if not response.ok:
+        if not response_ok(response):
+            response.close()
             raise CardDataRetrievalError(
                 f"Failed to retrieve card info from API for all cards with status code: {response.status_code}"
             )
@@ -122,37 +186,49 @@ def retrieve_all_card_info_from_arkhamdb() -> list[ArkhamDBCardInfoResponse]:
             "Failed to retrieve card info from API for all cards"
         ) from exc
 
-    results = []
-    player_card_types = list(PlayerCardType)
-    for card_info in response.json():
+    card_count = 0
+    with response:
+        if response.encoding is None:
+            response.encoding = "utf-8"
         try:
-            if card_info.get("type_code") not in player_card_types and card_info.get(
-                "subtype_code"
-            ) not in ("basicweakness", "weakness"):
-                logger.debug(
-                    f"Skipping card {card_info['name']} as it is not a player card"
+            for card_info in iter_json_array(
+                response.iter_content(
+                    chunk_size=ALL_CARDS_CHUNK_SIZE, decode_unicode=True
                 )
-                continue
-
-            try:
-                card = ArkhamDBCardInfoResponse(**card_info)
-                logger.debug(f"Card info: {card}")
-            except ValidationError as exc:
-                logger.exception("Failed to validate card info result")
-                raise CardDataRetrievalError(
-                    f"Failed to validate card info result: {card_info}"
-                ) from exc
-
-            # if card.restrictions:
-            #     logger.debug(f"Skipping card {card.name} as it is restricted")
-            #     continue
-
-            results.append(card)
-        except ValueError:
+            ):
+                if not is_player_card(card_info):
+                    logger.debug(
+                        f"Skipping card {card_info['name']} as it is not a player card"
+                    )
+                    continue
+
+                try:
+                    card = ArkhamDBCardInfoResponse(**card_info)
+                    logger.debug(f"Card info: {card}")
+                except ValidationError as exc:
+                    logger.exception("Failed to validate card info result")
+                    raise CardDataRetrievalError(
+                        f"Failed to validate card info result: {card_info}"
+                    ) from exc
+
+                # if card.restrictions:
+                #     logger.debug(f"Skipping card {card.name} as it is restricted")
+                #     continue
+
+                card_count += 1
+                yield card
+        except RequestException as exc:
+            raise CardDataRetrievalError(
+                "Failed to download card info from API for all cards"
+            ) from exc
+        except ValueError as exc:
             logger.exception("Failed to parse card info result")
-            raise
-        except Exception as exc:
-            logger.exception("Unexpected error while parsing card info")
-            raise Exception from exc
-    logger.info(f"Retrieved {len(results)} cards from ArkhamDB")
-    return results
+            raise CardDataRetrievalError(
+                f"Failed to parse card info from API for all cards: {exc}"
+            ) from exc
+    logger.info(f"Retrieved {card_count} cards from ArkhamDB")
+
+
+@instrumented()
+def retrieve_all_card_info_from_arkhamdb() -> list[ArkhamDBCardInfoResponse]:
+    return list(iter_all_card_info_from_arkhamdb())
@@ -0,0 +1,148 @@
+import asyncio
+from logging import getLogger
+from threading import Lock
+from time import monotonic
+from typing import Iterable
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, Max
+
+from cards.arkhamdb import aretrieve_card_info_from_arkhamdb
+from cards.models import CardInfo
+from cards.sync import (
+    CARD_UPDATE_FIELDS,
+    card_payload_hash,
+    update_canonical_card_ids,
+)
+from decks.summary import rebuild_deck_summaries, stale_decklists
+from exceptions import CardDataRetrievalError
+
+logger = getLogger(__name__)
+
+
+class CardCatalogue:
+    """
+    Every CardInfo row held in memory. There are only a couple of thousand cards and
+    they rarely change, so lookups cost no queries.
+
+    The table's row count and latest modified time are checked at most every
+    CARD_CATALOGUE_CHECK_SECONDS, and the whole catalogue is reloaded when either
+    changed, e.g. after a sync in the job worker.
+
+    Reprints are looked up here too, so treating them as one card costs no queries.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._cards: dict[str, CardInfo] = {}
+        # Every printing of a card, by canonical card id
+        self._printings: dict[str, list[str]] = {}
+        self._version: tuple | None = None
+        self._checked_at: float | None = None
+
+    def get_many(self, card_ids: Iterable[str]) -> dict[str, CardInfo]:
+        """The catalogued cards among card_ids, by id"""
+        self.refresh()
+        with self._lock:
+            return {
+                card_id: self._cards[card_id]
+                for card_id in card_ids
+                if card_id in self._cards
+            }
+
+    def printings(self, card_ids: Iterable[str]) -> dict[str, str]:
+        """
+        Every printing of the given cards (the cards themselves included), mapped to
+        the canonical card id it shares with its reprints. Unknown ids map to
+        themselves.
+        """
+        self.refresh()
+        with self._lock:
+            printings = {}
+            for card_id in card_ids:
+                card = self._cards.get(card_id)
+                canonical_card_id = (card and card.canonical_card_id) or card_id
+                printings[card_id] = canonical_card_id
+                for printing in self._printings.get(canonical_card_id, []):
+                    printings[printing] = canonical_card_id
+            return printings
+
+    def invalidate(self) -> None:
+        """Checks the table again on the next lookup"""
+        with self._lock:
+            self._checked_at = None
+
+    def refresh(self) -> None:
+        with self._lock:
+            if (
+                self._checked_at is not None
+                and monotonic() - self._checked_at
+                < settings.CARD_CATALOGUE_CHECK_SECONDS
+            ):
+                return
+            version = tuple(
+                CardInfo.objects.aggregate(
+                    count=Count("card_id"), modified=Max("modified")
+                ).values()
+            )
+            if version != self._version:
+                self._cards = {card.card_id: card for card in CardInfo.objects.all()}
+                self._printings = {}
+                for card in self._cards.values():
+                    self._printings.setdefault(
+                        card.canonical_card_id or card.card_id, []
+                    ).append(card.card_id)
+                self._version = version
+                logger.info(f"Loaded {len(self._cards)} cards into the catalogue")
+            self._checked_at = monotonic()
+
+
+card_catalogue = CardCatalogue()
+
+
+async def aget_cards(card_ids: list[str]) -> dict[str, CardInfo]:
+    """
+    Cards by id, from the catalogue. Cards that aren't in it yet are fetched from
+    ArkhamDB concurrently and saved, ids ArkhamDB doesn't know are left out.
+    Those that are reprints are pointed at their first printing straight away, and
+    the deck summaries this made stale are rebuilt.
+    """
+    cards = await sync_to_async(card_catalogue.get_many)(card_ids)
+    missing = [card_id for card_id in dict.fromkeys(card_ids) if card_id not in cards]
+    if not missing:
+        return cards
+
+    retrieved = await asyncio.gather(
+        *(aretrieve_card_info_from_arkhamdb(card_id) for card_id in missing),
+        return_exceptions=True,
+    )
+    new_cards = []
+    for card_id, card in zip(missing, retrieved):
+        if isinstance(card, CardDataRetrievalError):
+            logger.warning(f"Could not retrieve card {card_id}: {card}")
+            continue
+        if isinstance(card, BaseException):
+            raise card
+        card_info = card.dict(by_alias=False)
+        new_cards.append(
+            CardInfo(payload_hash=card_payload_hash(card_info), **card_info)
+        )
+    if new_cards:
+        # Another request (or a sync) may have saved some of them in the meantime
+        await CardInfo.objects.abulk_create(
+            new_cards,
+            update_conflicts=True,
+            unique_fields=["card_id"],
+            update_fields=CARD_UPDATE_FIELDS,
+        )
+        await sync_to_async(update_canonical_card_ids)()
+        # Pointing a card at a new first printing marks the decks holding it stale
+        await sync_to_async(rebuild_deck_summaries)(stale_decklists())
+        card_catalogue.invalidate()
+        cards.update(
+            await sync_to_async(card_catalogue.get_many)(
+                [card.card_id for card in new_cards]
+            )
+        )
+    return cards
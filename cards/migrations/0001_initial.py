@@ -0,0 +1,88 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:25
+
+import django.contrib.postgres.fields
+import django_extensions.db.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="CardInfo",
+            fields=[
+                (
+                    "created",
+                    django_extensions.db.fields.CreationDateTimeField(
+                        auto_now_add=True, verbose_name="created"
+                    ),
+                ),
+                (
+                    "modified",
+                    django_extensions.db.fields.ModificationDateTimeField(
+                        auto_now=True, verbose_name="modified"
+                    ),
+                ),
+                ("name", models.CharField(max_length=64)),
+                ("subname", models.CharField(blank=True, max_length=64, null=True)),
+                ("pack_name", models.CharField(max_length=64)),
+                ("type_name", models.CharField(max_length=64)),
+                (
+                    "subtype_name",
+                    models.CharField(blank=True, max_length=64, null=True),
+                ),
+                (
+                    "factions",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.CharField(
+                            choices=[
+                                ("MYTHOS", "Mythos"),
+                                ("ROGUE", "Rogue"),
+                                ("SEEKER", "Seeker"),
+                                ("MYSTIC", "Mystic"),
+                                ("SURVIVOR", "Survivor"),
+                                ("GUARDIAN", "Guardian"),
+                                ("NEUTRAL", "Neutral"),
+                            ],
+                            max_length=64,
+                        ),
+                        default=list,
+                        size=None,
+                    ),
+                ),
+                ("exceptional", models.BooleanField()),
+                ("myriad", models.BooleanField()),
+                (
+                    "card_id",
+                    models.CharField(max_length=32, primary_key=True, serialize=False),
+                ),
+                ("cost", models.IntegerField(blank=True, null=True)),
+                ("text", models.TextField(blank=True, max_length=1024, null=True)),
+                ("skills", models.JSONField(default=dict)),
+                ("xp", models.IntegerField(blank=True, null=True)),
+                ("deck_limit", models.IntegerField(blank=True, null=True)),
+                (
+                    "traits",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.CharField(max_length=64),
+                        default=list,
+                        size=None,
+                    ),
+                ),
+                ("is_unique", models.BooleanField()),
+                ("permanent", models.BooleanField()),
+                ("octgn_id", models.CharField(blank=True, max_length=64, null=True)),
+                ("url", models.CharField(max_length=256)),
+                ("imagesrc", models.CharField(blank=True, max_length=256, null=True)),
+                ("restrictions", models.JSONField(default=dict)),
+            ],
+            options={
+                "get_latest_by": "modified",
+                "abstract": False,
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cards", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cardinfo",
+            name="payload_hash",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:26
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently so the table stays writable, which can't be done
+    # inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("cards", "0002_cardinfo_payload_hash"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="cardinfo",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["factions"], name="cardinfo_factions_gin_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="cardinfo",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["traits"], name="cardinfo_traits_gin_idx"
+            ),
+        ),
+    ]
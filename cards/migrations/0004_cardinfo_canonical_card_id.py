@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:08
+
+from django.db import migrations, models
+
+from cards.sync import canonical_card_ids
+
+
+def point_reprints_at_first_printings(apps, schema_editor):
+    CardInfo = apps.get_model("cards", "CardInfo")
+    cards = list(CardInfo.objects.only("card_id", "name", "subname", "xp"))
+    canonical = canonical_card_ids(
+        (card.card_id, card.name, card.subname, card.xp) for card in cards
+    )
+    for card in cards:
+        card.canonical_card_id = canonical[card.card_id]
+    CardInfo.objects.bulk_update(cards, ["canonical_card_id"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cards", "0003_cardinfo_array_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cardinfo",
+            name="canonical_card_id",
+            field=models.CharField(blank=True, max_length=32, null=True),
+        ),
+        migrations.RunPython(
+            point_reprints_at_first_printings, migrations.RunPython.noop
+        ),
+    ]
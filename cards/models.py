@@ -1,4 +1,5 @@
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 
 from django_extensions.db.models import TimeStampedModel
@@ -50,3 +51,13 @@ class CardInfo(TimeStampedModel):
     url = models.CharField(blank=False, null=False, max_length=256)
     imagesrc = models.CharField(blank=True, null=True, max_length=256)
     restrictions = models.JSONField(default=dict, blank=False, null=False)
+    # The card this is a reprint of (itself if it isn't one), see cards.sync
+    canonical_card_id = models.CharField(blank=True, null=True, max_length=32)
+    # Hash of the normalized ArkhamDB payload the row was last synced from
+    payload_hash = models.CharField(blank=True, null=True, max_length=64)
+
+    class Meta(TimeStampedModel.Meta):
+        indexes = [
+            GinIndex(fields=["factions"], name="cardinfo_factions_gin_idx"),
+            GinIndex(fields=["traits"], name="cardinfo_traits_gin_idx"),
+        ]
@@ -1,9 +1,37 @@
-from ninja import ModelSchema
+from ninja import ModelSchema, Schema
 
 from cards.models import CardInfo
 
 
 class CardInfoSchema(ModelSchema):
-    class Config:
+    class Meta:
         model = CardInfo
-        model_fields = "__all__"
+        fields = "__all__"
+
+
+class CardSyncReportSchema(Schema):
+    inserted: int
+    updated: int
+    unchanged: int
+
+
+class CardSynergySchema(Schema):
+    card_id: str
+    decks: int
+    lift: float
+    pmi: float
+
+
+class CardSynergiesSchema(Schema):
+    card_id: str
+    # Decks the index was built from, and how many of them include the card
+    num_decks: int
+    card_decks: int
+    built_at: str
+    synergies: list[CardSynergySchema]
+
+
+class SimilarCardSchema(Schema):
+    card_id: str
+    # Cosine similarity of the card embeddings, from -1 to 1
+    similarity: float
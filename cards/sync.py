@@ -0,0 +1,118 @@
+import hashlib
+import json
+from itertools import islice
+from logging import getLogger
+from typing import Any, Callable, Iterable
+
+from django.db import transaction
+from django.utils import timezone
+
+from cards.arkhamdb import ArkhamDBCardInfoResponse
+from cards.models import CardInfo
+from cards.schemas import CardSyncReportSchema
+
+logger = getLogger(__name__)
+
+SYNC_BATCH_SIZE = 500
+
+CARD_UPDATE_FIELDS = [
+    field.name
+    for field in CardInfo._meta.concrete_fields
+    if field.name not in ("card_id", "created", "canonical_card_id")
+]
+
+
+def card_payload_hash(card_info: dict) -> str:
+    """Stable hash of a card's normalized payload, used to detect upstream changes"""
+    normalized = json.dumps(card_info, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def canonical_card_ids(
+    cards: Iterable[tuple[str, str, str | None, int | None]],
+) -> dict[str, str]:
+    """
+    Maps the card_id of each (card_id, name, subname, xp) to the card it's a reprint
+    of: the lowest card_id with the same name, subname and XP, i.e. the first printing
+    """
+    first_printings = {}
+    canonical = {}
+    for card_id, *identity in sorted(cards):
+        canonical[card_id] = first_printings.setdefault(tuple(identity), card_id)
+    return canonical
+
+
+def update_canonical_card_ids() -> int:
+    """Points every card at its first printing, returns the number that changed"""
+    cards = list(
+        CardInfo.objects.only("card_id", "name", "subname", "xp", "canonical_card_id")
+    )
+    canonical = canonical_card_ids(
+        (card.card_id, card.name, card.subname, card.xp) for card in cards
+    )
+    changed = []
+    for card in cards:
+        if card.canonical_card_id != canonical[card.card_id]:
+            card.canonical_card_id = canonical[card.card_id]
+            # Bumped so card catalogues notice and reload
+            card.modified = timezone.now()
+            changed.append(card)
+    CardInfo.objects.bulk_update(
+        changed, ["canonical_card_id", "modified"], batch_size=SYNC_BATCH_SIZE
+    )
+    return len(changed)
+
+
+def sync_cards(
+    cards: Iterable[ArkhamDBCardInfoResponse],
+    on_batch: Callable[[CardSyncReportSchema], Any] | None = None,
+) -> CardSyncReportSchema:
+    """
+    Brings the card catalogue in line with the given cards.
+
+    Stored hashes are read with a single query, and only new or changed cards are
+    written, in batches as the cards arrive. A sync where nothing changed writes
+    nothing. on_batch is called with the report so far after each batch.
+
+    Reprints are then pointed at their first printing, see update_canonical_card_ids().
+    """
+    stored_hashes = dict(CardInfo.objects.values_list("card_id", "payload_hash"))
+    report = CardSyncReportSchema(inserted=0, updated=0, unchanged=0)
+
+    cards = iter(cards)
+    while batch := list(islice(cards, SYNC_BATCH_SIZE)):
+        changed_cards = []
+        for card in batch:
+            card_info = card.dict(by_alias=False)
+            payload_hash = card_payload_hash(card_info)
+            stored_hash = stored_hashes.get(card.card_id, False)
+            if stored_hash == payload_hash:
+                report.unchanged += 1
+                continue
+            if stored_hash is False:
+                report.inserted += 1
+            else:
+                report.updated += 1
+            stored_hashes[card.card_id] = payload_hash
+            changed_cards.append(CardInfo(payload_hash=payload_hash, **card_info))
+
+        if changed_cards:
+            with transaction.atomic():
+                CardInfo.objects.bulk_create(
+                    changed_cards,
+                    update_conflicts=True,
+                    unique_fields=["card_id"],
+                    update_fields=CARD_UPDATE_FIELDS,
+                )
+        if on_batch:
+            on_batch(report)
+
+    if report.inserted or report.updated:
+        reprints = update_canonical_card_ids()
+        logger.info(f"Updated the canonical card of {reprints} cards")
+
+    logger.info(
+        f"Synced card catalogue: {report.inserted} inserted, {report.updated} updated, "
+        f"{report.unchanged} unchanged"
+    )
+    return report
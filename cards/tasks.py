@@ -0,0 +1,18 @@
+from cards.arkhamdb import iter_all_card_info_from_arkhamdb
+from cards.sync import sync_cards
+from decks.summary import rebuild_deck_summaries, stale_decklists
+from jobs.queue import JobContext
+
+
+def fetch_cards(job: JobContext) -> dict:
+    """
+    Syncs the card catalogue with ArkhamDB's dump of every card, then rebuilds the
+    summaries of the decks whose cards changed
+    """
+    report = sync_cards(
+        iter_all_card_info_from_arkhamdb(),
+        on_batch=lambda report: job.progress(**report.dict()),
+    )
+    if report.inserted or report.updated:
+        rebuild_deck_summaries(stale_decklists())
+    return report.dict()
@@ -1 +1,300 @@
-# Create your tests here.
+from datetime import date
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.test import SimpleTestCase, TestCase
+from pydantic import ValidationError
+
+from cards.arkhamdb import ArkhamDBCardInfoResponse
+from cards.catalogue import CardCatalogue, aget_cards
+from cards.models import CardInfo
+from cards.sync import canonical_card_ids, update_canonical_card_ids
+from cards.tasks import fetch_cards
+from constants import Faction, Skill
+from decks.models import DeckCard, DeckList
+from decks.summary import rebuild_deck_summaries, stale_decklists
+
+# Shaped like ArkhamDB's card API responses, which leave out the keys without a value
+MILAN_CHRISTOPHER = {
+    "pack_code": "core",
+    "pack_name": "Core Set",
+    "type_code": "asset",
+    "type_name": "Asset",
+    "faction_code": "seeker",
+    "faction_name": "Seeker",
+    "position": 33,
+    "exceptional": False,
+    "myriad": False,
+    "code": "01033",
+    "name": "Dr. Milan Christopher",
+    "real_name": "Dr. Milan Christopher",
+    "subname": "Professor of Entomology",
+    "cost": 4,
+    "text": "You get +1 [intellect].\n[reaction] After you successfully investigate: "
+    "Gain 1 resource.",
+    "quantity": 1,
+    "skill_intellect": 1,
+    "xp": 0,
+    "health": 1,
+    "sanity": 2,
+    "deck_limit": 2,
+    "slot": "Ally",
+    "traits": "Ally. Miskatonic.",
+    "is_unique": True,
+    "permanent": False,
+    "double_sided": False,
+    "octgn_id": "2fa1ba9e-0e71-4d5b-8c46-4c79fb1e5a76",
+    "url": "https://arkhamdb.com/card/01033",
+    "imagesrc": "/bundles/cards/01033.png",
+}
+UNEXPECTED_COURAGE = {
+    "pack_code": "core",
+    "pack_name": "Core Set",
+    "type_code": "skill",
+    "type_name": "Skill",
+    "faction_code": "neutral",
+    "faction_name": "Neutral",
+    "position": 93,
+    "exceptional": False,
+    "myriad": False,
+    "code": "01093",
+    "name": "Unexpected Courage",
+    "real_name": "Unexpected Courage",
+    "text": "Max 1 committed per skill test.",
+    "quantity": 2,
+    "skill_wild": 2,
+    "xp": 0,
+    "deck_limit": 2,
+    "traits": "Innate.",
+    "is_unique": False,
+    "permanent": False,
+    "double_sided": False,
+    "url": "https://arkhamdb.com/card/01093",
+    "imagesrc": "/bundles/cards/01093.png",
+}
+
+
+def card_payload(code: str, name: str = "Machete", **fields) -> dict:
+    """A player card as ArkhamDB's API returns it"""
+    return {
+        "pack_code": "core",
+        "pack_name": "Core Set",
+        "type_code": "asset",
+        "type_name": "Asset",
+        "subtype_code": None,
+        "subtype_name": None,
+        "faction_code": "guardian",
+        "faction_name": "Guardian",
+        "position": 20,
+        "exceptional": False,
+        "myriad": False,
+        "code": code,
+        "name": name,
+        "real_name": name,
+        "subname": None,
+        "cost": 3,
+        "text": "[action]: <b>Fight.</b> You get +1 [combat] for this attack.",
+        "quantity": 2,
+        "skill_combat": 1,
+        "xp": 0,
+        "deck_limit": 2,
+        "slot": "Hand",
+        "traits": "Item. Weapon. Melee.",
+        "is_unique": False,
+        "permanent": False,
+        "double_sided": False,
+        "octgn_id": None,
+        "url": f"https://arkhamdb.com/card/{code}",
+        "imagesrc": f"/bundles/cards/{code}.png",
+        **fields,
+    }
+
+
+def create_card(card_id: str, name: str = "Machete", **fields) -> CardInfo:
+    return CardInfo.objects.create(
+        **{
+            "card_id": card_id,
+            "name": name,
+            "pack_name": "Core Set",
+            "type_name": "Asset",
+            "factions": ["guardian"],
+            "exceptional": False,
+            "myriad": False,
+            "xp": 0,
+            "skills": {},
+            "traits": [],
+            "is_unique": False,
+            "permanent": False,
+            "url": f"https://arkhamdb.com/card/{card_id}",
+            **fields,
+        }
+    )
+
+
+def create_deck(deck_id: int, cards: dict[str, int], **fields) -> DeckList:
+    deck = DeckList.objects.create(
+        **{
+            "deck_id": deck_id,
+            "deck_name": f"Deck {deck_id}",
+            "arkhamdb_creation_date": date(2020, 1, 1),
+            "arkhamdb_update_date": date(2020, 1, 1),
+            "description": "",
+            "user_id": 1,
+            "investigator_code": "01001",
+            "investigator_name": "Roland Banks",
+            **fields,
+        }
+    )
+    DeckCard.objects.bulk_create(
+        DeckCard(deck=deck, card_data_id=card_id, quantity=quantity)
+        for card_id, quantity in cards.items()
+    )
+    return deck
+
+
+class ArkhamDBCardInfoResponseTests(SimpleTestCase):
+    def test_parses_a_card_payload(self):
+        card = ArkhamDBCardInfoResponse(**MILAN_CHRISTOPHER)
+
+        self.assertEqual(card.card_id, "01033")
+        self.assertEqual(card.name, "Dr. Milan Christopher")
+        self.assertEqual(card.subname, "Professor of Entomology")
+        self.assertEqual(card.cost, 4)
+        self.assertEqual(card.factions, [Faction.SEEKER])
+        self.assertEqual(
+            card.skills,
+            {
+                Skill.INTELLECT: 1,
+                Skill.AGILITY: 0,
+                Skill.WILLPOWER: 0,
+                Skill.COMBAT: 0,
+                Skill.WILD: 0,
+            },
+        )
+        self.assertEqual(card.traits, ["ally", "miskatonic"])
+        self.assertTrue(card.is_unique)
+        self.assertEqual(card.restrictions, {})
+        self.assertNotIn("skills", MILAN_CHRISTOPHER)
+
+    def test_parses_a_card_without_optional_fields(self):
+        card = ArkhamDBCardInfoResponse(**UNEXPECTED_COURAGE)
+
+        self.assertIsNone(card.subname)
+        self.assertIsNone(card.subtype_name)
+        self.assertIsNone(card.cost)
+        self.assertIsNone(card.octgn_id)
+        self.assertEqual(card.skills[Skill.WILD], 2)
+        self.assertEqual(card.factions, [Faction.NEUTRAL])
+        self.assertEqual(card.traits, ["innate"])
+
+    def test_parses_every_faction_of_a_multiclass_card(self):
+        card = ArkhamDBCardInfoResponse(
+            **card_payload("01020", faction2_code="mystic", traits="")
+        )
+
+        self.assertEqual(card.factions, [Faction.GUARDIAN, Faction.MYSTIC])
+        self.assertEqual(card.traits, [])
+
+    def test_rejects_encounter_cards_and_malformed_traits(self):
+        for payload in (
+            card_payload("01020", faction_code="mythos"),
+            card_payload("01020", traits=["Item", "Weapon"]),
+        ):
+            with self.assertRaises(ValidationError):
+                ArkhamDBCardInfoResponse(**payload)
+
+
+class SummaryRefreshTests(TestCase):
+    def _fetch_cards(self, *payloads: dict) -> dict:
+        cards = [ArkhamDBCardInfoResponse(**payload) for payload in payloads]
+        with mock.patch(
+            "cards.tasks.iter_all_card_info_from_arkhamdb", return_value=iter(cards)
+        ):
+            return fetch_cards(mock.Mock())
+
+    def test_fetch_cards_rebuilds_the_summaries_of_decks_whose_cards_changed(self):
+        self._fetch_cards(card_payload("01020"), card_payload("01021", "Guard Dog"))
+        deck = create_deck(1, {"01020": 2, "01021": 1})
+        rebuild_deck_summaries()
+
+        report = self._fetch_cards(
+            card_payload("01020", xp=2), card_payload("01021", "Guard Dog")
+        )
+
+        deck.summary.refresh_from_db()
+        self.assertEqual(report, {"inserted": 0, "updated": 1, "unchanged": 1})
+        self.assertEqual(deck.summary.total_xp, 4)
+        self.assertEqual(deck.summary.upgraded_count, 2)
+        self.assertFalse(stale_decklists().exists())
+
+    async def test_aget_cards_rebuilds_the_summaries_its_reprints_made_stale(self):
+        await sync_to_async(self._fetch_cards)(card_payload("02020"))
+        await sync_to_async(create_deck)(1, {"02020": 2})
+        await sync_to_async(rebuild_deck_summaries)()
+
+        async def retrieve(card_id):
+            return ArkhamDBCardInfoResponse(**card_payload(card_id))
+
+        with mock.patch(
+            "cards.catalogue.aretrieve_card_info_from_arkhamdb", side_effect=retrieve
+        ):
+            cards = await aget_cards(["01020"])
+
+        self.assertEqual(list(cards), ["01020"])
+        self.assertFalse(await stale_decklists().aexists())
+
+
+class ReprintTests(TestCase):
+    def test_reprints_resolve_to_the_lowest_card_id(self):
+        canonical = canonical_card_ids(
+            [
+                ("60120", "Machete", None, 0),
+                ("01020", "Machete", None, 0),
+                ("02020", "Machete", None, 0),
+                ("01033", "Dr. Milan Christopher", "Professor of Entomology", 0),
+                ("01034", "Dr. Milan Christopher", None, 0),
+            ]
+        )
+
+        self.assertEqual(
+            canonical,
+            {
+                "01020": "01020",
+                "02020": "01020",
+                "60120": "01020",
+                "01033": "01033",
+                "01034": "01034",
+            },
+        )
+
+    def test_upgrades_are_not_reprints(self):
+        canonical = canonical_card_ids(
+            [
+                ("01020", "Machete", None, 0),
+                ("03020", "Machete", None, 2),
+                ("60120", "Machete", None, 2),
+            ]
+        )
+
+        self.assertEqual(
+            canonical, {"01020": "01020", "03020": "03020", "60120": "03020"}
+        )
+
+    def test_printings_maps_every_printing_to_the_canonical_card_id(self):
+        for card_id in ("01020", "02020", "60120"):
+            create_card(card_id)
+        create_card("03020", xp=2)
+        update_canonical_card_ids()
+
+        printings = CardCatalogue().printings(["02020", "03020", "99999"])
+
+        self.assertEqual(
+            printings,
+            {
+                "01020": "01020",
+                "02020": "01020",
+                "60120": "01020",
+                "03020": "03020",
+                "99999": "99999",
+            },
+        )
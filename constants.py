@@ -43,3 +43,16 @@ class PlayerCounts(StrEnum):
     FOUR_PLAYER: str = "FOUR-PLAYER"
     MULTIPLAYER: str = "MULTIPLAYER"
     UNKNOWN: str = "UNKNOWN"
+
+
+class CrawlStatus(StrEnum):
+    COMPLETE: str = "COMPLETE"
+    FAILED: str = "FAILED"
+
+
+class JobStatus(StrEnum):
+    QUEUED: str = "QUEUED"
+    RUNNING: str = "RUNNING"
+    SUCCEEDED: str = "SUCCEEDED"
+    FAILED: str = "FAILED"
+    CANCELLED: str = "CANCELLED"
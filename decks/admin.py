@@ -1,7 +1,8 @@
 from django.contrib import admin
 
-from decks.models import DeckList, DeckCard
+from decks.models import DeckList, DeckCard, DecklistCrawlCheckpoint
 
 # Register your models here.
 admin.site.register(DeckList)
 admin.site.register(DeckCard)
+admin.site.register(DecklistCrawlCheckpoint)
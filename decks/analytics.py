@@ -0,0 +1,40 @@
+"""
+Lazy access to the in-memory deck analytics: the deck/card matrix, card synergy
+indexes and card embeddings.
+
+numpy, scipy, gensim and pyarrow take a while to import and most requests, jobs and
+commands never need them. So the API reaches decks.matrix, decks.synergy and
+decks.embeddings through the functions here, which import them on first use, and
+those modules and decks.corpus import scipy, gensim and pyarrow inside the functions
+that need them rather than at module level.
+"""
+
+from datetime import date
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from decks.embeddings import CardEmbeddings
+    from decks.matrix import DeckCardMatrix
+    from decks.synergy import SynergyIndex
+
+
+def get_deck_card_matrix() -> "DeckCardMatrix | None":
+    from decks.matrix import get_deck_card_matrix
+
+    return get_deck_card_matrix()
+
+
+def get_synergy_index(
+    investigator_name: str | None = None,
+    since: date | None = None,
+    until: date | None = None,
+) -> "SynergyIndex | None":
+    from decks.synergy import get_synergy_index
+
+    return get_synergy_index(investigator_name, since, until)
+
+
+def get_card_embeddings() -> "CardEmbeddings | None":
+    from decks.embeddings import get_card_embeddings
+
+    return get_card_embeddings()
@@ -1,241 +1,256 @@
-import logging
+import asyncio
 
-from django.db.models import Sum, F
-from ninja import Router
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.http import HttpResponse
+from ninja import Query, Router
+from ninja.errors import HttpError
 
 from constants import PlayerCounts
+from decks.analytics import get_card_embeddings, get_deck_card_matrix
+from decks.breakdown import build_decklist_breakdown
 from decks.constants import FIRST_ARKHAMDB_DECKLIST_DATE
-from decks.models import DeckList, DeckCard, CardInfo
+from decks.models import DeckList, DeckCard, DeckSummary
+from decks.pagination import NEXT_CURSOR_HEADER, paginate_deck_ids
+from decks.player_count import player_count_classifier
+from decks.summary import card_stats, save_deck_summaries, summarize_cards
 from decks.schemas import (
     DeckListBreakdownSchema,
     DecklistsRequestSchema,
+    DecksContainingRequestSchema,
+    SimilarDeckSchema,
 )
-from fuzzywuzzy import fuzz
+from jobs.queue import enqueue
+from jobs.schemas import JobSchema
+from miskatonic.instrumentation import instrumented
 
 router = Router()
 
-from datetime import date, timedelta, datetime
+from datetime import date
 
 from decks.arkhamdb import (
-    retrieve_arkhamdb_decklists_by_date,
     retrieve_arkhamdb_decklist_metadata,
+    aretrieve_arkhamdb_decklist_metadata,
+    ArkhamDBDecklistMetaData,
     ArkhamDBDecklistResponse,
-    retrieve_arkhamdb_decklist_by_id,
+    aretrieve_arkhamdb_decklist_by_id,
 )
 
-# Download NLTK resources
-import nltk
-
-nltk.download("punkt")
-nltk.download("stopwords")
-
 
+@instrumented()
 def determine_player_count(
     deck_title: str, deck_description: str | None, tags: list[str]
 ) -> PlayerCounts:
-    keyword_dict = {
-        1: [
-            "solo",
-            "single",
-            "single-player",
-            "alone",
-            "one player",
-            "1 player",
-            "1-player",
-            "one-player",
-            "single player",
-        ],
-        2: [
-            "two-handed",
-            "two handed",
-            "2 handed",
-            "2-handed",
-            "duo",
-            "pair",
-            "2 players",
-            "two players",
-            "2-player",
-            "two-player",
-            "partner",
-        ],
-        4: [
-            "four players",
-            "4 players",
-            "4 player",
-            "four player",
-            "4-player",
-            "four-player",
-            "group",
-            "team",
-            "quad",
-        ],
-    }
-    # Check the tags first
-    if "solo" in [tag.lower() for tag in tags]:
-        return PlayerCounts.SOLO
-    elif "multiplayer" in [tag.lower() for tag in tags]:
-        keyword_dict = {  # Restrict to multiplayer options
-            2: keyword_dict[2],
-            4: keyword_dict[4],
-        }
-
-    highest_score = 0
-    num_players = PlayerCounts.UNKNOWN
-
-    # Check the deck title
-    for players, keywords in keyword_dict.items():
-        for keyword in keywords:
-            score = fuzz.partial_ratio(keyword, deck_title.lower())
-            if score > highest_score:
-                highest_score = score
-                num_players = players
-
-    # If the highest score in the title is convincing enough, return it
-    if highest_score > 60:
-        if num_players == 1:
-            return PlayerCounts.SOLO
-        elif num_players == 2:
-            return PlayerCounts.TWO_PLAYER
-        elif num_players == 4:
-            return PlayerCounts.FOUR_PLAYER
-
-    # Check the deck description
-    for players, keywords in keyword_dict.items():
-        for keyword in keywords:
-            score = fuzz.partial_ratio(keyword, deck_description.lower())
-            if score > highest_score:
-                highest_score = score
-                num_players = players
-
-    if highest_score > 60:
-        if num_players == 1:
-            return PlayerCounts.SOLO
-        elif num_players == 2:
-            return PlayerCounts.TWO_PLAYER
-        elif num_players == 4:
-            return PlayerCounts.FOUR_PLAYER
-    else:
-        return PlayerCounts.UNKNOWN
+    return player_count_classifier.classify(deck_title, deck_description, tags)
+
+
+def _require_deck_card_matrix():
+    if not settings.DECK_CARD_MATRIX_ENABLED:
+        raise HttpError(404, "The deck/card matrix is disabled")
+    if (matrix := get_deck_card_matrix()) is None:
+        raise HttpError(503, "The deck/card matrix is still loading")
+    return matrix
 
 
 def determine_deck_campaign_standalone():
     pass
 
 
-def save_decklist_info(decklist: ArkhamDBDecklistResponse):
-    deck_info = decklist.dict(by_alias=False)
-    logging.error(deck_info)
-    deck_id = deck_info.pop("deck_id")
-    deck, _ = DeckList.objects.get_or_create(deck_id=deck_id, defaults=deck_info)
-    for card_id, quantity in decklist.slots.items():
+DECKLIST_UPDATE_FIELDS = [
+    "modified",
+    "deck_name",
+    "arkhamdb_creation_date",
+    "arkhamdb_update_date",
+    "description",
+    "user_id",
+    "investigator_code",
+    "investigator_name",
+    "likes",
+    "favorites",
+    "comments",
+    "tags",
+    "player_count",
+]
+
+
+@instrumented()
+def save_decklists(
+    decklists: list[ArkhamDBDecklistResponse],
+    decklists_metadata: dict[int, ArkhamDBDecklistMetaData] | None = None,
+) -> list[DeckList]:
+    """
+    Upserts a batch of decklists, their cards and their summaries with a constant
+    number of queries, regardless of how many decks or cards are in the batch.
+
+    Metadata that isn't passed in (e.g. already fetched by the crawler) is scraped
+    from each decklist's page.
+    """
+    decklists_metadata = decklists_metadata or {}
+    card_ids = {card_id for decklist in decklists for card_id in decklist.slots}
+    known_cards = card_stats(card_ids)
+
+    decks = []
+    deck_cards = []
+    summaries = []
+    stale_deck_cards = Q()
+    for decklist in decklists:
+        deck_info = decklist.dict(by_alias=False)
+        deck = DeckList(**deck_info)
+
+        deck.tags = []
+        if decklist.tags and isinstance(decklist.tags, str):
+            deck.tags.extend(decklist.tags.split(", "))
+
+        deck.player_count = determine_player_count(
+            deck.deck_name, deck.description, deck.tags
+        )
+
+        decklist_metadata = decklists_metadata.get(
+            deck.deck_id
+        ) or retrieve_arkhamdb_decklist_metadata(deck.deck_id)
+        deck.comments = decklist_metadata.comments
+        deck.favorites = decklist_metadata.favorites
+        deck.likes = decklist_metadata.likes
+        decks.append(deck)
+
         # Skip signature cards/weaknesses
-        try:
-            card_data = CardInfo.objects.get(card_id=card_id)
-            DeckCard.objects.update_or_create(
-                deck=deck, card_data=card_data, quantity=quantity
+        deck_card_ids = [
+            card_id for card_id in decklist.slots if card_id in known_cards
+        ]
+        deck_cards.extend(
+            DeckCard(
+                deck_id=deck.deck_id,
+                card_data_id=card_id,
+                quantity=decklist.slots[card_id],
+            )
+            for card_id in deck_card_ids
+        )
+        stale_deck_cards |= Q(deck_id=deck.deck_id) & ~Q(card_data_id__in=deck_card_ids)
+        summaries.append(
+            DeckSummary(
+                deck_id=deck.deck_id,
+                **summarize_cards(
+                    (decklist.slots[card_id], known_cards[card_id])
+                    for card_id in deck_card_ids
+                ),
             )
-        except CardInfo.DoesNotExist:
-            continue
+        )
 
-    deck.tags = []
-    if decklist.tags and isinstance(decklist.tags, str):
-        deck.tags.extend(decklist.tags.split(", "))
+    if not decks:
+        return decks
 
-    deck.player_count = determine_player_count(
-        deck.deck_name, deck.description, deck.tags
-    )
+    with transaction.atomic():
+        DeckList.objects.bulk_create(
+            decks,
+            update_conflicts=True,
+            unique_fields=["deck_id"],
+            update_fields=DECKLIST_UPDATE_FIELDS,
+        )
+        # Cards that were removed from a deck since it was last saved
+        DeckCard.objects.filter(stale_deck_cards).delete()
+        DeckCard.objects.bulk_create(
+            deck_cards,
+            update_conflicts=True,
+            unique_fields=["deck", "card_data"],
+            update_fields=["modified", "quantity"],
+        )
+        save_deck_summaries(summaries)
+    return decks
 
-    decklist_metadata = retrieve_arkhamdb_decklist_metadata(deck_id)
-    deck.comments = decklist_metadata.comments
-    deck.favorites = decklist_metadata.favorites
-    deck.likes = decklist_metadata.likes
 
-    deck.save()
+@instrumented()
+def save_decklist_info(decklist: ArkhamDBDecklistResponse):
+    save_decklists([decklist])
 
 
-@router.post("/fetch_latest_decklists")
-def fetch_latest_decklists(request) -> None:
-    if not (
-        newest_decklist := DeckList.objects.all()
-        .order_by("arkhamdb_creation_date")
-        .last()
-    ):
-        next_decklist_date = date.fromisoformat(FIRST_ARKHAMDB_DECKLIST_DATE)
-    else:
-        last_decklist_date = newest_decklist.arkhamdb_creation_date
-        next_decklist_date = (
-            datetime.combine(last_decklist_date, datetime.min.time())
-            + timedelta(days=1)
-        ).date()
+@router.post("/fetch_latest_decklists", response={202: JobSchema})
+async def fetch_latest_decklists(request):
+    """
+    Queues a crawl of every decklist up to today, or returns the one already queued.
+    Poll /jobs/{job_id} for its progress and report.
+    """
+    job, _ = await sync_to_async(enqueue)(
+        "fetch_latest_decklists",
+        {"start": FIRST_ARKHAMDB_DECKLIST_DATE, "end": date.today().isoformat()},
+    )
+    return 202, job
 
-    while next_decklist_date < date.today():
-        new_decklists = retrieve_arkhamdb_decklists_by_date(next_decklist_date)
-        for decklist in new_decklists:
-            save_decklist_info(decklist)
 
-        next_decklist_date = (
-            datetime.combine(next_decklist_date, datetime.min.time())
-            + timedelta(days=1)
-        ).date()
+@router.post("/export_corpus", response={202: JobSchema})
+async def export_corpus(request, full: bool = False):
+    """
+    Queues an export of the decks changed since the last export (or of every deck,
+    with full) to Parquet, or returns the one already queued. See decks.corpus.
+    """
+    job, _ = await sync_to_async(enqueue)("export_corpus", {"full": full})
+    return 202, job
 
 
 @router.post("/fetch_decklist/{deck_id}")
-def fetch_decklist(request, deck_id: int) -> None:
-    decklist = retrieve_arkhamdb_decklist_by_id(deck_id)
-    save_decklist_info(decklist)
+async def fetch_decklist(request, deck_id: int) -> None:
+    decklist, decklist_metadata = await asyncio.gather(
+        aretrieve_arkhamdb_decklist_by_id(deck_id),
+        aretrieve_arkhamdb_decklist_metadata(deck_id),
+    )
+    await sync_to_async(save_decklists)([decklist], {deck_id: decklist_metadata})
     # return DeckListSchema(decklist)
 
 
 @router.post("/fetch_decklist_breakdown", response=dict[str, DeckListBreakdownSchema])
-def fetch_decklist_breakdown(
-    request, decklists_request: DecklistsRequestSchema
+async def fetch_decklist_breakdown(
+    request, response: HttpResponse, decklists_request: DecklistsRequestSchema
 ) -> dict[str, DeckListBreakdownSchema]:
-    output = dict()
-    decklists = DeckList.objects.all()
-    if investigator := decklists_request.investigator_name:
-        decklists = decklists.filter(investigator_name=investigator)
-    decklists = decklists.order_by("deck_id")[
-        decklists_request.offset : decklists_request.offset
-        + decklists_request.num_entities
-    ]
-    for decklist in decklists:
-        card_presence = dict()
-        # card_presence indicates whether each card in card_ids is present in deck_cards
-        for card_id in decklists_request.card_ids:
-            card_presence[card_id] = decklist.deck_cards.filter(
-                card_data__card_id=card_id
-            ).exists()
-            # if not card_presence[card_id]:
-            #     card = CardInfo.objects.filter(card_id=card_id).first()
-            #     if (reprint := CardInfo.objects.filter(
-            #             name=card.name, subname=card.subname, xp=card.xp
-            #         )
-            #     ).exists():
-            #         reprint = reprint.first()
-            #         card_presence[card_id] = decklist.deck_cards.filter(
-            #             card_data__card_id=reprint.card_id
-            #         ).exists()
-
-        total_xp = decklist.deck_cards.aggregate(
-            total_xp=Sum(F("quantity") * F("card_data__xp"))
-        )["total_xp"]
-        if total_xp is None:
-            # log an error with the card_name of the card_data of each DeckCard in deck_cards in decklist
-            logging.warning(
-                f"Decklist {decklist.deck_id} has no xp: {[deck_card.card_data.name for deck_card in decklist.deck_cards.all()]}"
-            )
-            continue
-        # card_names = [
-        #     # f"{deck_card.quantity} X {deck_card.card_data.name}{f' ({deck_card.card_data.xp})' if deck_card.card_data.xp else ''}"
-        #     {
-        #         "name": f"{deck_card.card_data.name}{f' ({deck_card.card_data.xp})' if deck_card.card_data.xp else ''}",
-        #         "quantity": deck_card.quantity,
-        #     }
-        #     for deck_card in decklist.deck_cards.all()
-        # ]
-        output[str(decklist.deck_id)] = DeckListBreakdownSchema(
-            investigator_name=decklist.investigator_name,
-            card_presence=card_presence,
-            deck_xp=total_xp,
-        )
-    return output
+    matrix = (
+        await sync_to_async(get_deck_card_matrix)()
+        if settings.DECK_CARD_MATRIX_ENABLED
+        else None
+    )
+    breakdown, cursor = await sync_to_async(build_decklist_breakdown)(
+        decklists_request, matrix=matrix
+    )
+    if cursor:
+        response[NEXT_CURSOR_HEADER] = cursor
+    return breakdown
+
+
+@router.post("/decks_containing", response=list[int])
+async def decks_containing(
+    request,
+    response: HttpResponse,
+    decks_containing_request: DecksContainingRequestSchema,
+) -> list[int]:
+    matrix = await sync_to_async(_require_deck_card_matrix)()
+    deck_ids, cursor = paginate_deck_ids(
+        await sync_to_async(matrix.decks_containing)(
+            decks_containing_request.card_ids,
+            match_all=decks_containing_request.match_all,
+            investigator_name=decks_containing_request.investigator_name,
+        ),
+        decks_containing_request.cursor,
+        decks_containing_request.page_size,
+    )
+    if cursor:
+        response[NEXT_CURSOR_HEADER] = cursor
+    return deck_ids
+
+
+@router.get("/inclusion_rates/{card_id}", response=dict[str, float])
+async def inclusion_rates(request, card_id: str) -> dict[str, float]:
+    matrix = await sync_to_async(_require_deck_card_matrix)()
+    return await sync_to_async(matrix.inclusion_rates)(card_id)
+
+
+@router.get("/{deck_id}/similar", response=list[SimilarDeckSchema])
+async def similar_decks(
+    request, deck_id: int, k: int = Query(10, ge=1, le=100)
+) -> list[SimilarDeckSchema]:
+    """
+    Decks built most like deck_id, from the embeddings trained by
+    manage.py train_card_embeddings
+    """
+    card_embeddings = await sync_to_async(get_card_embeddings, thread_sensitive=False)()
+    if card_embeddings is None:
+        raise HttpError(404, "No card embeddings have been trained")
+    return [similar._asdict() for similar in card_embeddings.similar_decks(deck_id, k)]
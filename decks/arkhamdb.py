@@ -1,17 +1,27 @@
-import re
-from functools import lru_cache
 from string import Template
 from logging import getLogger
 from typing import Any
 
-import requests
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from requests.exceptions import RequestException
 from pydantic import ValidationError, Field, validator, parse_obj_as
 from ninja import Schema
 from bs4 import BeautifulSoup
 
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 
+from miskatonic.arkhamdb import (
+    RETRY_STATUSES,
+    get_arkhamdb_client,
+    get_async_arkhamdb_client,
+    response_ok,
+)
+from miskatonic.cache import cached_fetcher
+from miskatonic.instrumentation import instrumented
+from miskatonic.singleflight import single_flight
+from decks.metadata import extract_decklist_metadata
 from exceptions import (
     DecklistRetrievalError,
     DeckDetailsRetrievalError,
@@ -21,13 +31,25 @@ from exceptions import (
 logger = getLogger(__name__)
 
 ARKHAMDB_DECKLISTS_BY_DATE_API = Template(
-    "https://arkhamdb.com/api/public/decklists/by_date/$date.json"
+    f"{settings.ARKHAMDB_BASE_URL}/api/public/decklists/by_date/$date.json"
 )
 ARKHAMDB_DECKLIST_BY_ID_API = Template(
-    "https://arkhamdb.com/api/public/decklist/$deck_id.json"
+    f"{settings.ARKHAMDB_BASE_URL}/api/public/decklist/$deck_id.json"
+)
+ARKHAMDB_DECK_URL = Template(f"{settings.ARKHAMDB_BASE_URL}/decklist/view/$deck_id")
+ARKHAMDB_USER_URL = Template(
+    f"{settings.ARKHAMDB_BASE_URL}/user/profile/$user_id/$username"
 )
-ARKHAMDB_DECK_URL = Template("https://arkhamdb.com/decklist/view/$deck_id")
-ARKHAMDB_USER_URL = Template("https://arkhamdb.com/user/profile/$user_id/$username")
+
+# The decklist APIs answer 500 when there is nothing to return, so that isn't retried.
+# It isn't cached either, it can't be told apart from a real error that would then be
+# kept for good on a historical date.
+DECKLIST_API_RETRY_STATUSES = RETRY_STATUSES - {500}
+
+
+def is_historical(day: date) -> bool:
+    """Whether the decklists published on a day can be treated as final"""
+    return day <= date.today() - timedelta(days=settings.ARKHAMDB_HISTORICAL_AFTER_DAYS)
 
 
 class ArkhamDBDecklistResponse(Schema):
@@ -84,64 +106,101 @@ class ArkhamDBDecklistMetaData(Schema):
     # author_join_date: date
 
 
-def retrieve_arkhamdb_decklists_by_date(date: date) -> list[ArkhamDBDecklistResponse]:
-    try:
-        response = requests.get(
-            ARKHAMDB_DECKLISTS_BY_DATE_API.substitute(date=date.isoformat())
-        )
-    except RequestException as exc:
-        raise DecklistRetrievalError(
-            f"Failed to retrieve decklist info from API: {exc}"
-        ) from exc
+def _parse_decklists_by_date(response) -> list[ArkhamDBDecklistResponse]:
     # No decks found
     if response.status_code == 500:
         return []
-    elif not response.ok:
+    elif not response_ok(response):
         raise DecklistRetrievalError(
             f"Failed to retrieve decklist info from API with status code: {response.status_code}"
         )
+    decklists = response.json()
     try:
-        return parse_obj_as(list[ArkhamDBDecklistResponse], response.json())
+        return parse_obj_as(list[ArkhamDBDecklistResponse], decklists)
     except ValidationError as exc:
         raise DecklistRetrievalError(
-            f"Failed to validate response from decklist retrieval API: {response.json()}"
+            f"Failed to validate response from decklist retrieval API: {decklists}"
         ) from exc
 
 
-def retrieve_arkhamdb_decklist_by_id(deck_id: int) -> ArkhamDBDecklistResponse:
+@instrumented()
+def retrieve_arkhamdb_decklists_by_date(date: date) -> list[ArkhamDBDecklistResponse]:
     try:
-        response = requests.get(ARKHAMDB_DECKLIST_BY_ID_API.substitute(deck_id=deck_id))
+        response = get_arkhamdb_client().get(
+            ARKHAMDB_DECKLISTS_BY_DATE_API.substitute(date=date.isoformat()),
+            endpoint="decklists_by_date",
+            retry_statuses=DECKLIST_API_RETRY_STATUSES,
+            immutable=is_historical(date),
+        )
     except RequestException as exc:
         raise DecklistRetrievalError(
             f"Failed to retrieve decklist info from API: {exc}"
         ) from exc
+    return _parse_decklists_by_date(response)
+
+
+def _parse_decklist(response, deck_id: int) -> ArkhamDBDecklistResponse:
     if response.status_code == 500:
         raise DecklistRetrievalError(
             f"Failed to retrieve decklist info from API, decklist not found: {deck_id}"
         )
-    elif not response.ok:
+    elif not response_ok(response):
         raise DecklistRetrievalError(
             f"Failed to retrieve decklist info from API with status code: {response.status_code}"
         )
+    decklist = response.json()
     try:
-        return ArkhamDBDecklistResponse(**response.json())
+        return ArkhamDBDecklistResponse(**decklist)
     except ValidationError as exc:
         raise DecklistRetrievalError(
-            f"Failed to validate response from decklist retrieval API: {response.json()}"
+            f"Failed to validate response from decklist retrieval API: {decklist}"
+        ) from exc
+
+
+@instrumented()
+@single_flight("decklist")
+def retrieve_arkhamdb_decklist_by_id(deck_id: int) -> ArkhamDBDecklistResponse:
+    try:
+        response = get_arkhamdb_client().get(
+            ARKHAMDB_DECKLIST_BY_ID_API.substitute(deck_id=deck_id),
+            endpoint="decklist",
+            retry_statuses=DECKLIST_API_RETRY_STATUSES,
+        )
+    except RequestException as exc:
+        raise DecklistRetrievalError(
+            f"Failed to retrieve decklist info from API: {exc}"
+        ) from exc
+    return _parse_decklist(response, deck_id)
+
+
+@instrumented()
+@single_flight("decklist")
+async def aretrieve_arkhamdb_decklist_by_id(deck_id: int) -> ArkhamDBDecklistResponse:
+    try:
+        response = await get_async_arkhamdb_client().get(
+            ARKHAMDB_DECKLIST_BY_ID_API.substitute(deck_id=deck_id),
+            endpoint="decklist",
+            retry_statuses=DECKLIST_API_RETRY_STATUSES,
+        )
+    except httpx.HTTPError as exc:
+        raise DecklistRetrievalError(
+            f"Failed to retrieve decklist info from API: {exc!r}"
         ) from exc
+    return _parse_decklist(response, deck_id)
 
 
-@lru_cache(maxsize=100024)
+@cached_fetcher("user_data", timeout=24 * 60 * 60)
 def retrieve_arkhamdb_user_data(user_id: str, username: str):
     try:
-        response = requests.get(
-            ARKHAMDB_USER_URL.substitute(user_id=user_id, username=username)
+        response = get_arkhamdb_client().get(
+            ARKHAMDB_USER_URL.substitute(user_id=user_id, username=username),
+            endpoint="user_page",
         )
     except RequestException as exc:
         raise UserInfoRetrievalError(
             f"Failed to retrieve user info from webpage: {exc}"
         ) from exc
-    if not response.ok:
+    if not response_ok(response):
         raise UserInfoRetrievalError(
             f"Failed to retrieve user info from webpage with status code: {response.status_code}"
         )
@@ -154,15 +213,44 @@ def retrieve_arkhamdb_user_data(user_id: str, username: str):
     soup = soup.select("div", class_="main white container")[0]
 
 
-@lru_cache(maxsize=100000)
+@instrumented()
+@single_flight("decklist_metadata")
+@cached_fetcher("decklist_metadata", schema=ArkhamDBDecklistMetaData)
 def retrieve_arkhamdb_decklist_metadata(deck_id: int) -> ArkhamDBDecklistMetaData:
     try:
-        response = requests.get(ARKHAMDB_DECK_URL.substitute(deck_id=deck_id))
+        response = get_arkhamdb_client().get(
+            ARKHAMDB_DECK_URL.substitute(deck_id=deck_id), endpoint="decklist_page"
+        )
     except RequestException as exc:
         raise DeckDetailsRetrievalError(
             f"Failed to retrieve decklist info from webpage: {exc}"
         ) from exc
-    if not response.ok:
+    return _parse_decklist_metadata(response)
+
+
+@instrumented()
+@single_flight("decklist_metadata")
+@cached_fetcher("decklist_metadata", schema=ArkhamDBDecklistMetaData)
+async def aretrieve_arkhamdb_decklist_metadata(
+    deck_id: int,
+) -> ArkhamDBDecklistMetaData:
+    try:
+        response = await get_async_arkhamdb_client().get(
+            ARKHAMDB_DECK_URL.substitute(deck_id=deck_id), endpoint="decklist_page"
+        )
+    except httpx.HTTPError as exc:
+        raise DeckDetailsRetrievalError(
+            f"Failed to retrieve decklist info from webpage: {exc!r}"
+        ) from exc
+    # Parsing the page is CPU bound, don't hold up the other requests on the loop
+    return await sync_to_async(_parse_decklist_metadata, thread_sensitive=False)(
+        response
+    )
+
+
+@instrumented("parse_decklist_page")
+def _parse_decklist_metadata(response) -> ArkhamDBDecklistMetaData:
+    if not response_ok(response):
         raise DeckDetailsRetrievalError(
             f"Failed to retrieve deck detail info from webpage with status code: {response.status_code}"
         )
@@ -171,26 +259,10 @@ def retrieve_arkhamdb_decklist_metadata(deck_id: int) -> ArkhamDBDecklistMetaDat
             f"Failed to retrieve deck detail info from webpage, page is empty: {response.status_code}"
         )
 
-    soup = BeautifulSoup(response.text, "html.parser")
-    if not (social_icons := soup.find("span", class_="social-icons")):
-        raise DeckDetailsRetrievalError("Failed to retrieve deck metadata")
-
-    def _get_count(elem) -> int:
-        if not elem:
-            return 0
-        num = elem.find("span", class_="num")
-        if not num:
-            logger.error("Metadata count not found")
-            return 0
-        return int(num.string)
-
-    likes = _get_count(social_icons.find("a", id="social-icon-like"))
-    favorites = _get_count(social_icons.find("a", id="social-icon-favorite"))
-    comments = _get_count(social_icons.find("a", id="social-icon-comments"))
-
-    author_profile_url = soup.find("a", class_="username")["href"]
-    author_details = re.match(r"\/user\/profile\/([0-9]+)\/(.+)", author_profile_url)
-    author_details[1]
-    author_details[2]
-    # retrieve_arkhamdb_user_data(author_id, author_username)
-    return ArkhamDBDecklistMetaData(likes=likes, favorites=favorites, comments=comments)
+    page_metadata = extract_decklist_metadata(response.text)
+    # retrieve_arkhamdb_user_data(page_metadata.author_id, page_metadata.author_username)
+    return ArkhamDBDecklistMetaData(
+        likes=page_metadata.likes,
+        favorites=page_metadata.favorites,
+        comments=page_metadata.comments,
+    )
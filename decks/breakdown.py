@@ -0,0 +1,93 @@
+import logging
+from typing import TYPE_CHECKING
+
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db.models import Q, QuerySet
+
+from cards.catalogue import card_catalogue
+from decks.models import DeckList
+from decks.pagination import after_cursor, next_cursor
+from decks.schemas import DeckListBreakdownSchema, DecklistsRequestSchema
+from miskatonic.instrumentation import instrumented
+
+if TYPE_CHECKING:
+    from decks.matrix import DeckCardMatrix
+
+
+def decklist_breakdown_queryset(
+    decklists_request: DecklistsRequestSchema, with_presence: bool = True
+) -> QuerySet:
+    """
+    The page of decklists a breakdown is built from, as (deck_id, investigator_name,
+    total_xp[, present_card_ids]) rows. Reprints of the requested cards are looked
+    for as well.
+    """
+    decklists = after_cursor(DeckList.objects.all(), decklists_request.cursor)
+    if investigator := decklists_request.investigator_name:
+        decklists = decklists.filter(investigator_name=investigator)
+    annotations = {}
+    if with_presence:
+        annotations["present_card_ids"] = ArrayAgg(
+            "deck_cards__card_data_id",
+            filter=Q(
+                deck_cards__card_data_id__in=list(
+                    card_catalogue.printings(decklists_request.card_ids)
+                )
+            ),
+            default=[],
+        )
+    return decklists.annotate(**annotations).values_list(
+        "deck_id", "investigator_name", "summary__total_xp", *annotations
+    )[
+        decklists_request.offset : decklists_request.offset
+        + decklists_request.num_entities
+    ]
+
+
+@instrumented()
+def build_decklist_breakdown(
+    decklists_request: DecklistsRequestSchema,
+    matrix: "DeckCardMatrix | None" = None,
+) -> tuple[dict[str, DeckListBreakdownSchema], str | None]:
+    """
+    Card presence and total XP for a page of decklists, computed in a single query so
+    the cost doesn't grow with the number of decks or requested cards. Returned with
+    the cursor of the next page.
+
+    Total XP is read from the deck summaries. If a deck/card matrix is given, card
+    presence is read from it too and the query doesn't touch the deck cards at all.
+
+    A card counts as present when any printing of it is, so reprints are one card.
+    """
+    card_ids = list(decklists_request.card_ids)
+    decklists = list(
+        decklist_breakdown_queryset(decklists_request, with_presence=matrix is None)
+    )
+    if matrix is None:
+        printings = card_catalogue.printings(card_ids)
+        presence = []
+        for *_, present_card_ids in decklists:
+            present = {printings[card_id] for card_id in present_card_ids}
+            presence.append([printings[card_id] in present for card_id in card_ids])
+    else:
+        presence = matrix.presence(
+            [deck_id for deck_id, *_ in decklists], card_ids
+        ).tolist()
+
+    output = dict()
+    for (deck_id, investigator_name, total_xp, *_), deck_presence in zip(
+        decklists, presence
+    ):
+        if total_xp is None:
+            logging.warning(f"Decklist {deck_id} has no xp")
+            continue
+        # card_presence indicates whether each card in card_ids is present in deck_cards
+        card_presence = dict(zip(card_ids, deck_presence))
+        output[str(deck_id)] = DeckListBreakdownSchema(
+            investigator_name=investigator_name,
+            card_presence=card_presence,
+            deck_xp=total_xp,
+        )
+    return output, next_cursor(
+        [deck_id for deck_id, *_ in decklists], decklists_request.num_entities
+    )
@@ -1 +1,43 @@
 FIRST_ARKHAMDB_DECKLIST_DATE = "2016-09-02"
+
+# Phrases that suggest how many players a deck was built for, by player count. The
+# order matters: on equal scores the earlier keyword wins.
+PLAYER_COUNT_KEYWORDS = {
+    1: [
+        "solo",
+        "single",
+        "single-player",
+        "alone",
+        "one player",
+        "1 player",
+        "1-player",
+        "one-player",
+        "single player",
+    ],
+    2: [
+        "two-handed",
+        "two handed",
+        "2 handed",
+        "2-handed",
+        "duo",
+        "pair",
+        "2 players",
+        "two players",
+        "2-player",
+        "two-player",
+        "partner",
+    ],
+    4: [
+        "four players",
+        "4 players",
+        "4 player",
+        "four player",
+        "4-player",
+        "four-player",
+        "group",
+        "team",
+        "quad",
+    ],
+}
+# Minimum fuzzy match score for a keyword to count
+PLAYER_COUNT_MATCH_THRESHOLD = 60
@@ -0,0 +1,325 @@
+"""
+The deck corpus exported to Parquet for analysis, by manage.py export_corpus and
+export_corpus jobs:
+
+    cards.parquet
+    decklists/month=2016-09/part.parquet
+    deck_cards/month=2016-09/part.parquet
+    manifest.json
+
+Decklists and their cards are partitioned by the month the deck was created on
+ArkhamDB. Card ids are dictionary encoded. An export only rewrites the months whose
+decks changed since the last one, and the cards when any card did.
+"""
+
+import json
+import shutil
+from datetime import date
+from logging import getLogger
+from pathlib import Path
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, Callable
+
+from django.conf import settings
+from django.db.models import Count, Max, QuerySet, TextField
+from django.db.models.functions import Cast, TruncMonth
+from django.utils import timezone
+
+from cards.models import CardInfo
+from decks.models import DeckCard, DeckList
+from decks.schemas import CorpusExportReportSchema
+from miskatonic.files import atomic_write
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+logger = getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+CARDS_NAME = "cards.parquet"
+PARTITIONED_TABLES = ("decklists", "deck_cards")
+PARTITION_NAME = "part.parquet"
+# Rows fetched from the database at a time
+EXPORT_CHUNK_SIZE = 10000
+
+
+def corpus_dir() -> Path:
+    return Path(settings.CORPUS_EXPORT_DIR)
+
+
+def _month_bounds(month: str) -> tuple[date, date]:
+    start = date.fromisoformat(f"{month}-01")
+    end = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start, end
+
+
+def _timestamp(value) -> str | None:
+    return value and value.isoformat()
+
+
+def month_fingerprints() -> dict[str, list]:
+    """
+    Number and latest modification of the decklists and deck cards of each month. A
+    month whose fingerprint differs from the exported one has changed.
+    """
+    fingerprints = {}
+    for month, decks, modified in (
+        DeckList.objects.annotate(month=TruncMonth("arkhamdb_creation_date"))
+        .values("month")
+        .annotate(decks=Count("deck_id"), modified=Max("modified"))
+        .order_by()
+        .values_list("month", "decks", "modified")
+    ):
+        fingerprints[month.strftime("%Y-%m")] = [decks, _timestamp(modified), 0, None]
+    for month, deck_cards, modified in (
+        DeckCard.objects.annotate(month=TruncMonth("deck__arkhamdb_creation_date"))
+        .values("month")
+        .annotate(deck_cards=Count("id"), modified=Max("modified"))
+        .order_by()
+        .values_list("month", "deck_cards", "modified")
+    ):
+        fingerprints[month.strftime("%Y-%m")][2:] = [deck_cards, _timestamp(modified)]
+    return fingerprints
+
+
+def cards_fingerprint() -> list:
+    cards = CardInfo.objects.aggregate(cards=Count("card_id"), modified=Max("modified"))
+    return [cards["cards"], _timestamp(cards["modified"])]
+
+
+def _columns() -> dict[str, list[tuple[str, Any, "pa.DataType"]]]:
+    """The (column, field or expression, type) of each table"""
+    import pyarrow as pa
+
+    category = pa.dictionary(pa.int32(), pa.string())
+    modified = pa.timestamp("us", tz="UTC")
+    return {
+        "decklists": [
+            ("deck_id", "deck_id", pa.int32()),
+            ("deck_name", "deck_name", pa.string()),
+            ("arkhamdb_creation_date", "arkhamdb_creation_date", pa.date32()),
+            ("arkhamdb_update_date", "arkhamdb_update_date", pa.date32()),
+            ("description", "description", pa.string()),
+            ("user_id", "user_id", pa.int32()),
+            ("investigator_code", "investigator_code", category),
+            ("investigator_name", "investigator_name", category),
+            ("likes", "likes", pa.int32()),
+            ("favorites", "favorites", pa.int32()),
+            ("comments", "comments", pa.int32()),
+            ("tags", "tags", pa.list_(pa.string())),
+            ("player_count", "player_count", category),
+            ("modified", "modified", modified),
+        ],
+        "deck_cards": [
+            ("deck_id", "deck_id", pa.int32()),
+            ("card_id", "card_data_id", category),
+            ("quantity", "quantity", pa.int16()),
+        ],
+        "cards": [
+            ("card_id", "card_id", pa.string()),
+            ("canonical_card_id", "canonical_card_id", pa.string()),
+            ("name", "name", pa.string()),
+            ("subname", "subname", pa.string()),
+            ("pack_name", "pack_name", category),
+            ("type_name", "type_name", category),
+            ("subtype_name", "subtype_name", category),
+            ("factions", "factions", pa.list_(pa.string())),
+            ("exceptional", "exceptional", pa.bool_()),
+            ("myriad", "myriad", pa.bool_()),
+            ("cost", "cost", pa.int32()),
+            ("text", "text", pa.string()),
+            # JSON objects, kept as their text
+            ("skills", Cast("skills", TextField()), pa.string()),
+            ("xp", "xp", pa.int32()),
+            ("deck_limit", "deck_limit", pa.int32()),
+            ("traits", "traits", pa.list_(pa.string())),
+            ("is_unique", "is_unique", pa.bool_()),
+            ("permanent", "permanent", pa.bool_()),
+            ("octgn_id", "octgn_id", pa.string()),
+            ("url", "url", pa.string()),
+            ("imagesrc", "imagesrc", pa.string()),
+            ("restrictions", Cast("restrictions", TextField()), pa.string()),
+            ("modified", "modified", modified),
+        ],
+    }
+
+
+def _table(queryset: QuerySet, columns: list[tuple[str, Any, "pa.DataType"]]):
+    import pyarrow as pa
+
+    values = [[] for _ in columns]
+    for row in queryset.values_list(*(field for _, field, _ in columns)).iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    ):
+        for column_values, value in zip(values, row):
+            column_values.append(value)
+    return pa.Table.from_arrays(
+        [
+            pa.array(column_values, type=data_type)
+            for column_values, (_, _, data_type) in zip(values, columns)
+        ],
+        names=[name for name, _, _ in columns],
+    )
+
+
+def _write_table(table, path: Path) -> None:
+    import pyarrow.parquet as pq
+
+    with atomic_write(path) as table_file:
+        pq.write_table(table, table_file)
+
+
+def _read_manifest(directory: Path) -> dict:
+    try:
+        return json.loads((directory / MANIFEST_NAME).read_text())
+    except FileNotFoundError:
+        return {"cards": None, "months": {}}
+
+
+def _save_manifest(directory: Path, manifest: dict) -> None:
+    with atomic_write(directory / MANIFEST_NAME, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+
+
+def _partition_dir(directory: Path, table_name: str, month: str) -> Path:
+    return directory / table_name / f"month={month}"
+
+
+def export_month(directory: Path, month: str) -> tuple[int, int]:
+    """
+    Rewrites the decklists and deck cards of a month ("YYYY-MM"), returns how many
+    of each were written
+    """
+    columns = _columns()
+    start, end = _month_bounds(month)
+    decklists = _table(
+        DeckList.objects.filter(
+            arkhamdb_creation_date__gte=start, arkhamdb_creation_date__lt=end
+        ).order_by("deck_id"),
+        columns["decklists"],
+    )
+    deck_cards = _table(
+        DeckCard.objects.filter(
+            deck__arkhamdb_creation_date__gte=start,
+            deck__arkhamdb_creation_date__lt=end,
+        ).order_by("deck_id", "card_data_id"),
+        columns["deck_cards"],
+    )
+    _write_table(
+        decklists, _partition_dir(directory, "decklists", month) / PARTITION_NAME
+    )
+    _write_table(
+        deck_cards, _partition_dir(directory, "deck_cards", month) / PARTITION_NAME
+    )
+    return decklists.num_rows, deck_cards.num_rows
+
+
+def export_corpus(
+    directory: Path | None = None,
+    full: bool = False,
+    on_progress: Callable[[CorpusExportReportSchema], Any] | None = None,
+) -> CorpusExportReportSchema:
+    """
+    Writes the months whose decks changed since the last export (or every month with
+    full) and the cards if any changed, and removes the months that no longer have
+    decks.
+
+    The manifest is saved after each month, so an export that is stopped keeps the
+    months it finished. on_progress is called with the report so far after each
+    month, if it raises the export stops there.
+    """
+    started_at = perf_counter()
+    directory = directory or corpus_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    manifest = {"cards": None, "months": {}} if full else _read_manifest(directory)
+    # Taken before reading any rows, so changes made during the export are
+    # exported again next time rather than missed
+    fingerprints = month_fingerprints()
+    report = CorpusExportReportSchema(
+        months_written=0,
+        months_removed=0,
+        months_unchanged=0,
+        cards_written=False,
+        decklists_written=0,
+        deck_cards_written=0,
+        elapsed_seconds=0,
+    )
+
+    def progress() -> CorpusExportReportSchema:
+        report.elapsed_seconds = round(perf_counter() - started_at, 3)
+        if on_progress:
+            on_progress(report)
+        return report
+
+    if (cards := cards_fingerprint()) != manifest["cards"]:
+        _write_table(
+            _table(CardInfo.objects.order_by("card_id"), _columns()["cards"]),
+            directory / CARDS_NAME,
+        )
+        manifest["cards"] = cards
+        _save_manifest(directory, manifest)
+        report.cards_written = True
+
+    exported_months = set(manifest["months"]) | {
+        partition.name.removeprefix("month=")
+        for table_name in PARTITIONED_TABLES
+        for partition in (directory / table_name).glob("month=*")
+    }
+    for month in sorted(exported_months - set(fingerprints)):
+        for table_name in PARTITIONED_TABLES:
+            shutil.rmtree(_partition_dir(directory, table_name, month), True)
+        manifest["months"].pop(month, None)
+        report.months_removed += 1
+    _save_manifest(directory, manifest)
+
+    for month, fingerprint in sorted(fingerprints.items()):
+        if manifest["months"].get(month) == fingerprint:
+            report.months_unchanged += 1
+            continue
+        decklists, deck_cards = export_month(directory, month)
+        manifest["months"][month] = fingerprint
+        _save_manifest(directory, manifest)
+        report.months_written += 1
+        report.decklists_written += decklists
+        report.deck_cards_written += deck_cards
+        progress()
+
+    manifest["exported_at"] = timezone.now().isoformat()
+    _save_manifest(directory, manifest)
+    report = progress()
+    logger.info(f"Exported the deck corpus to {directory}: {report}")
+    return report
+
+
+def load_corpus(
+    months: list[str] | None = None,
+    directory: Path | None = None,
+    as_pandas: bool = False,
+) -> dict[str, Any]:
+    """
+    The exported "decklists", "deck_cards" and "cards", as Arrow tables read through
+    memory maps, or as DataFrames with as_pandas. months ("YYYY-MM") limits the
+    decklists and deck cards to those months.
+
+    Dictionary encoded columns, such as card ids, load as pandas categoricals.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    directory = directory or corpus_dir()
+    partitioning = ds.partitioning(pa.schema([("month", pa.string())]), flavor="hive")
+    filters = [("month", "in", months)] if months else None
+    tables = {
+        table_name: pq.read_table(
+            directory / table_name,
+            partitioning=partitioning,
+            filters=filters,
+            memory_map=True,
+        )
+        for table_name in PARTITIONED_TABLES
+    }
+    tables["cards"] = pq.read_table(directory / CARDS_NAME, memory_map=True)
+    if as_pandas:
+        return {name: table.to_pandas() for name, table in tables.items()}
+    return tables
@@ -0,0 +1,191 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+from logging import getLogger
+from threading import Lock
+from time import perf_counter
+from typing import Any, Callable
+
+from django.conf import settings
+from django.db import connection
+
+from constants import CrawlStatus
+from decks.arkhamdb import (
+    ArkhamDBDecklistMetaData,
+    ArkhamDBDecklistResponse,
+    retrieve_arkhamdb_decklist_metadata,
+    retrieve_arkhamdb_decklists_by_date,
+)
+from decks.models import DecklistCrawlCheckpoint
+from decks.schemas import DecklistCrawlReportSchema
+
+logger = getLogger(__name__)
+
+PROGRESS_LOG_INTERVAL = 50
+
+
+def date_range(start: date, end: date) -> list[date]:
+    """Every date from start (inclusive) to end (exclusive)"""
+    return [start + timedelta(days=offset) for offset in range((end - start).days)]
+
+
+class DecklistCrawler:
+    """
+    Fetches ArkhamDB decklists for a range of dates with a bounded pool of workers.
+    The metadata pages of each date's decklists are scraped concurrently, on a pool of
+    `metadata_workers` shared by every date.
+
+    Every finished date is checkpointed in the database, so a crawl that is interrupted
+    resumes from the dates that have not completed yet.
+
+    crawl() calls on_progress with the report so far after each date. If it raises, the
+    dates that haven't started are dropped and the crawl stops with that exception.
+    """
+
+    def __init__(
+        self,
+        save_decklists: Callable[
+            [
+                list[ArkhamDBDecklistResponse],
+                dict[int, ArkhamDBDecklistMetaData],
+            ],
+            Any,
+        ],
+        workers: int | None = None,
+        metadata_workers: int | None = None,
+        retrieve_decklists: Callable[
+            [date], list[ArkhamDBDecklistResponse]
+        ] = retrieve_arkhamdb_decklists_by_date,
+        retrieve_decklist_metadata: Callable[
+            [int], ArkhamDBDecklistMetaData
+        ] = retrieve_arkhamdb_decklist_metadata,
+        on_progress: Callable[[DecklistCrawlReportSchema], Any] | None = None,
+    ):
+        self.save_decklists = save_decklists
+        self.retrieve_decklists = retrieve_decklists
+        self.retrieve_decklist_metadata = retrieve_decklist_metadata
+        self.on_progress = on_progress
+        self.workers = workers or settings.DECKLIST_CRAWLER_WORKERS
+        self.metadata_workers = (
+            metadata_workers or settings.DECKLIST_CRAWLER_METADATA_WORKERS
+        )
+        self._metadata_executor: ThreadPoolExecutor | None = None
+        self._lock = Lock()
+        self._pages = 0
+        self._decks = 0
+        self._failures = 0
+        self._started_at = perf_counter()
+
+    def crawl(self, start: date, end: date) -> DecklistCrawlReportSchema:
+        completed_dates = set(
+            self._completed_checkpoints(start, end).values_list("date", flat=True)
+        )
+        pending_dates = self._start(start, end, completed_dates)
+        with ThreadPoolExecutor(
+            max_workers=self.metadata_workers,
+            thread_name_prefix="decklist-metadata",
+        ) as self._metadata_executor, ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="decklist-crawler"
+        ) as executor:
+            futures = [
+                executor.submit(self._crawl_date, crawl_date)
+                for crawl_date in pending_dates
+            ]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+                    if self.on_progress:
+                        self.on_progress(
+                            self.report(dates_skipped=len(completed_dates))
+                        )
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+        return self._finish(len(completed_dates))
+
+    def _completed_checkpoints(self, start: date, end: date):
+        return DecklistCrawlCheckpoint.objects.filter(
+            date__gte=start, date__lt=end, status=CrawlStatus.COMPLETE
+        )
+
+    def _start(self, start: date, end: date, completed_dates: set[date]) -> list[date]:
+        pending_dates = [
+            crawl_date
+            for crawl_date in date_range(start, end)
+            if crawl_date not in completed_dates
+        ]
+        logger.info(
+            f"Crawling {len(pending_dates)} dates between {start} and {end} "
+            f"({len(completed_dates)} already complete) with {self.workers} workers"
+        )
+        self._pages = self._decks = self._failures = 0
+        self._started_at = perf_counter()
+        return pending_dates
+
+    def _finish(self, dates_skipped: int) -> DecklistCrawlReportSchema:
+        report = self.report(dates_skipped=dates_skipped)
+        logger.info(f"Finished crawling decklists: {report}")
+        return report
+
+    def report(self, dates_skipped: int = 0) -> DecklistCrawlReportSchema:
+        elapsed = perf_counter() - self._started_at
+        return DecklistCrawlReportSchema(
+            dates_crawled=self._pages,
+            dates_skipped=dates_skipped,
+            dates_failed=self._failures,
+            decks_saved=self._decks,
+            elapsed_seconds=elapsed,
+            pages_per_sec=self._pages / elapsed if elapsed else 0.0,
+            decks_per_sec=self._decks / elapsed if elapsed else 0.0,
+        )
+
+    def _crawl_date(self, crawl_date: date) -> None:
+        try:
+            decklists = self.retrieve_decklists(crawl_date)
+            deck_ids = [decklist.deck_id for decklist in decklists]
+            decklists_metadata = dict(
+                zip(
+                    deck_ids,
+                    self._metadata_executor.map(
+                        self.retrieve_decklist_metadata, deck_ids
+                    ),
+                )
+            )
+            self.save_decklists(decklists, decklists_metadata)
+        except Exception as exc:
+            logger.exception(f"Failed to crawl decklists for {crawl_date}")
+            DecklistCrawlCheckpoint.objects.update_or_create(
+                date=crawl_date, defaults=self._failed(exc)
+            )
+        else:
+            DecklistCrawlCheckpoint.objects.update_or_create(
+                date=crawl_date, defaults=self._completed(decklists)
+            )
+        finally:
+            # Worker threads each hold their own connection, don't leave them open
+            connection.close()
+
+    def _failed(self, exc: Exception) -> dict:
+        with self._lock:
+            self._failures += 1
+        return {"status": CrawlStatus.FAILED, "error": str(exc)}
+
+    def _completed(self, decklists: list[ArkhamDBDecklistResponse]) -> dict:
+        self._record_page(len(decklists))
+        return {
+            "status": CrawlStatus.COMPLETE,
+            "deck_count": len(decklists),
+            "error": None,
+        }
+
+    def _record_page(self, deck_count: int) -> None:
+        with self._lock:
+            self._pages += 1
+            self._decks += deck_count
+            pages = self._pages
+        if pages % PROGRESS_LOG_INTERVAL == 0:
+            report = self.report()
+            logger.info(
+                f"Crawled {report.dates_crawled} dates, {report.decks_saved} decks "
+                f"({report.pages_per_sec:.2f} pages/sec, {report.decks_per_sec:.2f} decks/sec)"
+            )
@@ -0,0 +1,247 @@
+import json
+import tempfile
+from logging import getLogger
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from decks.models import DeckCard
+from miskatonic.files import FileCache, atomic_write
+from miskatonic.vector_index import VectorIndex, normalize
+
+logger = getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+
+
+class SimilarCard(NamedTuple):
+    card_id: str
+    similarity: float
+
+
+class SimilarDeck(NamedTuple):
+    deck_id: int
+    similarity: float
+
+
+def embeddings_dir() -> Path:
+    return Path(settings.CARD_EMBEDDINGS_DIR)
+
+
+def _write_corpus(corpus_file) -> tuple[np.ndarray, list[str], np.ndarray, int]:
+    """
+    Writes every deck as a line of the distinct card ids in it, and returns the codes
+    of those cards (in line order), the card id of each code, each deck's id and its
+    first position in the codes, and the size of the largest deck
+    """
+    card_codes = {}
+    codes = []
+    deck_ids = []
+    deck_starts = []
+    line = []
+    for deck_id, card_id in (
+        DeckCard.objects.order_by("deck_id", "card_data_id")
+        .values_list("deck_id", "card_data_id")
+        .iterator(chunk_size=10000)
+    ):
+        if not deck_ids or deck_ids[-1] != deck_id:
+            if line:
+                corpus_file.write(" ".join(line) + "\n")
+            line = []
+            deck_ids.append(deck_id)
+            deck_starts.append(len(codes))
+        line.append(card_id)
+        codes.append(card_codes.setdefault(card_id, len(card_codes)))
+    if line:
+        corpus_file.write(" ".join(line) + "\n")
+    decks = np.array([deck_ids, deck_starts], dtype=np.int64).reshape(2, -1)
+    largest_deck = int(np.diff(decks[1], append=len(codes)).max(initial=0))
+    return np.array(codes, dtype=np.int32), list(card_codes), decks, largest_deck
+
+
+def _deck_vectors(
+    codes: np.ndarray, decks: np.ndarray, code_vectors: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """Ids and vectors of the decks with an embedded card, the mean of their cards"""
+    deck_positions = np.repeat(
+        np.arange(decks.shape[1]), np.diff(decks[1], append=len(codes))
+    )
+    # Cards in too few decks have no vector, their code maps to a row of NaNs
+    embedded = ~np.isnan(code_vectors[codes, 0])
+    deck_positions = deck_positions[embedded]
+    card_vectors = normalize(code_vectors[codes[embedded]])
+    sums = np.stack(
+        [
+            np.bincount(deck_positions, weights=column, minlength=decks.shape[1])
+            for column in card_vectors.T
+        ],
+        axis=1,
+    )
+    kept = np.bincount(deck_positions, minlength=decks.shape[1]) > 0
+    return decks[0][kept], normalize(sums[kept])
+
+
+class CardEmbeddings:
+    """
+    card2vec: card vectors learnt by skip-gram with every deck as a sentence, so cards
+    played in the same decks end up close together. A deck's vector is the mean of its
+    card vectors.
+
+    Both are searched through an approximate nearest neighbour index, memory-mapped
+    from .npy files so workers share the pages and startup does not read them.
+    """
+
+    def __init__(
+        self,
+        cards: VectorIndex,
+        decks: VectorIndex,
+        build: str,
+        built_at: str,
+        dimensions: int,
+    ):
+        self.cards = cards
+        self.decks = decks
+        self.build = build
+        self.built_at = built_at
+        self.dimensions = dimensions
+
+    @classmethod
+    def train(
+        cls,
+        dimensions: int | None = None,
+        epochs: int | None = None,
+        min_decks: int | None = None,
+        workers: int = 3,
+        seed: int = 0,
+    ) -> "CardEmbeddings":
+        """
+        Trains on every saved deck. Training is only reproducible for a seed with a
+        single worker.
+        """
+        from gensim.models import Word2Vec
+
+        if dimensions is None:
+            dimensions = settings.CARD_EMBEDDING_DIMENSIONS
+        if epochs is None:
+            epochs = settings.CARD_EMBEDDING_EPOCHS
+        if min_decks is None:
+            min_decks = settings.CARD_EMBEDDING_MIN_DECKS
+        with tempfile.NamedTemporaryFile("w", suffix=".txt") as corpus_file:
+            codes, card_ids, decks, largest_deck = _write_corpus(corpus_file)
+            corpus_file.flush()
+            logger.info(
+                f"Training {dimensions} dimensional card embeddings on "
+                f"{decks.shape[1]} decks"
+            )
+            model = Word2Vec(
+                corpus_file=corpus_file.name,
+                vector_size=dimensions,
+                # Cards in a deck are unordered, every card is in every other's context
+                window=max(largest_deck, 1),
+                shrink_windows=False,
+                min_count=min_decks,
+                sg=1,
+                negative=5,
+                epochs=epochs,
+                workers=workers,
+                seed=seed,
+            )
+
+        code_vectors = np.full((len(card_ids), dimensions), np.nan, dtype=np.float32)
+        for code, card_id in enumerate(card_ids):
+            if card_id in model.wv.key_to_index:
+                code_vectors[code] = model.wv[card_id]
+        deck_ids, deck_vectors = _deck_vectors(codes, decks, code_vectors)
+        embedded_card_ids = np.array(model.wv.index_to_key, dtype=str)
+        return cls(
+            cards=VectorIndex.build(embedded_card_ids, model.wv.vectors, seed=seed),
+            decks=VectorIndex.build(deck_ids, deck_vectors, seed=seed),
+            build=timezone.now().strftime("%Y%m%dT%H%M%S%f"),
+            built_at=timezone.now().isoformat(),
+            dimensions=dimensions,
+        )
+
+    def save(self, directory: Path) -> None:
+        """
+        Saves the arrays of this build, then points the manifest at it and removes the
+        builds before the previous one. Readers load whichever build the manifest
+        names, so they never see half of one. The previous build is kept for readers
+        that read the manifest before it changed but haven't loaded its arrays yet.
+        """
+        manifest_path = directory / MANIFEST_NAME
+        try:
+            previous_build = json.loads(manifest_path.read_text())["build"]
+        except FileNotFoundError:
+            previous_build = None
+        directory.mkdir(parents=True, exist_ok=True)
+        self.cards.save(directory, f"cards-{self.build}")
+        self.decks.save(directory, f"decks-{self.build}")
+        with atomic_write(manifest_path, "w") as manifest_file:
+            json.dump(
+                {
+                    "build": self.build,
+                    "built_at": self.built_at,
+                    "dimensions": self.dimensions,
+                    "cards": len(self.cards),
+                    "decks": len(self.decks),
+                },
+                manifest_file,
+            )
+        kept = tuple(
+            f"{vectors}-{build}."
+            for build in (self.build, previous_build)
+            if build
+            for vectors in ("cards", "decks")
+        )
+        for path in directory.glob("*.npy"):
+            if not path.name.startswith(kept):
+                path.unlink()
+
+    @classmethod
+    def load(cls, directory: Path) -> "CardEmbeddings":
+        manifest = json.loads((directory / MANIFEST_NAME).read_text())
+        return cls(
+            cards=VectorIndex.load(directory, f"cards-{manifest['build']}"),
+            decks=VectorIndex.load(directory, f"decks-{manifest['build']}"),
+            build=manifest["build"],
+            built_at=manifest["built_at"],
+            dimensions=manifest["dimensions"],
+        )
+
+    def similar_cards(self, card_id: str, k: int = 10) -> list[SimilarCard]:
+        """Up to k cards played most like card_id, nothing for cards without a vector"""
+        if (vector := self.cards.vector(card_id)) is None:
+            return []
+        return [
+            SimilarCard(card_id=similar_id, similarity=round(similarity, 4))
+            for similar_id, similarity in self.cards.search(
+                vector, k, settings.EMBEDDING_SEARCH_NPROBE, exclude=card_id
+            )
+        ]
+
+    def similar_decks(self, deck_id: int, k: int = 10) -> list[SimilarDeck]:
+        """
+        Up to k decks closest to deck_id, nothing for decks saved after the embeddings
+        were trained
+        """
+        if (vector := self.decks.vector(deck_id)) is None:
+            return []
+        return [
+            SimilarDeck(deck_id=similar_id, similarity=round(similarity, 4))
+            for similar_id, similarity in self.decks.search(
+                vector, k, settings.EMBEDDING_SEARCH_NPROBE, exclude=deck_id
+            )
+        ]
+
+
+_card_embeddings = FileCache(
+    lambda manifest_path: CardEmbeddings.load(manifest_path.parent)
+)
+
+
+def get_card_embeddings() -> CardEmbeddings | None:
+    """The saved embeddings, kept in memory and reloaded when they are retrained"""
+    return _card_embeddings.get(embeddings_dir() / MANIFEST_NAME)
@@ -0,0 +1,67 @@
+from datetime import date
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from decks.synergy import SynergyIndex, synergy_index_path
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the card synergy index served by /cards/{card_id}/synergies from the "
+        "saved decks"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--investigator",
+            default=None,
+            help="Only count the decks of this investigator",
+        )
+        parser.add_argument(
+            "--since",
+            type=date.fromisoformat,
+            default=None,
+            help="Only count decks created on or after this date",
+        )
+        parser.add_argument(
+            "--until",
+            type=date.fromisoformat,
+            default=None,
+            help="Only count decks created before this date",
+        )
+        parser.add_argument(
+            "--top-k",
+            type=int,
+            default=None,
+            help="Number of synergies kept per card, defaults to SYNERGY_INDEX_TOP_K",
+        )
+        parser.add_argument(
+            "--min-decks",
+            type=int,
+            default=None,
+            help="Ignore pairs of cards seen together in fewer decks, defaults to "
+            "SYNERGY_MIN_DECKS",
+        )
+
+    def handle(self, *args, **options):
+        started_at = perf_counter()
+        synergy_index = SynergyIndex.build(
+            investigator_name=options["investigator"],
+            since=options["since"],
+            until=options["until"],
+            top_k=options["top_k"],
+            min_decks=options["min_decks"],
+        )
+        path = synergy_index_path(
+            options["investigator"], options["since"], options["until"]
+        )
+        synergy_index.save(path)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed {len(synergy_index.card_ids)} cards over "
+                f"{synergy_index.num_decks} decks in "
+                f"{perf_counter() - started_at:.1f}s, saved to {path} "
+                f"({path.stat().st_size / 1024:.0f}KiB)"
+            )
+        )
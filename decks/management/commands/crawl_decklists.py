@@ -0,0 +1,45 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from decks.api import save_decklists
+from decks.constants import FIRST_ARKHAMDB_DECKLIST_DATE
+from decks.crawler import DecklistCrawler
+
+
+class Command(BaseCommand):
+    help = "Crawl ArkhamDB decklists by date, resuming from the last checkpoints"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--start",
+            type=date.fromisoformat,
+            default=date.fromisoformat(FIRST_ARKHAMDB_DECKLIST_DATE),
+            help="First date to crawl (inclusive), defaults to the first ArkhamDB decklist",
+        )
+        parser.add_argument(
+            "--end",
+            type=date.fromisoformat,
+            default=date.today(),
+            help="Last date to crawl (exclusive), defaults to today",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of dates to fetch concurrently",
+        )
+
+    def handle(self, *args, **options):
+        crawler = DecklistCrawler(
+            save_decklists=save_decklists, workers=options["workers"]
+        )
+        report = crawler.crawl(start=options["start"], end=options["end"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Crawled {report.dates_crawled} dates ({report.dates_skipped} skipped, "
+                f"{report.dates_failed} failed), saved {report.decks_saved} decks in "
+                f"{report.elapsed_seconds:.1f}s: {report.pages_per_sec:.2f} pages/sec, "
+                f"{report.decks_per_sec:.2f} decks/sec"
+            )
+        )
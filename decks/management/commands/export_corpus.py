@@ -0,0 +1,39 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from decks.corpus import corpus_dir, export_corpus
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the saved decklists, deck cards and cards to Parquet, partitioned by "
+        "deck creation month. Only months that changed since the last export are "
+        "written."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--directory",
+            type=Path,
+            default=None,
+            help="Where to export to, defaults to CORPUS_EXPORT_DIR",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Rewrite every month, not just the ones that changed",
+        )
+
+    def handle(self, *args, **options):
+        directory = options["directory"] or corpus_dir()
+        report = export_corpus(directory=directory, full=options["full"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote {report.months_written} months ({report.decklists_written} "
+                f"decks, {report.deck_cards_written} deck cards), removed "
+                f"{report.months_removed} and left {report.months_unchanged} "
+                f"unchanged{', and the cards' if report.cards_written else ''} in "
+                f"{report.elapsed_seconds:.1f}s, saved to {directory}"
+            )
+        )
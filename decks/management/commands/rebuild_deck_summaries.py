@@ -0,0 +1,37 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from decks.summary import SUMMARY_BATCH_SIZE, rebuild_deck_summaries, stale_decklists
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild deck summaries that are missing or out of date with their card data, "
+        "e.g. after a card sync"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Rebuild the summaries of all decks",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=SUMMARY_BATCH_SIZE,
+            help="Number of decks summarized per query",
+        )
+
+    def handle(self, *args, **options):
+        started_at = perf_counter()
+        rebuilt = rebuild_deck_summaries(
+            None if options["all"] else stale_decklists(),
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {rebuilt} deck summaries in {perf_counter() - started_at:.1f}s"
+            )
+        )
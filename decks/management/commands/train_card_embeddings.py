@@ -0,0 +1,58 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from decks.embeddings import CardEmbeddings, embeddings_dir
+
+
+class Command(BaseCommand):
+    help = (
+        "Train the card and deck embeddings served by /cards/{card_id}/similar and "
+        "/decks/{deck_id}/similar from the saved decks"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dimensions",
+            type=int,
+            default=None,
+            help="Size of the vectors, defaults to CARD_EMBEDDING_DIMENSIONS",
+        )
+        parser.add_argument(
+            "--epochs",
+            type=int,
+            default=None,
+            help="Passes over the decks, defaults to CARD_EMBEDDING_EPOCHS",
+        )
+        parser.add_argument(
+            "--min-decks",
+            type=int,
+            default=None,
+            help="Skip cards in fewer decks, defaults to CARD_EMBEDDING_MIN_DECKS",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=3,
+            help="Training threads, use 1 for reproducible vectors",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Random seed")
+
+    def handle(self, *args, **options):
+        started_at = perf_counter()
+        card_embeddings = CardEmbeddings.train(
+            dimensions=options["dimensions"],
+            epochs=options["epochs"],
+            min_decks=options["min_decks"],
+            workers=options["workers"],
+            seed=options["seed"],
+        )
+        card_embeddings.save(embeddings_dir())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Embedded {len(card_embeddings.cards)} cards and "
+                f"{len(card_embeddings.decks)} decks in "
+                f"{card_embeddings.dimensions} dimensions in "
+                f"{perf_counter() - started_at:.1f}s, saved to {embeddings_dir()}"
+            )
+        )
@@ -0,0 +1,372 @@
+from datetime import datetime, timedelta
+from logging import getLogger
+from threading import Event, Lock, Thread
+from time import monotonic, sleep
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import QuerySet
+from django.utils import timezone
+from scipy import sparse
+
+from cards.catalogue import card_catalogue
+from decks.models import DeckList, DeckCard
+
+logger = getLogger(__name__)
+
+# Rows saved in a transaction that commits after a refresh started can carry an
+# earlier modified timestamp, so every refresh reloads a little of the past as well
+MODIFIED_OVERLAP = timedelta(minutes=1)
+
+
+def changed_decklists(since: datetime) -> QuerySet:
+    """
+    (deck_id, investigator_name) of the decks that were saved, or had cards saved,
+    since the given time.
+
+    A union of two lookups rather than an OR across the DeckCard join, so each side
+    can use its modified index instead of scanning both tables.
+    """
+    decklists = DeckList.objects.values_list("deck_id", "investigator_name")
+    return decklists.filter(modified__gte=since).union(
+        decklists.filter(
+            deck_id__in=DeckCard.objects.filter(modified__gte=since).values("deck_id")
+        )
+    )
+
+
+class DeckCardMatrix:
+    """
+    In-memory sparse deck×card incidence matrix built from DeckList/DeckCard.
+
+    Rows are decks, columns are cards and values are card quantities. Deck ids, card ids
+    and investigator names are mapped to integer indexes so presence, co-occurrence and
+    inclusion queries run as vectorized sparse operations instead of DeckCard joins.
+
+    Every printing of a card has its own column. Presence, decks_containing and
+    inclusion rates count a deck with any printing of a card as containing it.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._refresh_lock = Lock()
+        self.refreshed_at: datetime | None = None
+        self.deck_ids: list[int] = []
+        self.deck_index: dict[int, int] = {}
+        self.card_ids: list[str] = []
+        self.card_index: dict[str, int] = {}
+        self.investigator_names: list[str] = []
+        self.investigator_index: dict[str, int] = {}
+        self.deck_investigators = np.empty(0, dtype=np.int32)
+        self._rows = np.empty(0, dtype=np.int32)
+        self._cols = np.empty(0, dtype=np.int32)
+        self._quantities = np.empty(0, dtype=np.int16)
+        self.quantities = sparse.csr_matrix((0, 0), dtype=np.int16)
+        self.presence_by_card = sparse.csc_matrix((0, 0), dtype=np.int32)
+        self.presence_by_deck = sparse.csr_matrix((0, 0), dtype=np.int32)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.quantities.shape
+
+    def refresh(self) -> int:
+        """
+        Loads every deck that changed since the previous refresh (or all decks on the
+        first call), drops the decks that were deleted, and returns the number of
+        decks that were (re)loaded or dropped.
+        """
+        with self._refresh_lock:
+            refresh_started = timezone.now()
+            if self.refreshed_at:
+                decklists = changed_decklists(self.refreshed_at - MODIFIED_OVERLAP)
+            else:
+                decklists = DeckList.objects.values_list("deck_id", "investigator_name")
+            changed_decks = list(decklists)
+
+            deck_cards = DeckCard.objects.all()
+            if self.refreshed_at:
+                deck_cards = deck_cards.filter(
+                    deck_id__in=[deck_id for deck_id, _ in changed_decks]
+                )
+            deck_cards = (
+                list(deck_cards.values_list("deck_id", "card_data_id", "quantity"))
+                if changed_decks
+                else []
+            )
+
+            # Deleted decks leave no modified rows behind, so the ids are compared.
+            # Read last, so decks deleted while refreshing are dropped as well.
+            deleted_deck_ids = set()
+            if self.refreshed_at:
+                deleted_deck_ids = (
+                    self.deck_index.keys() | {deck_id for deck_id, _ in changed_decks}
+                ) - set(DeckList.objects.values_list("deck_id", flat=True))
+
+            if changed_decks or deleted_deck_ids:
+                with self._lock:
+                    self._apply(changed_decks, deck_cards, deleted_deck_ids)
+                logger.info(
+                    f"Loaded {len(changed_decks)} decks into the deck/card matrix and "
+                    f"dropped {len(deleted_deck_ids)}, shape is now {self.shape}"
+                )
+            self.refreshed_at = refresh_started
+            return len(changed_decks) + len(deleted_deck_ids)
+
+    def _apply(
+        self,
+        changed_decks: list[tuple[int, str]],
+        deck_cards: list[tuple[int, str, int]],
+        deleted_deck_ids: set[int],
+    ) -> None:
+        investigators = self.deck_investigators.tolist()
+        changed_rows = []
+        for deck_id, investigator_name in changed_decks:
+            row = self.deck_index.get(deck_id)
+            if row is None:
+                row = self.deck_index[deck_id] = len(self.deck_ids)
+                self.deck_ids.append(deck_id)
+                investigators.append(0)
+            investigators[row] = self._investigator(investigator_name)
+            changed_rows.append(row)
+        self.deck_investigators = np.array(investigators, dtype=np.int32)
+
+        new_rows = np.fromiter(
+            (self.deck_index[deck_id] for deck_id, _, _ in deck_cards),
+            dtype=np.int32,
+            count=len(deck_cards),
+        )
+        new_cols = np.fromiter(
+            (self._card(card_id) for _, card_id, _ in deck_cards),
+            dtype=np.int32,
+            count=len(deck_cards),
+        )
+        new_quantities = np.fromiter(
+            (quantity for _, _, quantity in deck_cards),
+            dtype=np.int16,
+            count=len(deck_cards),
+        )
+
+        kept = ~np.isin(self._rows, np.array(changed_rows, dtype=np.int32))
+        self._rows = np.concatenate([self._rows[kept], new_rows])
+        self._cols = np.concatenate([self._cols[kept], new_cols])
+        self._quantities = np.concatenate([self._quantities[kept], new_quantities])
+        if deleted_deck_ids:
+            self._drop_decks(deleted_deck_ids)
+
+        shape = (len(self.deck_ids), len(self.card_ids))
+        self.quantities = sparse.csr_matrix(
+            (self._quantities, (self._rows, self._cols)), shape=shape
+        )
+        self.presence_by_deck = sparse.csr_matrix(
+            (np.ones_like(self._rows, dtype=np.int32), (self._rows, self._cols)),
+            shape=shape,
+        )
+        self.presence_by_card = self.presence_by_deck.tocsc()
+
+    def _drop_decks(self, deck_ids: set[int]) -> None:
+        """Removes the rows of the given decks, the rows after them move up"""
+        dropped = np.zeros(len(self.deck_ids), dtype=bool)
+        dropped[[self.deck_index[deck_id] for deck_id in deck_ids]] = True
+        # Where each row ends up once the dropped ones are gone
+        new_rows = np.cumsum(~dropped, dtype=np.int32) - 1
+        kept = ~dropped[self._rows]
+        self._rows = new_rows[self._rows[kept]]
+        self._cols = self._cols[kept]
+        self._quantities = self._quantities[kept]
+        self.deck_ids = [
+            deck_id
+            for deck_id, is_dropped in zip(self.deck_ids, dropped)
+            if not is_dropped
+        ]
+        self.deck_index = {deck_id: row for row, deck_id in enumerate(self.deck_ids)}
+        self.deck_investigators = self.deck_investigators[~dropped]
+
+    def _investigator(self, investigator_name: str) -> int:
+        if (index := self.investigator_index.get(investigator_name)) is None:
+            index = self.investigator_index[investigator_name] = len(
+                self.investigator_names
+            )
+            self.investigator_names.append(investigator_name)
+        return index
+
+    def _card(self, card_id: str) -> int:
+        if (index := self.card_index.get(card_id)) is None:
+            index = self.card_index[card_id] = len(self.card_ids)
+            self.card_ids.append(card_id)
+        return index
+
+    def _card_columns(self, card_ids: list[str]) -> np.ndarray:
+        return np.array(
+            [self.card_index.get(card_id, -1) for card_id in card_ids], dtype=np.int32
+        )
+
+    def _printing_columns(
+        self, card_ids: list[str], printings: dict[str, str]
+    ) -> tuple[np.ndarray, sparse.csr_matrix]:
+        """
+        The columns of every printing of card_ids, and a (columns, len(card_ids))
+        indicator of the card each one is a printing of. Presence in those columns
+        multiplied by it counts the printings of a card as one card.
+        """
+        positions = {}
+        for position, card_id in enumerate(card_ids):
+            positions.setdefault(printings[card_id], []).append(position)
+        cols = []
+        indicator_rows = []
+        indicator_cols = []
+        for printing, canonical_card_id in printings.items():
+            if (col := self.card_index.get(printing)) is None:
+                continue
+            for position in positions[canonical_card_id]:
+                indicator_rows.append(len(cols))
+                indicator_cols.append(position)
+            cols.append(col)
+        indicator = sparse.csr_matrix(
+            (
+                np.ones(len(indicator_rows), dtype=np.int32),
+                (indicator_rows, indicator_cols),
+            ),
+            shape=(len(cols), len(card_ids)),
+        )
+        return np.array(cols, dtype=np.int32), indicator
+
+    def presence(self, deck_ids: list[int], card_ids: list[str]) -> np.ndarray:
+        """Boolean array of shape (len(deck_ids), len(card_ids)), False for unknown ids"""
+        printings = card_catalogue.printings(card_ids)
+        with self._lock:
+            result = np.zeros((len(deck_ids), len(card_ids)), dtype=bool)
+            rows = np.array(
+                [self.deck_index.get(deck_id, -1) for deck_id in deck_ids],
+                dtype=np.int32,
+            )
+            cols, indicator = self._printing_columns(card_ids, printings)
+            known_rows = rows >= 0
+            if known_rows.any() and len(cols):
+                submatrix = self.presence_by_deck[rows[known_rows]][:, cols]
+                result[known_rows] = (submatrix @ indicator).toarray() > 0
+            return result
+
+    def decks_containing(
+        self,
+        card_ids: list[str],
+        match_all: bool = True,
+        investigator_name: str | None = None,
+    ) -> list[int]:
+        """Ids of decks containing all (or any) of the given cards, in deck_id order"""
+        printings = card_catalogue.printings(card_ids)
+        with self._lock:
+            cols, indicator = self._printing_columns(card_ids, printings)
+            known = np.asarray(indicator.sum(axis=0)).ravel() > 0
+            if match_all and not known.all():
+                return []
+            if not known.any():
+                return []
+            containing = (self.presence_by_card[:, cols] @ indicator) > 0
+            matches = np.asarray(containing.sum(axis=1)).ravel()
+            mask = matches == known.sum() if match_all else matches > 0
+            if investigator_name is not None:
+                investigator = self.investigator_index.get(investigator_name, -1)
+                mask &= self.deck_investigators == investigator
+            return sorted(self.deck_ids[row] for row in np.flatnonzero(mask))
+
+    def cooccurrence(self, card_ids: list[str] | None = None) -> sparse.csr_matrix:
+        """
+        Number of decks containing each pair of cards, as a sparse matrix of shape
+        (len(card_ids), len(self.card_ids)), or (cards, cards) if no card_ids are given
+        """
+        with self._lock:
+            if card_ids is None:
+                return (self.presence_by_card.T @ self.presence_by_deck).tocsr()
+            cols = self._card_columns(card_ids)
+            (known,) = np.nonzero(cols >= 0)
+            counts = self.presence_by_card[:, cols[known]].T @ self.presence_by_deck
+            # Scatter the rows of known cards back into place, unknown cards stay empty
+            placement = sparse.csr_matrix(
+                (np.ones(len(known), dtype=np.int32), (known, np.arange(len(known)))),
+                shape=(len(card_ids), len(known)),
+            )
+            return (placement @ counts).tocsr()
+
+    def inclusion_rates(self, card_id: str) -> dict[str, float]:
+        """Fraction of each investigator's decks that include any printing of the card"""
+        printings = card_catalogue.printings([card_id])
+        with self._lock:
+            decks_per_investigator = np.bincount(
+                self.deck_investigators, minlength=len(self.investigator_names)
+            )
+            cols, indicator = self._printing_columns([card_id], printings)
+            if not len(cols):
+                including = np.zeros_like(decks_per_investigator)
+            else:
+                containing = (self.presence_by_card[:, cols] @ indicator) > 0
+                including = np.bincount(
+                    self.deck_investigators,
+                    weights=containing.toarray().ravel(),
+                    minlength=len(self.investigator_names),
+                )
+            return {
+                investigator_name: float(
+                    including[index] / decks_per_investigator[index]
+                )
+                for index, investigator_name in enumerate(self.investigator_names)
+                if decks_per_investigator[index]
+            }
+
+
+_deck_card_matrix = DeckCardMatrix()
+_last_refresh = None
+# Set once the matrix has been loaded
+_loaded = Event()
+# Whether a background thread owns refreshes, see refresh_in_background()
+_refreshing_in_background = False
+
+
+def refresh_deck_card_matrix() -> DeckCardMatrix:
+    global _last_refresh
+    _deck_card_matrix.refresh()
+    _last_refresh = monotonic()
+    _loaded.set()
+    return _deck_card_matrix
+
+
+def get_deck_card_matrix() -> DeckCardMatrix | None:
+    """
+    The process wide matrix. When a background thread owns refreshes, waits up to
+    DECK_CARD_MATRIX_LOAD_WAIT_SECONDS for its first load and returns None if that
+    hasn't finished. Otherwise the matrix is refreshed here when it is older than the
+    configured interval.
+    """
+    if _refreshing_in_background:
+        if _loaded.wait(settings.DECK_CARD_MATRIX_LOAD_WAIT_SECONDS):
+            return _deck_card_matrix
+        return None
+    if (
+        _last_refresh is None
+        or monotonic() - _last_refresh > settings.DECK_CARD_MATRIX_REFRESH_SECONDS
+    ):
+        return refresh_deck_card_matrix()
+    return _deck_card_matrix
+
+
+def _keep_refreshed() -> None:
+    while True:
+        close_old_connections()
+        try:
+            refresh_deck_card_matrix()
+        except Exception:
+            logger.exception("Failed to refresh the deck/card matrix")
+        sleep(settings.DECK_CARD_MATRIX_REFRESH_SECONDS)
+
+
+def refresh_in_background() -> Thread:
+    """
+    Loads the process wide matrix in a daemon thread, which then refreshes it every
+    DECK_CARD_MATRIX_REFRESH_SECONDS, so requests neither pay for the first load nor
+    wait on refreshes. Started by the server, see miskatonic.asgi.
+    """
+    global _refreshing_in_background
+    _refreshing_in_background = True
+    thread = Thread(target=_keep_refreshed, name="deck-card-matrix", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,118 @@
+import re
+from logging import getLogger
+from typing import NamedTuple
+
+from bs4 import BeautifulSoup
+
+from exceptions import DeckDetailsRetrievalError
+
+logger = getLogger(__name__)
+
+SOCIAL_ICON_IDS = {
+    "likes": "social-icon-like",
+    "favorites": "social-icon-favorite",
+    "comments": "social-icon-comments",
+}
+
+SOCIAL_ICONS_START = re.compile(
+    r"""<span\b[^>]*\bclass=["'](?:[^"']*\s)?social-icons(?:\s[^"']*)?["'][^>]*>"""
+)
+SPAN_TAG = re.compile(r"<(/?)span\b[^>]*>")
+ICON_ANCHORS = {
+    field: re.compile(rf"""<a\b[^>]*\bid=["']{icon_id}["'][^>]*>(.*?)</a>""", re.DOTALL)
+    for field, icon_id in SOCIAL_ICON_IDS.items()
+}
+NUM_SPAN = re.compile(
+    r"""<span\b[^>]*\bclass=["'](?:[^"']*\s)?num(?:\s[^"']*)?["'][^>]*>\s*(\d+)\s*</span>"""
+)
+USERNAME_ANCHOR = re.compile(
+    r"""<a\b[^>]*\bclass=["'](?:[^"']*\s)?username(?:\s[^"']*)?["'][^>]*>"""
+)
+HREF = re.compile(r"""\bhref=["']([^"']*)["']""")
+AUTHOR_PROFILE = re.compile(r"\/user\/profile\/([0-9]+)\/(.+)")
+
+
+class DecklistPageMetadata(NamedTuple):
+    likes: int
+    favorites: int
+    comments: int
+    author_id: int | None
+    author_username: str | None
+
+
+def extract_decklist_metadata(html: str) -> DecklistPageMetadata:
+    """
+    Reads the social counters and author of a decklist page.
+
+    A targeted regex scan of the social-icons span handles the pages ArkhamDB
+    serves, anything it doesn't recognise goes through the full HTML parser.
+    """
+    if (metadata := extract_decklist_metadata_fast(html)) is not None:
+        return metadata
+    logger.debug("Unexpected decklist page markup, falling back to the HTML parser")
+    return extract_decklist_metadata_soup(html)
+
+
+def _author(profile_url: str | None) -> tuple[int | None, str | None]:
+    if profile_url and (author_details := AUTHOR_PROFILE.match(profile_url)):
+        return int(author_details[1]), author_details[2]
+    return None, None
+
+
+def extract_decklist_metadata_fast(html: str) -> DecklistPageMetadata | None:
+    """Regex extraction, returns None if the page doesn't look as expected"""
+    if not (start := SOCIAL_ICONS_START.search(html)):
+        return None
+    # Find where the social-icons span closes, it contains spans of its own
+    depth = 1
+    for span_tag in SPAN_TAG.finditer(html, start.end()):
+        depth += -1 if span_tag[1] else 1
+        if depth == 0:
+            break
+    else:
+        return None
+    social_icons = html[start.end() : span_tag.start()]
+
+    counts = {}
+    for field, anchor_pattern in ICON_ANCHORS.items():
+        if not (anchor := anchor_pattern.search(social_icons)):
+            counts[field] = 0
+        elif num := NUM_SPAN.search(anchor[1]):
+            counts[field] = int(num[1])
+        else:
+            return None
+
+    if not (username_anchor := USERNAME_ANCHOR.search(html)):
+        return None
+    href = HREF.search(username_anchor[0])
+    author_id, author_username = _author(href and href[1])
+    return DecklistPageMetadata(
+        **counts, author_id=author_id, author_username=author_username
+    )
+
+
+def extract_decklist_metadata_soup(html: str) -> DecklistPageMetadata:
+    soup = BeautifulSoup(html, "html.parser")
+    if not (social_icons := soup.find("span", class_="social-icons")):
+        raise DeckDetailsRetrievalError("Failed to retrieve deck metadata")
+
+    def _get_count(elem) -> int:
+        if not elem:
+            return 0
+        num = elem.find("span", class_="num")
+        if not num:
+            logger.error("Metadata count not found")
+            return 0
+        return int(num.string)
+
+    counts = {
+        field: _get_count(social_icons.find("a", id=icon_id))
+        for field, icon_id in SOCIAL_ICON_IDS.items()
+    }
+    author_link = soup.find("a", class_="username")
+    author_id, author_username = _author(
+        author_link.get("href") if author_link else None
+    )
+    return DecklistPageMetadata(
+        **counts, author_id=author_id, author_username=author_username
+    )
@@ -0,0 +1,126 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:25
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+import django_extensions.db.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("cards", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DeckList",
+            fields=[
+                (
+                    "created",
+                    django_extensions.db.fields.CreationDateTimeField(
+                        auto_now_add=True, verbose_name="created"
+                    ),
+                ),
+                (
+                    "modified",
+                    django_extensions.db.fields.ModificationDateTimeField(
+                        auto_now=True, verbose_name="modified"
+                    ),
+                ),
+                ("deck_id", models.IntegerField(primary_key=True, serialize=False)),
+                ("deck_name", models.CharField(default="", max_length=255)),
+                ("arkhamdb_creation_date", models.DateField()),
+                ("arkhamdb_update_date", models.DateField()),
+                ("description", models.TextField()),
+                ("user_id", models.IntegerField()),
+                ("investigator_code", models.CharField(max_length=255)),
+                ("investigator_name", models.CharField(max_length=255)),
+                ("likes", models.IntegerField(blank=True, null=True)),
+                ("favorites", models.IntegerField(blank=True, null=True)),
+                ("comments", models.IntegerField(blank=True, null=True)),
+                (
+                    "tags",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.CharField(
+                            choices=[
+                                ("SOLO", "Solo"),
+                                ("BEGINNER", "Beginner"),
+                                ("MULTIPLAYER", "Multiplayer"),
+                                ("THEME", "Theme"),
+                            ],
+                            max_length=64,
+                        ),
+                        default=list,
+                        size=None,
+                    ),
+                ),
+                (
+                    "player_count",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("SOLO", "Solo"),
+                            ("TWO-PLAYER", "Two-Player"),
+                            ("FOUR-PLAYER", "Four-Player"),
+                            ("MULTIPLAYER", "Multiplayer"),
+                            ("UNKNOWN", "Unknown"),
+                        ],
+                        max_length=64,
+                        null=True,
+                    ),
+                ),
+            ],
+            options={
+                "get_latest_by": "modified",
+                "abstract": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="DeckCard",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created",
+                    django_extensions.db.fields.CreationDateTimeField(
+                        auto_now_add=True, verbose_name="created"
+                    ),
+                ),
+                (
+                    "modified",
+                    django_extensions.db.fields.ModificationDateTimeField(
+                        auto_now=True, verbose_name="modified"
+                    ),
+                ),
+                ("quantity", models.IntegerField()),
+                (
+                    "card_data",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT, to="cards.cardinfo"
+                    ),
+                ),
+                (
+                    "deck",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="deck_cards",
+                        to="decks.decklist",
+                    ),
+                ),
+            ],
+            options={
+                "get_latest_by": "modified",
+                "abstract": False,
+            },
+        ),
+    ]
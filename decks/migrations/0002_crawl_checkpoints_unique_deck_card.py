@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:26
+
+import django_extensions.db.fields
+from django.db import migrations, models
+
+# Saving a deck used to create a new row whenever a card's quantity changed, keep
+# the most recently saved row for each deck and card
+DELETE_DUPLICATE_DECK_CARDS = """
+DELETE FROM decks_deckcard AS duplicate
+USING decks_deckcard AS kept
+WHERE duplicate.deck_id = kept.deck_id
+    AND duplicate.card_data_id = kept.card_data_id
+    AND (duplicate.modified, duplicate.id) < (kept.modified, kept.id)
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cards", "0002_cardinfo_payload_hash"),
+        ("decks", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DecklistCrawlCheckpoint",
+            fields=[
+                (
+                    "created",
+                    django_extensions.db.fields.CreationDateTimeField(
+                        auto_now_add=True, verbose_name="created"
+                    ),
+                ),
+                (
+                    "modified",
+                    django_extensions.db.fields.ModificationDateTimeField(
+                        auto_now=True, verbose_name="modified"
+                    ),
+                ),
+                ("date", models.DateField(primary_key=True, serialize=False)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("COMPLETE", "Complete"), ("FAILED", "Failed")],
+                        max_length=64,
+                    ),
+                ),
+                ("deck_count", models.IntegerField(default=0)),
+                ("error", models.TextField(blank=True, null=True)),
+            ],
+            options={
+                "get_latest_by": "modified",
+                "abstract": False,
+            },
+        ),
+        migrations.RunSQL(DELETE_DUPLICATE_DECK_CARDS, migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name="deckcard",
+            constraint=models.UniqueConstraint(
+                fields=("deck", "card_data"), name="unique_deck_card"
+            ),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:26
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently so the tables stay writable, which can't be done
+    # inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("decks", "0002_crawl_checkpoints_unique_deck_card"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="deckcard",
+            index=models.Index(fields=["modified"], name="deckcard_modified_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="decklist",
+            index=models.Index(
+                fields=["investigator_name", "deck_id"],
+                name="decklist_investigator_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="decklist",
+            index=models.Index(
+                fields=["arkhamdb_creation_date"], name="decklist_creation_date_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="decklist",
+            index=models.Index(
+                fields=["player_count"], name="decklist_player_count_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="decklist",
+            index=models.Index(fields=["modified"], name="decklist_modified_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="decklist",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["tags"], name="decklist_tags_gin_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,110 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:33
+
+from collections import Counter, defaultdict
+
+import django.db.models.deletion
+import django_extensions.db.fields
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+# A frozen copy of decks.summary.summarize_cards as of this migration, so later
+# changes to it leave the migration alone. Cards are (quantity, xp, cost, factions).
+def summarize_cards(cards):
+    total_xp = None
+    card_count = level_zero_count = upgraded_count = 0
+    faction_counts = Counter()
+    cost_curve = Counter()
+    for quantity, xp, cost, factions in cards:
+        card_count += quantity
+        if xp is not None:
+            total_xp = (total_xp or 0) + quantity * xp
+        if xp:
+            upgraded_count += quantity
+        else:
+            level_zero_count += quantity
+        for faction in factions:
+            faction_counts[faction] += quantity
+        if cost is not None:
+            cost_curve[str(cost)] += quantity
+    return {
+        "total_xp": total_xp,
+        "card_count": card_count,
+        "level_zero_count": level_zero_count,
+        "upgraded_count": upgraded_count,
+        "faction_counts": dict(faction_counts),
+        "cost_curve": dict(cost_curve),
+    }
+
+
+def summarize_existing_decks(apps, schema_editor):
+    DeckList = apps.get_model("decks", "DeckList")
+    DeckCard = apps.get_model("decks", "DeckCard")
+    DeckSummary = apps.get_model("decks", "DeckSummary")
+    deck_ids = list(
+        DeckList.objects.order_by("deck_id").values_list("deck_id", flat=True)
+    )
+    for start in range(0, len(deck_ids), BATCH_SIZE):
+        batch = deck_ids[start : start + BATCH_SIZE]
+        deck_cards = defaultdict(list)
+        for deck_id, *card in DeckCard.objects.filter(deck_id__in=batch).values_list(
+            "deck_id",
+            "quantity",
+            "card_data__xp",
+            "card_data__cost",
+            "card_data__factions",
+        ):
+            deck_cards[deck_id].append(card)
+        DeckSummary.objects.bulk_create(
+            DeckSummary(deck_id=deck_id, **summarize_cards(deck_cards[deck_id]))
+            for deck_id in batch
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("decks", "0003_decklist_deckcard_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DeckSummary",
+            fields=[
+                (
+                    "created",
+                    django_extensions.db.fields.CreationDateTimeField(
+                        auto_now_add=True, verbose_name="created"
+                    ),
+                ),
+                (
+                    "modified",
+                    django_extensions.db.fields.ModificationDateTimeField(
+                        auto_now=True, verbose_name="modified"
+                    ),
+                ),
+                (
+                    "deck",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="summary",
+                        serialize=False,
+                        to="decks.decklist",
+                    ),
+                ),
+                ("total_xp", models.IntegerField(blank=True, null=True)),
+                ("card_count", models.IntegerField(default=0)),
+                ("level_zero_count", models.IntegerField(default=0)),
+                ("upgraded_count", models.IntegerField(default=0)),
+                ("faction_counts", models.JSONField(blank=True, default=dict)),
+                ("cost_curve", models.JSONField(blank=True, default=dict)),
+            ],
+            options={
+                "get_latest_by": "modified",
+                "abstract": False,
+            },
+        ),
+        migrations.RunPython(summarize_existing_decks, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,11 @@
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 
 from django_extensions.db.models import TimeStampedModel
 
 from cards.models import CardInfo
-from constants import DeckTag, PlayerCounts
+from constants import CrawlStatus, DeckTag, PlayerCounts
 
 
 # class Investigator(TimeStampedModel):
@@ -55,6 +56,22 @@ class DeckList(TimeStampedModel):
         ).choices,
     )
 
+    class Meta(TimeStampedModel.Meta):
+        indexes = [
+            # Breakdowns filter on the investigator and page through decks by id
+            models.Index(
+                fields=["investigator_name", "deck_id"],
+                name="decklist_investigator_idx",
+            ),
+            models.Index(
+                fields=["arkhamdb_creation_date"], name="decklist_creation_date_idx"
+            ),
+            models.Index(fields=["player_count"], name="decklist_player_count_idx"),
+            # Incremental deck/card matrix refreshes look for recently modified decks
+            models.Index(fields=["modified"], name="decklist_modified_idx"),
+            GinIndex(fields=["tags"], name="decklist_tags_gin_idx"),
+        ]
+
 
 class DeckCard(TimeStampedModel):
     deck = models.ForeignKey(
@@ -68,3 +85,48 @@ class DeckCard(TimeStampedModel):
         CardInfo, on_delete=models.PROTECT, blank=False, null=False
     )
     quantity = models.IntegerField()
+
+    class Meta(TimeStampedModel.Meta):
+        constraints = [
+            models.UniqueConstraint(
+                fields=["deck", "card_data"], name="unique_deck_card"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["modified"], name="deckcard_modified_idx"),
+        ]
+
+
+class DeckSummary(TimeStampedModel):
+    # Aggregates of a deck's cards, rebuilt whenever the deck is saved
+    deck = models.OneToOneField(
+        DeckList,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="summary",
+    )
+    # None when none of the deck's cards have an XP value
+    total_xp = models.IntegerField(blank=True, null=True)
+    card_count = models.IntegerField(default=0)
+    level_zero_count = models.IntegerField(default=0)
+    upgraded_count = models.IntegerField(default=0)
+    # Number of cards of each faction, multi-faction cards count towards each one
+    faction_counts = models.JSONField(default=dict, blank=True)
+    # Number of cards at each resource cost, cards without a cost are left out
+    cost_curve = models.JSONField(default=dict, blank=True)
+
+
+class DecklistCrawlCheckpoint(TimeStampedModel):
+    # One row per ArkhamDB by_date page, so an interrupted crawl can resume
+    date = models.DateField(null=False, blank=False, primary_key=True)
+    status = models.CharField(
+        max_length=64,
+        blank=False,
+        null=False,
+        choices=models.TextChoices(
+            "CrawlStatuses",
+            " ".join([crawl_status.upper() for crawl_status in CrawlStatus]),
+        ).choices,
+    )
+    deck_count = models.IntegerField(default=0)
+    error = models.TextField(blank=True, null=True)
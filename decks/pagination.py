@@ -0,0 +1,64 @@
+import base64
+import binascii
+import json
+from bisect import bisect_right
+from typing import Sequence
+
+from django.db.models import QuerySet
+
+from exceptions import InvalidCursorError
+
+# Response header carrying the cursor of the next page, absent on the last page
+NEXT_CURSOR_HEADER = "Next-Cursor"
+
+
+def encode_cursor(last_deck_id: int) -> str:
+    """Opaque token for the page that starts after last_deck_id"""
+    payload = json.dumps({"after": last_deck_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """The last deck id of the previous page"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        last_deck_id = json.loads(payload)["after"]
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError):
+        raise InvalidCursorError(f"Invalid cursor: {cursor}")
+    if not isinstance(last_deck_id, int):
+        raise InvalidCursorError(f"Invalid cursor: {cursor}")
+    return last_deck_id
+
+
+def after_cursor(decklists: QuerySet, cursor: str | None) -> QuerySet:
+    """
+    Decks after the cursor, in deck_id order.
+
+    Seeks straight to the page through the primary key instead of reading and throwing
+    away every deck before it like an offset does, so paging through all decks stays
+    linear in the number of decks.
+    """
+    decklists = decklists.order_by("deck_id")
+    if cursor is None:
+        return decklists
+    return decklists.filter(deck_id__gt=decode_cursor(cursor))
+
+
+def next_cursor(deck_ids: Sequence[int], page_size: int) -> str | None:
+    """Cursor of the page after a page of deck_ids, None if it was the last one"""
+    if page_size <= 0 or len(deck_ids) < page_size:
+        return None
+    return encode_cursor(deck_ids[-1])
+
+
+def paginate_deck_ids(
+    deck_ids: Sequence[int], cursor: str | None, page_size: int | None
+) -> tuple[Sequence[int], str | None]:
+    """A page of already sorted deck ids and the cursor of the next one"""
+    start = bisect_right(deck_ids, decode_cursor(cursor)) if cursor else 0
+    if page_size is None:
+        return deck_ids[start:], None
+    page = deck_ids[start : start + page_size]
+    if start + page_size >= len(deck_ids):
+        return page, None
+    return page, encode_cursor(page[-1])
@@ -0,0 +1,125 @@
+from typing import Iterable
+
+from Levenshtein import matching_blocks, opcodes, ratio
+from rapidfuzz import fuzz
+
+from constants import PlayerCounts
+from decks.constants import PLAYER_COUNT_KEYWORDS, PLAYER_COUNT_MATCH_THRESHOLD
+
+PLAYER_COUNTS = {
+    1: PlayerCounts.SOLO,
+    2: PlayerCounts.TWO_PLAYER,
+    4: PlayerCounts.FOUR_PLAYER,
+}
+
+# Allowance for rounding differences between rapidfuzz's scores and ours
+SCORE_EPSILON = 1e-9
+
+
+def partial_ratio(s1: str, s2: str) -> int:
+    """
+    Same score as fuzzywuzzy's fuzz.partial_ratio (backed by python-Levenshtein),
+    without its per call overhead.
+
+    Only the windows of the longer string that line up with the matching blocks of
+    one edit path are scored, so this can be lower than the best possible partial
+    match (and lower than 100 for an exact substring of a long text).
+    """
+    if not s1 or not s2:
+        return 0
+    if s1 == s2:
+        return 100
+    shorter, longer = (s1, s2) if len(s1) <= len(s2) else (s2, s1)
+    best = 0.0
+    scored_starts = set()
+    for block in matching_blocks(opcodes(shorter, longer), shorter, longer):
+        long_start = max(block[1] - block[0], 0)
+        if long_start in scored_starts:
+            continue
+        scored_starts.add(long_start)
+        score = ratio(shorter, longer[long_start : long_start + len(shorter)])
+        if score > 0.995:
+            return 100
+        best = max(best, score)
+    return int(round(100 * best))
+
+
+class PlayerCountClassifier:
+    """
+    Guesses the player count a deck was built for from its tags, title and description.
+
+    A deck tagged solo is solo, and a deck tagged multiplayer only considers the
+    multiplayer keywords. Otherwise the keyword that best fuzzy matches the title wins
+    if it scores over the threshold, then the same goes for the description. On equal
+    scores the earlier keyword wins.
+
+    Only scores over the threshold matter, so rapidfuzz's partial_ratio, which is never
+    lower than partial_ratio above, is used with a cutoff to skip the keywords that
+    can't beat the best match so far. Most keywords never get an exact score.
+    """
+
+    def __init__(
+        self,
+        keywords: dict[int, list[str]] = PLAYER_COUNT_KEYWORDS,
+        threshold: int = PLAYER_COUNT_MATCH_THRESHOLD,
+    ):
+        self.threshold = threshold
+        self._keywords = [
+            (keyword, PLAYER_COUNTS[players])
+            for players, player_keywords in keywords.items()
+            for keyword in player_keywords
+        ]
+        self._multiplayer_keywords = [
+            (keyword, player_count)
+            for keyword, player_count in self._keywords
+            if player_count != PlayerCounts.SOLO
+        ]
+
+    def classify(
+        self, deck_title: str, deck_description: str | None, tags: list[str]
+    ) -> PlayerCounts:
+        tags = [tag.lower() for tag in tags]
+        if "solo" in tags:
+            return PlayerCounts.SOLO
+        keywords = (
+            self._multiplayer_keywords if "multiplayer" in tags else self._keywords
+        )
+        return (
+            self._best_match(deck_title.lower(), keywords)
+            or self._best_match((deck_description or "").lower(), keywords)
+            or PlayerCounts.UNKNOWN
+        )
+
+    def classify_many(
+        self, decks: Iterable[tuple[str, str | None, list[str]]]
+    ) -> list[PlayerCounts]:
+        """Classifies (title, description, tags) for a batch of decks"""
+        return [
+            self.classify(deck_title, deck_description, tags)
+            for deck_title, deck_description, tags in decks
+        ]
+
+    def _best_match(
+        self, text: str, keywords: list[tuple[str, PlayerCounts]]
+    ) -> PlayerCounts | None:
+        """Player count of the first keyword with the highest score over the threshold"""
+        if not text:
+            return None
+        best_score = self.threshold
+        best_player_count = None
+        for keyword, player_count in keywords:
+            # Rounds to a higher score than the best so far only from best + 0.5
+            if not fuzz.partial_ratio(
+                keyword, text, score_cutoff=best_score + 0.5 - SCORE_EPSILON
+            ):
+                continue
+            score = partial_ratio(keyword, text)
+            if score > best_score:
+                best_score = score
+                best_player_count = player_count
+                if best_score == 100:
+                    break
+        return best_player_count
+
+
+player_count_classifier = PlayerCountClassifier()
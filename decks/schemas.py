@@ -1,12 +1,15 @@
 from ninja import ModelSchema, Schema
+from pydantic import validator
 
 from decks.models import DeckList
+from decks.pagination import decode_cursor
+from exceptions import InvalidCursorError
 
 
 class DeckListSchema(ModelSchema):
-    class Config:
+    class Meta:
         model = DeckList
-        model_fields = "__all__"
+        fields = "__all__"
 
 
 class DeckListBreakdownSchema(Schema):
@@ -15,8 +18,62 @@ class DeckListBreakdownSchema(Schema):
     deck_xp: int
 
 
+def _validate_cursor(cursor: str | None) -> str | None:
+    if cursor is not None:
+        try:
+            decode_cursor(cursor)
+        except InvalidCursorError as e:
+            raise ValueError(str(e))
+    return cursor
+
+
 class DecklistsRequestSchema(Schema):
     investigator_name: str | None
     card_ids: list[str]
     num_entities: int
-    offset: int
+    # Deep offsets get slower and slower, prefer the cursor from the Next-Cursor header
+    offset: int = 0
+    cursor: str | None = None
+
+    @validator("cursor")
+    def validate_cursor(cls, cursor, values):
+        if cursor is not None and values.get("offset"):
+            raise ValueError("Pass either a cursor or an offset, not both")
+        return _validate_cursor(cursor)
+
+
+class DecksContainingRequestSchema(Schema):
+    card_ids: list[str]
+    match_all: bool = True
+    investigator_name: str | None = None
+    # All matching decks are returned unless a page size is given
+    page_size: int | None = None
+    cursor: str | None = None
+
+    _validate_cursor = validator("cursor", allow_reuse=True)(_validate_cursor)
+
+
+class SimilarDeckSchema(Schema):
+    deck_id: int
+    # Cosine similarity of the deck embeddings, from -1 to 1
+    similarity: float
+
+
+class CorpusExportReportSchema(Schema):
+    months_written: int
+    months_removed: int
+    months_unchanged: int
+    cards_written: bool
+    decklists_written: int
+    deck_cards_written: int
+    elapsed_seconds: float
+
+
+class DecklistCrawlReportSchema(Schema):
+    dates_crawled: int
+    dates_skipped: int
+    dates_failed: int
+    decks_saved: int
+    elapsed_seconds: float
+    pages_per_sec: float
+    decks_per_sec: float
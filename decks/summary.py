@@ -0,0 +1,118 @@
+from collections import Counter, defaultdict
+from logging import getLogger
+from typing import Iterable, NamedTuple
+
+from django.db import transaction
+from django.db.models import F, Q, QuerySet
+
+from cards.models import CardInfo
+from decks.models import DeckCard, DeckList, DeckSummary
+from decks.pagination import after_cursor, encode_cursor
+
+logger = getLogger(__name__)
+
+SUMMARY_BATCH_SIZE = 1000
+
+SUMMARY_UPDATE_FIELDS = [
+    field.name
+    for field in DeckSummary._meta.concrete_fields
+    if field.name not in ("deck", "created")
+]
+
+
+class CardStats(NamedTuple):
+    xp: int | None
+    cost: int | None
+    factions: list[str]
+
+
+def card_stats(card_ids: Iterable[str]) -> dict[str, CardStats]:
+    """The card data deck summaries are built from, for the known cards among card_ids"""
+    return {
+        card_id: CardStats(xp, cost, factions)
+        for card_id, xp, cost, factions in CardInfo.objects.filter(
+            card_id__in=card_ids
+        ).values_list("card_id", "xp", "cost", "factions")
+    }
+
+
+def summarize_cards(cards: Iterable[tuple[int, CardStats]]) -> dict:
+    """DeckSummary fields for a deck made of (quantity, card stats) pairs"""
+    total_xp = None
+    card_count = level_zero_count = upgraded_count = 0
+    faction_counts = Counter()
+    cost_curve = Counter()
+    for quantity, card in cards:
+        card_count += quantity
+        if card.xp is not None:
+            total_xp = (total_xp or 0) + quantity * card.xp
+        if card.xp:
+            upgraded_count += quantity
+        else:
+            level_zero_count += quantity
+        for faction in card.factions:
+            faction_counts[faction] += quantity
+        if card.cost is not None:
+            cost_curve[str(card.cost)] += quantity
+    return {
+        "total_xp": total_xp,
+        "card_count": card_count,
+        "level_zero_count": level_zero_count,
+        "upgraded_count": upgraded_count,
+        "faction_counts": dict(faction_counts),
+        "cost_curve": dict(cost_curve),
+    }
+
+
+def save_deck_summaries(summaries: list[DeckSummary]) -> None:
+    DeckSummary.objects.bulk_create(
+        summaries,
+        update_conflicts=True,
+        unique_fields=["deck"],
+        update_fields=SUMMARY_UPDATE_FIELDS,
+    )
+
+
+def stale_decklists() -> QuerySet:
+    """
+    Decks without a summary, or with a card whose data changed after the summary was
+    built (e.g. by a card sync)
+    """
+    return DeckList.objects.filter(
+        Q(summary__isnull=True)
+        | Q(deck_cards__card_data__modified__gt=F("summary__modified"))
+    ).distinct()
+
+
+def rebuild_deck_summaries(
+    decklists: QuerySet | None = None, batch_size: int = SUMMARY_BATCH_SIZE
+) -> int:
+    """Rebuilds the summaries of the given decks (all of them by default) in batches"""
+    decklists = DeckList.objects.all() if decklists is None else decklists
+    rebuilt = 0
+    cursor = None
+    while deck_ids := list(
+        after_cursor(decklists, cursor).values_list("deck_id", flat=True)[:batch_size]
+    ):
+        deck_cards = defaultdict(list)
+        for deck_id, quantity, xp, cost, factions in DeckCard.objects.filter(
+            deck_id__in=deck_ids
+        ).values_list(
+            "deck_id",
+            "quantity",
+            "card_data__xp",
+            "card_data__cost",
+            "card_data__factions",
+        ):
+            deck_cards[deck_id].append((quantity, CardStats(xp, cost, factions)))
+        with transaction.atomic():
+            save_deck_summaries(
+                [
+                    DeckSummary(deck_id=deck_id, **summarize_cards(deck_cards[deck_id]))
+                    for deck_id in deck_ids
+                ]
+            )
+        rebuilt += len(deck_ids)
+        cursor = encode_cursor(deck_ids[-1])
+        logger.info(f"Rebuilt {rebuilt} deck summaries")
+    return rebuilt
@@ -0,0 +1,224 @@
+from datetime import date
+from logging import getLogger
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+from django.conf import settings
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.text import slugify
+
+from decks.models import DeckCard
+from miskatonic.files import FileCache, atomic_write
+
+logger = getLogger(__name__)
+
+# Cards whose co-occurrences are counted at once, bounds the memory used by a build
+BUILD_BLOCK_SIZE = 256
+
+
+class CardSynergy(NamedTuple):
+    card_id: str
+    decks: int
+    lift: float
+    pmi: float
+
+
+def synergy_index_path(
+    investigator_name: str | None = None,
+    since: date | None = None,
+    until: date | None = None,
+) -> Path:
+    """Where the index for an investigator (or all of them) and a time window is kept"""
+    name = "synergies"
+    if investigator_name:
+        name += f"__{slugify(investigator_name)}"
+    if since or until:
+        name += f"__{since or 'start'}_{until or 'end'}"
+    return Path(settings.SYNERGY_INDEX_DIR) / f"{name}.npz"
+
+
+class SynergyIndex:
+    """
+    The cards most often played with each card, by lift: how many times more often
+    two cards are in a deck together than if they were picked independently. PMI is
+    its log.
+
+    Only the top k partners of each card are kept, as (cards, k) arrays padded with
+    -1, so a lookup is a dict lookup and a row slice.
+    """
+
+    def __init__(
+        self,
+        card_ids: list[str],
+        card_decks: np.ndarray,
+        neighbors: np.ndarray,
+        cooccurrences: np.ndarray,
+        lifts: np.ndarray,
+        num_decks: int,
+        built_at: str,
+    ):
+        self.card_ids = card_ids
+        self.card_index = {card_id: index for index, card_id in enumerate(card_ids)}
+        self.card_decks = card_decks
+        self.neighbors = neighbors
+        self.cooccurrences = cooccurrences
+        self.lifts = lifts
+        self.num_decks = num_decks
+        self.built_at = built_at
+
+    @classmethod
+    def build(
+        cls,
+        investigator_name: str | None = None,
+        since: date | None = None,
+        until: date | None = None,
+        top_k: int | None = None,
+        min_decks: int | None = None,
+    ) -> "SynergyIndex":
+        """
+        Counts co-occurrences over the decks of an investigator (or all of them)
+        created in [since, until), a block of cards at a time. Reprints are counted
+        as their first printing.
+        """
+        from scipy import sparse
+
+        if top_k is None:
+            top_k = settings.SYNERGY_INDEX_TOP_K
+        if min_decks is None:
+            min_decks = settings.SYNERGY_MIN_DECKS
+        deck_cards = DeckCard.objects.all()
+        if investigator_name:
+            deck_cards = deck_cards.filter(deck__investigator_name=investigator_name)
+        if since:
+            deck_cards = deck_cards.filter(deck__arkhamdb_creation_date__gte=since)
+        if until:
+            deck_cards = deck_cards.filter(deck__arkhamdb_creation_date__lt=until)
+
+        deck_index = {}
+        card_index = {}
+        rows = []
+        cols = []
+        for deck_id, card_id in (
+            deck_cards.annotate(
+                canonical_card_id=Coalesce(
+                    "card_data__canonical_card_id", "card_data_id"
+                )
+            )
+            .values_list("deck_id", "canonical_card_id")
+            .iterator(chunk_size=10000)
+        ):
+            rows.append(deck_index.setdefault(deck_id, len(deck_index)))
+            cols.append(card_index.setdefault(card_id, len(card_index)))
+        card_ids = list(card_index)
+        num_decks = len(deck_index)
+        presence = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+            shape=(num_decks, len(card_ids)),
+        )
+        # A deck with two printings of a card still contains it once
+        presence.sum_duplicates()
+        presence.data[:] = 1
+        card_decks = np.asarray(presence.sum(axis=0)).ravel().astype(np.int32)
+        # Products of deck counts overflow 32 bit integers on the full corpus
+        card_frequencies = card_decks.astype(np.float64) / max(num_decks, 1)
+
+        neighbors = np.full((len(card_ids), top_k), -1, dtype=np.int32)
+        cooccurrences = np.zeros((len(card_ids), top_k), dtype=np.int32)
+        lifts = np.zeros((len(card_ids), top_k), dtype=np.float32)
+        presence_by_card = presence.tocsc()
+        for start in range(0, len(card_ids), BUILD_BLOCK_SIZE):
+            block = (
+                presence_by_card[:, start : start + BUILD_BLOCK_SIZE].T @ presence
+            ).tocsr()
+            for offset in range(block.shape[0]):
+                card = start + offset
+                row = slice(block.indptr[offset], block.indptr[offset + 1])
+                partners, counts = block.indices[row], block.data[row]
+                kept = (counts >= min_decks) & (partners != card)
+                partners, counts = partners[kept], counts[kept]
+                lift = (counts / max(num_decks, 1)) / (
+                    card_frequencies[card] * card_frequencies[partners]
+                )
+                # Highest lift first, more decks together breaks ties
+                top = np.lexsort((partners, -counts, -lift))[:top_k]
+                neighbors[card, : len(top)] = partners[top]
+                cooccurrences[card, : len(top)] = counts[top]
+                lifts[card, : len(top)] = lift[top]
+
+        logger.info(
+            f"Built a synergy index of {len(card_ids)} cards over {num_decks} decks"
+        )
+        return cls(
+            card_ids=card_ids,
+            card_decks=card_decks,
+            neighbors=neighbors,
+            cooccurrences=cooccurrences,
+            lifts=lifts,
+            num_decks=num_decks,
+            built_at=timezone.now().isoformat(),
+        )
+
+    def save(self, path: Path) -> None:
+        with atomic_write(path) as index_file:
+            np.savez_compressed(
+                index_file,
+                card_ids=np.array(self.card_ids, dtype=str),
+                card_decks=self.card_decks,
+                neighbors=self.neighbors,
+                cooccurrences=self.cooccurrences,
+                lifts=self.lifts,
+                num_decks=self.num_decks,
+                built_at=self.built_at,
+            )
+
+    @classmethod
+    def load(cls, path: Path) -> "SynergyIndex":
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls(
+                card_ids=arrays["card_ids"].tolist(),
+                card_decks=arrays["card_decks"],
+                neighbors=arrays["neighbors"],
+                cooccurrences=arrays["cooccurrences"],
+                lifts=arrays["lifts"],
+                num_decks=int(arrays["num_decks"]),
+                built_at=str(arrays["built_at"]),
+            )
+
+    def decks_with(self, card_id: str) -> int:
+        if (card := self.card_index.get(card_id)) is None:
+            return 0
+        return int(self.card_decks[card])
+
+    def top(self, card_id: str, k: int = 10) -> list[CardSynergy]:
+        """Up to k cards with the highest lift with card_id"""
+        if (card := self.card_index.get(card_id)) is None:
+            return []
+        neighbors = self.neighbors[card, :k]
+        neighbors = neighbors[neighbors >= 0].tolist()
+        return [
+            CardSynergy(
+                card_id=self.card_ids[neighbor],
+                decks=int(decks),
+                lift=round(float(lift), 4),
+                pmi=round(float(np.log(lift)), 4),
+            )
+            for neighbor, decks, lift in zip(
+                neighbors,
+                self.cooccurrences[card, : len(neighbors)],
+                self.lifts[card, : len(neighbors)],
+            )
+        ]
+
+
+_synergy_indexes = FileCache(SynergyIndex.load)
+
+
+def get_synergy_index(
+    investigator_name: str | None = None,
+    since: date | None = None,
+    until: date | None = None,
+) -> SynergyIndex | None:
+    """The saved index, kept in memory and reloaded when it is rebuilt"""
+    return _synergy_indexes.get(synergy_index_path(investigator_name, since, until))
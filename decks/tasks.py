@@ -0,0 +1,33 @@
+from datetime import date
+
+from decks import corpus
+from decks.api import save_decklists
+from decks.crawler import DecklistCrawler
+from jobs.queue import JobContext
+
+
+def fetch_latest_decklists(job: JobContext) -> dict:
+    """
+    Crawls the decklists published between the start and end dates. A crawl that is
+    stopped and run again resumes from its checkpoints.
+    """
+    start = date.fromisoformat(job.arguments["start"])
+    end = date.fromisoformat(job.arguments["end"])
+    crawler = DecklistCrawler(
+        save_decklists=save_decklists,
+        on_progress=lambda report: job.progress(
+            dates_total=(end - start).days, **report.dict()
+        ),
+    )
+    return crawler.crawl(start=start, end=end).dict()
+
+
+def export_corpus(job: JobContext) -> dict:
+    """
+    Exports the decks that changed since the last export to Parquet, see decks.corpus.
+    A stopped export keeps the months it finished.
+    """
+    return corpus.export_corpus(
+        full=job.arguments.get("full", False),
+        on_progress=lambda report: job.progress(**report.dict()),
+    ).dict()
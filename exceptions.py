@@ -29,3 +29,27 @@ class UserInfoRetrievalError(MiskatonicException):
     """
     Indicates a failure to retrieve user data from ArkhamDB
     """
+
+
+class NLPResourceError(MiskatonicException):
+    """
+    Indicates that NLTK data needed for text processing isn't available locally
+    """
+
+
+class InvalidCursorError(MiskatonicException):
+    """
+    Indicates a pagination cursor that wasn't issued by this API
+    """
+
+
+class JobCancelledError(MiskatonicException):
+    """
+    Indicates that a background job was cancelled while it was running
+    """
+
+
+class UnknownJobKindError(MiskatonicException):
+    """
+    Indicates a background job of a kind that no function is registered for
+    """
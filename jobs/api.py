@@ -0,0 +1,38 @@
+from asgiref.sync import sync_to_async
+from ninja import Router
+from ninja.errors import HttpError
+
+from constants import JobStatus
+from jobs import queue
+from jobs.models import Job
+from jobs.schemas import JobSchema
+
+router = Router()
+
+
+@router.get("/", response=list[JobSchema])
+async def jobs(
+    request, status: JobStatus | None = None, limit: int = 50
+) -> list[JobSchema]:
+    """The most recently queued jobs, optionally only those with a status"""
+    queryset = Job.objects.order_by("-id")
+    if status is not None:
+        queryset = queryset.filter(status=status)
+    return [job async for job in queryset[:limit]]
+
+
+@router.get("/{job_id}", response=JobSchema)
+async def job(request, job_id: int) -> JobSchema:
+    """A job's status, and its progress while it runs or its result once it's done"""
+    try:
+        return await Job.objects.aget(id=job_id)
+    except Job.DoesNotExist:
+        raise HttpError(404, f"Job {job_id} does not exist")
+
+
+@router.post("/{job_id}/cancel", response=JobSchema)
+async def cancel_job(request, job_id: int) -> JobSchema:
+    try:
+        return await sync_to_async(queue.cancel)(job_id)
+    except Job.DoesNotExist:
+        raise HttpError(404, f"Job {job_id} does not exist")
@@ -0,0 +1,30 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from jobs.worker import JobWorker
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs until stopped"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=None,
+            help="Number of jobs to run at once, defaults to JOB_WORKER_CONCURRENCY",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once the queue is empty instead of waiting for more jobs",
+        )
+
+    def handle(self, *args, **options):
+        worker = JobWorker(concurrency=options["concurrency"])
+        # Running jobs are requeued rather than lost when the worker is stopped
+        for stop_signal in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(stop_signal, lambda *_: worker.stop())
+        jobs_run = worker.run(burst=options["burst"])
+        self.stdout.write(self.style.SUCCESS(f"Ran {jobs_run} jobs"))
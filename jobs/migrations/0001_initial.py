@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:04
+
+import constants
+import django_extensions.db.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="Job",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created",
+                    django_extensions.db.fields.CreationDateTimeField(
+                        auto_now_add=True, verbose_name="created"
+                    ),
+                ),
+                (
+                    "modified",
+                    django_extensions.db.fields.ModificationDateTimeField(
+                        auto_now=True, verbose_name="modified"
+                    ),
+                ),
+                ("kind", models.CharField(max_length=64)),
+                ("arguments", models.JSONField(blank=True, default=dict)),
+                ("dedup_key", models.CharField(max_length=64)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("QUEUED", "Queued"),
+                            ("RUNNING", "Running"),
+                            ("SUCCEEDED", "Succeeded"),
+                            ("FAILED", "Failed"),
+                            ("CANCELLED", "Cancelled"),
+                        ],
+                        default=constants.JobStatus["QUEUED"],
+                        max_length=64,
+                    ),
+                ),
+                ("cancel_requested", models.BooleanField(default=False)),
+                ("progress", models.JSONField(blank=True, default=dict)),
+                ("result", models.JSONField(blank=True, null=True)),
+                ("error", models.TextField(blank=True, null=True)),
+                ("attempts", models.IntegerField(default=0)),
+                ("worker", models.CharField(blank=True, max_length=255, null=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("heartbeat_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "get_latest_by": "modified",
+                "abstract": False,
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status", constants.JobStatus["QUEUED"])),
+                        fields=["id"],
+                        name="jobs_job_queued_idx",
+                    ),
+                    models.Index(
+                        condition=models.Q(("status", constants.JobStatus["RUNNING"])),
+                        fields=["heartbeat_at"],
+                        name="jobs_job_running_idx",
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(
+                            (
+                                "status__in",
+                                [
+                                    constants.JobStatus["QUEUED"],
+                                    constants.JobStatus["RUNNING"],
+                                ],
+                            )
+                        ),
+                        fields=("dedup_key",),
+                        name="jobs_job_in_flight_dedup_key",
+                    )
+                ],
+            },
+        ),
+    ]
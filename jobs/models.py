@@ -0,0 +1,58 @@
+from django.db import models
+
+from django_extensions.db.models import TimeStampedModel
+
+from constants import JobStatus
+
+IN_FLIGHT_STATUSES = [JobStatus.QUEUED, JobStatus.RUNNING]
+
+
+class Job(TimeStampedModel):
+    # A unit of background work, queued by the API and run by manage.py run_jobs
+    kind = models.CharField(max_length=64, blank=False, null=False)
+    arguments = models.JSONField(default=dict, blank=True)
+    # Hash of kind and arguments, at most one identical job is queued or running
+    dedup_key = models.CharField(max_length=64, blank=False, null=False)
+    status = models.CharField(
+        max_length=64,
+        blank=False,
+        null=False,
+        default=JobStatus.QUEUED,
+        choices=models.TextChoices(
+            "JobStatuses",
+            " ".join([job_status.upper() for job_status in JobStatus]),
+        ).choices,
+    )
+    # Set to stop a running job, the worker notices at its next heartbeat
+    cancel_requested = models.BooleanField(default=False)
+    progress = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+    attempts = models.IntegerField(default=0)
+    worker = models.CharField(max_length=255, blank=True, null=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta(TimeStampedModel.Meta):
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dedup_key"],
+                condition=models.Q(status__in=IN_FLIGHT_STATUSES),
+                name="jobs_job_in_flight_dedup_key",
+            ),
+        ]
+        indexes = [
+            # Workers claim the oldest queued job
+            models.Index(
+                fields=["id"],
+                condition=models.Q(status=JobStatus.QUEUED),
+                name="jobs_job_queued_idx",
+            ),
+            # Heartbeats of running jobs are checked for stalled workers
+            models.Index(
+                fields=["heartbeat_at"],
+                condition=models.Q(status=JobStatus.RUNNING),
+                name="jobs_job_running_idx",
+            ),
+        ]
@@ -0,0 +1,177 @@
+"""
+Background jobs, queued in a Postgres table and run by manage.py run_jobs.
+
+Endpoints with minutes or hours of work enqueue() it and return the job, which is
+then polled for its progress and result.
+"""
+
+import hashlib
+import json
+from datetime import timedelta
+from threading import Event
+from typing import Callable
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from constants import JobStatus
+from exceptions import JobCancelledError, UnknownJobKindError
+from jobs.models import IN_FLIGHT_STATUSES, Job
+
+# The function run for each kind of job. It's passed a JobContext and returns the
+# job's result, which must be JSON serializable.
+JOB_FUNCTIONS = {
+    "fetch_cards": "cards.tasks.fetch_cards",
+    "fetch_latest_decklists": "decks.tasks.fetch_latest_decklists",
+    "export_corpus": "decks.tasks.export_corpus",
+}
+
+
+def job_function(kind: str) -> Callable[["JobContext"], dict | None]:
+    try:
+        return import_string(JOB_FUNCTIONS[kind])
+    except KeyError:
+        raise UnknownJobKindError(f"No function is registered for {kind} jobs")
+
+
+def job_dedup_key(kind: str, arguments: dict) -> str:
+    normalized = json.dumps([kind, arguments], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def enqueue(kind: str, arguments: dict | None = None) -> tuple[Job, bool]:
+    """
+    Queues a job, unless an identical one is already queued or running. Returns that
+    job, and whether it was queued by this call.
+    """
+    job_function(kind)
+    arguments = arguments or {}
+    dedup_key = job_dedup_key(kind, arguments)
+    while True:
+        try:
+            with transaction.atomic():
+                job = Job.objects.create(
+                    kind=kind, arguments=arguments, dedup_key=dedup_key
+                )
+            return job, True
+        except IntegrityError:
+            # Retried if the identical job finished in the meantime
+            job = Job.objects.filter(
+                dedup_key=dedup_key, status__in=IN_FLIGHT_STATUSES
+            ).first()
+            if job is not None:
+                return job, False
+
+
+def cancel(job_id: int) -> Job:
+    """
+    Cancels a queued job straight away. A running job is stopped by its worker, at its
+    next heartbeat and progress report.
+    """
+    now = timezone.now()
+    Job.objects.filter(id=job_id, status=JobStatus.QUEUED).update(
+        status=JobStatus.CANCELLED, cancel_requested=True, finished_at=now, modified=now
+    )
+    Job.objects.filter(id=job_id, status=JobStatus.RUNNING).update(
+        cancel_requested=True, modified=now
+    )
+    return Job.objects.get(id=job_id)
+
+
+def claim(worker: str) -> Job | None:
+    """
+    Marks the oldest queued job as running on worker. Rows locked by other workers'
+    claims are skipped rather than waited on, so no two workers claim the same job.
+    """
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=JobStatus.QUEUED)
+            .order_by("id")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = JobStatus.RUNNING
+        job.worker = worker
+        job.attempts += 1
+        job.started_at = job.heartbeat_at = timezone.now()
+        job.save(
+            update_fields=[
+                "status",
+                "worker",
+                "attempts",
+                "started_at",
+                "heartbeat_at",
+                "modified",
+            ]
+        )
+    return job
+
+
+def finish(job: Job, status: JobStatus, **fields) -> None:
+    """Records how a job ended, unless it was taken from this worker as stalled"""
+    now = timezone.now()
+    Job.objects.filter(id=job.id, status=JobStatus.RUNNING, worker=job.worker).update(
+        status=status, finished_at=now, modified=now, **fields
+    )
+
+
+def requeue(job: Job) -> None:
+    """Puts a job that was stopped before it finished back in the queue"""
+    Job.objects.filter(id=job.id, status=JobStatus.RUNNING, worker=job.worker).update(
+        status=JobStatus.QUEUED, worker=None, heartbeat_at=None, modified=timezone.now()
+    )
+
+
+def recover_stalled_jobs() -> int:
+    """
+    Requeues running jobs that haven't had a heartbeat for JOB_STALE_AFTER seconds,
+    i.e. whose worker died. Fails them instead after JOB_MAX_ATTEMPTS.
+    """
+    now = timezone.now()
+    stalled = Job.objects.filter(
+        status=JobStatus.RUNNING,
+        heartbeat_at__lt=now - timedelta(seconds=settings.JOB_STALE_AFTER),
+    )
+    recovered = stalled.filter(cancel_requested=True).update(
+        status=JobStatus.CANCELLED, finished_at=now, modified=now
+    )
+    recovered += stalled.filter(attempts__gte=settings.JOB_MAX_ATTEMPTS).update(
+        status=JobStatus.FAILED,
+        error="The worker running this job stopped responding",
+        finished_at=now,
+        modified=now,
+    )
+    recovered += stalled.update(
+        status=JobStatus.QUEUED, worker=None, heartbeat_at=None, modified=now
+    )
+    return recovered
+
+
+class JobContext:
+    """What a job function is passed: its arguments and a way to report progress"""
+
+    def __init__(self, job: Job):
+        self.job_id = job.id
+        self.arguments = job.arguments
+        self.cancel_requested = False
+        self._stop = Event()
+
+    def stop(self, cancel_requested: bool = False) -> None:
+        """Stops the job at its next progress report, to be cancelled or requeued"""
+        self.cancel_requested = self.cancel_requested or cancel_requested
+        self._stop.set()
+
+    def progress(self, **progress) -> None:
+        """
+        Saves how far the job has got, raising JobCancelledError instead if it has
+        been stopped
+        """
+        if self._stop.is_set():
+            raise JobCancelledError(f"Job {self.job_id} was stopped")
+        Job.objects.filter(id=self.job_id).update(
+            progress=progress, modified=timezone.now()
+        )
@@ -0,0 +1,22 @@
+from ninja import ModelSchema
+
+from jobs.models import Job
+
+
+class JobSchema(ModelSchema):
+    class Meta:
+        model = Job
+        fields = [
+            "id",
+            "kind",
+            "arguments",
+            "status",
+            "cancel_requested",
+            "progress",
+            "result",
+            "error",
+            "attempts",
+            "created",
+            "started_at",
+            "finished_at",
+        ]
@@ -0,0 +1,172 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from constants import JobStatus
+from exceptions import JobCancelledError
+from jobs import queue
+from jobs.models import Job
+from jobs.worker import JobWorker
+
+TEST_JOB_FUNCTIONS = {
+    "succeed": "jobs.tests.succeed",
+    "fail": "jobs.tests.fail",
+}
+
+
+def succeed(job: queue.JobContext) -> dict:
+    job.progress(step=1)
+    return {"arguments": job.arguments}
+
+
+def fail(job: queue.JobContext) -> None:
+    raise ValueError("Something broke")
+
+
+@mock.patch.dict(queue.JOB_FUNCTIONS, TEST_JOB_FUNCTIONS, clear=True)
+class QueueTests(TestCase):
+    def test_enqueue_returns_the_identical_job_in_flight(self):
+        job, created = queue.enqueue("succeed", {"a": 1, "b": 2})
+        same_job, same_created = queue.enqueue("succeed", {"b": 2, "a": 1})
+        other_job, other_created = queue.enqueue("succeed", {"a": 2})
+
+        self.assertTrue(created)
+        self.assertFalse(same_created)
+        self.assertEqual(same_job.id, job.id)
+        self.assertTrue(other_created)
+        self.assertNotEqual(other_job.id, job.id)
+
+    def test_enqueue_queues_again_once_the_identical_job_finished(self):
+        job, _ = queue.enqueue("succeed")
+        queue.finish(queue.claim("worker"), JobStatus.SUCCEEDED)
+
+        new_job, created = queue.enqueue("succeed")
+
+        self.assertTrue(created)
+        self.assertNotEqual(new_job.id, job.id)
+
+    def test_claim_takes_the_oldest_queued_job(self):
+        first, _ = queue.enqueue("succeed", {"n": 1})
+        queue.enqueue("succeed", {"n": 2})
+
+        job = queue.claim("worker")
+
+        self.assertEqual(job.id, first.id)
+        self.assertEqual(job.status, JobStatus.RUNNING)
+        self.assertEqual(job.worker, "worker")
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.heartbeat_at)
+        self.assertNotEqual(queue.claim("other").id, first.id)
+        self.assertIsNone(queue.claim("other"))
+
+    def test_finish_records_the_result(self):
+        queue.enqueue("succeed")
+        job = queue.claim("worker")
+
+        queue.finish(job, JobStatus.SUCCEEDED, result={"done": True})
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatus.SUCCEEDED)
+        self.assertEqual(job.result, {"done": True})
+        self.assertIsNotNone(job.finished_at)
+
+    def test_finish_leaves_a_job_taken_from_the_worker_alone(self):
+        queue.enqueue("succeed")
+        job = queue.claim("worker")
+        Job.objects.filter(id=job.id).update(worker="other")
+
+        queue.finish(job, JobStatus.SUCCEEDED)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatus.RUNNING)
+
+    def test_cancel_queued_job_cancels_it_straight_away(self):
+        job, _ = queue.enqueue("succeed")
+
+        job = queue.cancel(job.id)
+
+        self.assertEqual(job.status, JobStatus.CANCELLED)
+        self.assertIsNotNone(job.finished_at)
+        self.assertIsNone(queue.claim("worker"))
+
+    def test_cancel_running_job_asks_its_worker_to_stop(self):
+        queue.enqueue("succeed")
+        job = queue.claim("worker")
+
+        job = queue.cancel(job.id)
+
+        self.assertEqual(job.status, JobStatus.RUNNING)
+        self.assertTrue(job.cancel_requested)
+
+    @mock.patch("jobs.worker.close_old_connections")
+    def test_heartbeat_stops_running_jobs_that_were_cancelled(self, _):
+        worker = JobWorker(concurrency=1, name="worker")
+        queue.enqueue("succeed")
+        job = queue.claim(worker.name)
+        context = queue.JobContext(job)
+        worker._running[job.id] = context
+        context.progress(step=1)
+
+        queue.cancel(job.id)
+        worker._heartbeat()
+
+        self.assertTrue(context.cancel_requested)
+        with self.assertRaises(JobCancelledError):
+            context.progress(step=2)
+
+    def test_worker_runs_jobs_to_success_or_failure(self):
+        worker = JobWorker(concurrency=1, name="worker")
+        succeeding, _ = queue.enqueue("succeed", {"a": 1})
+        failing, _ = queue.enqueue("fail")
+
+        worker._run(queue.claim(worker.name))
+        with self.assertLogs("jobs.worker", level="ERROR"):
+            worker._run(queue.claim(worker.name))
+
+        succeeding.refresh_from_db()
+        failing.refresh_from_db()
+        self.assertEqual(succeeding.status, JobStatus.SUCCEEDED)
+        self.assertEqual(succeeding.result, {"arguments": {"a": 1}})
+        self.assertEqual(succeeding.progress, {"step": 1})
+        self.assertEqual(failing.status, JobStatus.FAILED)
+        self.assertEqual(failing.error, "Something broke")
+
+    @override_settings(JOB_STALE_AFTER=60, JOB_MAX_ATTEMPTS=2)
+    def test_stalled_jobs_are_requeued_until_max_attempts(self):
+        retried, _ = queue.enqueue("succeed", {"n": 1})
+        exhausted, _ = queue.enqueue("succeed", {"n": 2})
+        alive, _ = queue.enqueue("succeed", {"n": 3})
+        for _ in range(3):
+            queue.claim("dead worker")
+        stalled_at = timezone.now() - timedelta(seconds=120)
+        Job.objects.filter(id__in=[retried.id, exhausted.id]).update(
+            heartbeat_at=stalled_at
+        )
+        Job.objects.filter(id=exhausted.id).update(attempts=2)
+
+        self.assertEqual(queue.recover_stalled_jobs(), 2)
+
+        retried.refresh_from_db()
+        exhausted.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual(retried.status, JobStatus.QUEUED)
+        self.assertIsNone(retried.worker)
+        self.assertEqual(exhausted.status, JobStatus.FAILED)
+        self.assertIsNotNone(exhausted.finished_at)
+        self.assertEqual(alive.status, JobStatus.RUNNING)
+
+    @override_settings(JOB_STALE_AFTER=60)
+    def test_stalled_jobs_that_were_cancelled_are_cancelled(self):
+        queue.enqueue("succeed")
+        job = queue.claim("dead worker")
+        queue.cancel(job.id)
+        Job.objects.filter(id=job.id).update(
+            heartbeat_at=timezone.now() - timedelta(seconds=120)
+        )
+
+        queue.recover_stalled_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatus.CANCELLED)
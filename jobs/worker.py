@@ -0,0 +1,126 @@
+import os
+import socket
+from logging import getLogger
+from threading import Event, Lock, Thread
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from constants import JobStatus
+from exceptions import JobCancelledError
+from jobs import queue
+from jobs.models import Job
+
+logger = getLogger(__name__)
+
+
+class JobWorker:
+    """
+    Runs queued jobs, up to `concurrency` at a time, until stopped.
+
+    Any number of workers can share the queue, see queue.claim(). Each one heartbeats
+    the jobs it's running, and requeues the jobs of workers that stopped heartbeating.
+    A worker that is stopped requeues its running jobs once they next report progress.
+    """
+
+    def __init__(
+        self,
+        concurrency: int | None = None,
+        poll_interval: float | None = None,
+        name: str | None = None,
+    ):
+        self.concurrency = concurrency or settings.JOB_WORKER_CONCURRENCY
+        self.poll_interval = poll_interval or settings.JOB_POLL_INTERVAL
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self._stopping = Event()
+        self._lock = Lock()
+        self._running: dict[int, queue.JobContext] = {}
+        self._jobs_run = 0
+
+    def run(self, burst: bool = False) -> int:
+        """
+        Runs jobs until stop() is called, or until the queue is empty with burst.
+        Returns the number of jobs run.
+        """
+        logger.info(f"Job worker {self.name} running {self.concurrency} jobs at a time")
+        threads = [
+            Thread(target=self._run_jobs, args=(burst,), name=f"job-worker-{number}")
+            for number in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            while alive := [thread for thread in threads if thread.is_alive()]:
+                self._heartbeat()
+                alive[0].join(timeout=settings.JOB_HEARTBEAT_INTERVAL)
+        finally:
+            self.stop()
+            for thread in threads:
+                thread.join()
+            connection.close()
+        return self._jobs_run
+
+    def stop(self) -> None:
+        """Claims no more jobs, and stops the running ones to be requeued"""
+        self._stopping.set()
+        with self._lock:
+            for context in self._running.values():
+                context.stop()
+
+    def _heartbeat(self) -> None:
+        close_old_connections()
+        with self._lock:
+            running = dict(self._running)
+        if running:
+            Job.objects.filter(id__in=running, worker=self.name).update(
+                heartbeat_at=timezone.now()
+            )
+            for job_id in Job.objects.filter(
+                id__in=running, cancel_requested=True
+            ).values_list("id", flat=True):
+                running[job_id].stop(cancel_requested=True)
+        if recovered := queue.recover_stalled_jobs():
+            logger.warning(f"Recovered {recovered} jobs from unresponsive workers")
+
+    def _run_jobs(self, burst: bool) -> None:
+        try:
+            while not self._stopping.is_set():
+                close_old_connections()
+                job = queue.claim(self.name)
+                if job is None:
+                    if burst:
+                        break
+                    self._stopping.wait(self.poll_interval)
+                    continue
+                self._run(job)
+        finally:
+            # Each thread holds its own connection, don't leave them open
+            connection.close()
+
+    def _run(self, job: Job) -> None:
+        context = queue.JobContext(job)
+        with self._lock:
+            self._running[job.id] = context
+            if self._stopping.is_set():
+                context.stop()
+        logger.info(f"Running {job.kind} job {job.id} (attempt {job.attempts})")
+        try:
+            result = queue.job_function(job.kind)(context)
+        except JobCancelledError:
+            if context.cancel_requested:
+                logger.info(f"Cancelled {job.kind} job {job.id}")
+                queue.finish(job, JobStatus.CANCELLED)
+            else:
+                logger.info(f"Requeued {job.kind} job {job.id}, the worker is stopping")
+                queue.requeue(job)
+        except Exception as exc:
+            logger.exception(f"{job.kind} job {job.id} failed")
+            queue.finish(job, JobStatus.FAILED, error=str(exc))
+        else:
+            logger.info(f"Finished {job.kind} job {job.id}")
+            queue.finish(job, JobStatus.SUCCEEDED, result=result)
+        finally:
+            with self._lock:
+                del self._running[job.id]
+                self._jobs_run += 1
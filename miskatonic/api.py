@@ -1,8 +1,13 @@
+from django.conf import settings
+from django.http import HttpResponse
 from ninja import NinjaAPI
+from ninja.errors import HttpError
 from ninja.security import HttpBearer
 
 from cards.api import router as cards_router
 from decks.api import router as decks_router
+from jobs.api import router as jobs_router
+from miskatonic.instrumentation import PROMETHEUS_CONTENT_TYPE, metrics
 
 
 class GlobalAuth(HttpBearer):
@@ -14,3 +19,12 @@ class GlobalAuth(HttpBearer):
 api = NinjaAPI(auth=GlobalAuth())
 api.add_router("/cards/", cards_router)
 api.add_router("/decks/", decks_router)
+api.add_router("/jobs/", jobs_router)
+
+
+@api.get("/metrics", include_in_schema=False)
+def get_metrics(request):
+    """This worker's request, query and ArkhamDB totals for Prometheus to scrape"""
+    if not settings.INSTRUMENTATION_ENABLED:
+        raise HttpError(404, "Instrumentation is not enabled")
+    return HttpResponse(metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,471 @@
+import asyncio
+import random
+import time
+from logging import getLogger
+from threading import Lock
+from weakref import WeakKeyDictionary
+
+import httpx
+import requests
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, Timeout
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from miskatonic.instrumentation import record_upstream
+from miskatonic.response_cache import CachedResponse, ResponseCache, cache_key
+
+logger = getLogger(__name__)
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+CACHEABLE_STATUSES = frozenset({200})
+
+
+class TokenBucket:
+    """Blocking token bucket that allows `rate` requests per second with bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = Lock()
+
+    def acquire(self) -> None:
+        while wait := self._take():
+            time.sleep(wait)
+
+    def _take(self) -> float:
+        """Takes a token if one is available, otherwise returns how long to wait for one"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated_at) * self.rate
+            )
+            self._updated_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+
+class AsyncTokenBucket(TokenBucket):
+    async def acquire(self) -> None:
+        while wait := self._take():
+            await asyncio.sleep(wait)
+
+
+class EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.revalidations = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "cache_hits": self.cache_hits,
+            "revalidations": self.revalidations,
+            "total_latency": self.total_latency,
+            "max_latency": self.max_latency,
+            "mean_latency": (
+                self.total_latency / self.requests if self.requests else 0.0
+            ),
+        }
+
+
+class ClientStats:
+    """Per endpoint counters, shared by the sync and async clients"""
+
+    def __init__(self):
+        self._endpoints: dict[str, EndpointStats] = {}
+        self._lock = Lock()
+
+    def record(self, endpoint: str, started_at: float, error: bool) -> None:
+        latency = time.perf_counter() - started_at
+        record_upstream(endpoint, latency, error)
+        with self._lock:
+            endpoint_stats = self._endpoints.setdefault(endpoint, EndpointStats())
+            endpoint_stats.requests += 1
+            endpoint_stats.errors += error
+            endpoint_stats.total_latency += latency
+            endpoint_stats.max_latency = max(endpoint_stats.max_latency, latency)
+
+    def record_retry(self, endpoint: str) -> None:
+        with self._lock:
+            self._endpoints.setdefault(endpoint, EndpointStats()).retries += 1
+
+    def record_cache_hit(self, endpoint: str, revalidated: bool = False) -> None:
+        with self._lock:
+            endpoint_stats = self._endpoints.setdefault(endpoint, EndpointStats())
+            endpoint_stats.cache_hits += 1
+            endpoint_stats.revalidations += revalidated
+
+    def as_dict(self) -> dict[str, dict]:
+        with self._lock:
+            return {
+                endpoint: endpoint_stats.as_dict()
+                for endpoint, endpoint_stats in self._endpoints.items()
+            }
+
+
+arkhamdb_stats = ClientStats()
+
+
+def response_ok(response) -> bool:
+    """Works for both requests and httpx responses"""
+    return response.status_code < 400
+
+
+class RetryPolicy:
+    def __init__(self, max_retries: int, backoff_base: float, backoff_max: float):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def backoff(self, attempt: int) -> float:
+        # Full jitter, so workers that failed together don't retry together
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    def retry_after(self, response) -> float | None:
+        try:
+            return min(self.backoff_max, float(response.headers["Retry-After"]))
+        except (KeyError, ValueError):
+            return None
+
+
+class ArkhamDBClient:
+    """
+    HTTP client shared by every ArkhamDB integration.
+
+    Connections are pooled and kept alive across calls, every request has a timeout,
+    requests are rate limited with a token bucket, and 429/5xx responses or connection
+    failures are retried with jittered exponential backoff. Latency and error counters
+    are kept per endpoint.
+
+    Responses from endpoints listed in cache_ttls are kept in the response cache.
+    Fresh entries are served without a request, stale ones are revalidated with a
+    conditional request, and immutable entries never expire.
+    """
+
+    def __init__(
+        self,
+        timeout: tuple[float, float] = (5.0, 30.0),
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        rate_limit: float = 10.0,
+        rate_burst: int = 20,
+        pool_size: int = 16,
+        stats: ClientStats = arkhamdb_stats,
+        cache: ResponseCache | None = None,
+        cache_ttls: dict[str, float] | None = None,
+    ):
+        self.timeout = timeout
+        self.retry_policy = RetryPolicy(max_retries, backoff_base, backoff_max)
+        self.rate_limiter = TokenBucket(rate_limit, rate_burst)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._stats = stats
+        self.cache = cache
+        self.cache_ttls = cache_ttls or {}
+
+    def get(
+        self,
+        url: str,
+        endpoint: str,
+        params: dict | None = None,
+        retry_statuses: frozenset[int] = RETRY_STATUSES,
+        stream: bool = False,
+        headers: dict | None = None,
+        immutable: bool = False,
+        cacheable_statuses: frozenset[int] = CACHEABLE_STATUSES,
+    ) -> requests.Response:
+        """
+        GET a URL, retrying retry_statuses and connection errors. The last response is
+        returned even if it failed, so callers keep deciding what a status code means.
+
+        Streamed responses are never cached. immutable marks a response that will never
+        change upstream, so it is cached without an expiry.
+        """
+        if stream or self.cache is None or endpoint not in self.cache_ttls:
+            return self._get(url, endpoint, params, retry_statuses, stream, headers)
+
+        key = cache_key(url, params)
+        ttl = None if immutable else self.cache_ttls[endpoint]
+        if (cached := self.cache.get(key)) and cached.is_fresh():
+            self._stats.record_cache_hit(endpoint)
+            return _requests_response(url, cached)
+
+        if cached:
+            headers = {**(headers or {}), **cached.validators()}
+        response = self._get(url, endpoint, params, retry_statuses, stream, headers)
+        if cached and response.status_code == 304:
+            self.cache.touch(key, ttl)
+            self._stats.record_cache_hit(endpoint, revalidated=True)
+            return _requests_response(url, cached)
+        if response.status_code in cacheable_statuses:
+            self.cache.set(
+                key,
+                endpoint,
+                response.status_code,
+                response.headers,
+                response.content,
+                ttl,
+            )
+        return response
+
+    def _get(
+        self,
+        url: str,
+        endpoint: str,
+        params: dict | None,
+        retry_statuses: frozenset[int],
+        stream: bool,
+        headers: dict | None,
+    ) -> requests.Response:
+        max_retries = self.retry_policy.max_retries
+        for attempt in range(max_retries + 1):
+            self.rate_limiter.acquire()
+            started_at = time.perf_counter()
+            try:
+                response = self.session.get(
+                    url,
+                    params=params,
+                    timeout=self.timeout,
+                    stream=stream,
+                    headers=headers,
+                )
+            except (ConnectionError, Timeout) as exc:
+                self._stats.record(endpoint, started_at, error=True)
+                if attempt == max_retries:
+                    raise
+                self._stats.record_retry(endpoint)
+                delay = self.retry_policy.backoff(attempt)
+                logger.warning(
+                    f"Request to {url} failed ({exc}), retrying in {delay:.2f}s"
+                )
+                time.sleep(delay)
+                continue
+
+            self._stats.record(endpoint, started_at, error=not response_ok(response))
+            if response.status_code not in retry_statuses or attempt == max_retries:
+                return response
+
+            self._stats.record_retry(endpoint)
+            delay = self.retry_policy.retry_after(
+                response
+            ) or self.retry_policy.backoff(attempt)
+            logger.warning(
+                f"Request to {url} returned {response.status_code}, retrying in {delay:.2f}s"
+            )
+            response.close()
+            time.sleep(delay)
+
+    def stats(self) -> dict[str, dict]:
+        return self._stats.as_dict()
+
+
+class AsyncArkhamDBClient:
+    """
+    asyncio counterpart of ArkhamDBClient on top of httpx, with the same pooling,
+    timeouts, rate limiting, retries and per endpoint counters.
+
+    httpx connections belong to the event loop that opened them, so use
+    get_async_arkhamdb_client() to get the client for the running loop.
+    """
+
+    def __init__(
+        self,
+        timeout: tuple[float, float] = (5.0, 30.0),
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        rate_limit: float = 10.0,
+        rate_burst: int = 20,
+        pool_size: int = 100,
+        stats: ClientStats = arkhamdb_stats,
+        cache: ResponseCache | None = None,
+        cache_ttls: dict[str, float] | None = None,
+    ):
+        connect_timeout, read_timeout = timeout
+        self.retry_policy = RetryPolicy(max_retries, backoff_base, backoff_max)
+        self.rate_limiter = AsyncTokenBucket(rate_limit, rate_burst)
+        self.session = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=pool_size, max_keepalive_connections=pool_size
+            ),
+        )
+        self._stats = stats
+        self.cache = cache
+        self.cache_ttls = cache_ttls or {}
+
+    async def get(
+        self,
+        url: str,
+        endpoint: str,
+        params: dict | None = None,
+        retry_statuses: frozenset[int] = RETRY_STATUSES,
+        headers: dict | None = None,
+        immutable: bool = False,
+        cacheable_statuses: frozenset[int] = CACHEABLE_STATUSES,
+    ) -> httpx.Response:
+        if self.cache is None or endpoint not in self.cache_ttls:
+            return await self._get(url, endpoint, params, retry_statuses, headers)
+
+        # The cache does blocking file IO, keep it off the event loop
+        cache_get = sync_to_async(self.cache.get, thread_sensitive=False)
+        cache_touch = sync_to_async(self.cache.touch, thread_sensitive=False)
+        cache_set = sync_to_async(self.cache.set, thread_sensitive=False)
+
+        key = cache_key(url, params)
+        ttl = None if immutable else self.cache_ttls[endpoint]
+        if (cached := await cache_get(key)) and cached.is_fresh():
+            self._stats.record_cache_hit(endpoint)
+            return _httpx_response(url, cached)
+
+        if cached:
+            headers = {**(headers or {}), **cached.validators()}
+        response = await self._get(url, endpoint, params, retry_statuses, headers)
+        if cached and response.status_code == 304:
+            await cache_touch(key, ttl)
+            self._stats.record_cache_hit(endpoint, revalidated=True)
+            return _httpx_response(url, cached)
+        if response.status_code in cacheable_statuses:
+            await cache_set(
+                key,
+                endpoint,
+                response.status_code,
+                response.headers,
+                response.content,
+                ttl,
+            )
+        return response
+
+    async def _get(
+        self,
+        url: str,
+        endpoint: str,
+        params: dict | None,
+        retry_statuses: frozenset[int],
+        headers: dict | None,
+    ) -> httpx.Response:
+        max_retries = self.retry_policy.max_retries
+        for attempt in range(max_retries + 1):
+            await self.rate_limiter.acquire()
+            started_at = time.perf_counter()
+            try:
+                response = await self.session.get(url, params=params, headers=headers)
+            except httpx.TransportError as exc:
+                self._stats.record(endpoint, started_at, error=True)
+                if attempt == max_retries:
+                    raise
+                self._stats.record_retry(endpoint)
+                delay = self.retry_policy.backoff(attempt)
+                logger.warning(
+                    f"Request to {url} failed ({exc!r}), retrying in {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
+                continue
+
+            self._stats.record(endpoint, started_at, error=not response_ok(response))
+            if response.status_code not in retry_statuses or attempt == max_retries:
+                return response
+
+            self._stats.record_retry(endpoint)
+            delay = self.retry_policy.retry_after(
+                response
+            ) or self.retry_policy.backoff(attempt)
+            logger.warning(
+                f"Request to {url} returned {response.status_code}, retrying in {delay:.2f}s"
+            )
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict[str, dict]:
+        return self._stats.as_dict()
+
+
+def _requests_response(url: str, cached: CachedResponse) -> requests.Response:
+    response = requests.Response()
+    response.status_code = cached.status
+    response.headers = CaseInsensitiveDict(cached.headers)
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.url = url
+    response._content = cached.body
+    return response
+
+
+def _httpx_response(url: str, cached: CachedResponse) -> httpx.Response:
+    return httpx.Response(
+        cached.status,
+        headers=cached.headers,
+        content=cached.body,
+        request=httpx.Request("GET", url),
+    )
+
+
+_client = None
+_client_lock = Lock()
+
+
+_async_clients: WeakKeyDictionary = WeakKeyDictionary()
+
+_response_cache = None
+_response_cache_lock = Lock()
+
+
+def get_response_cache() -> ResponseCache | None:
+    global _response_cache
+    if not settings.ARKHAMDB_RESPONSE_CACHE_ENABLED:
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(
+                settings.ARKHAMDB_RESPONSE_CACHE_PATH,
+                max_bytes=settings.ARKHAMDB_RESPONSE_CACHE_MAX_BYTES,
+            )
+        return _response_cache
+
+
+def _client_options() -> dict:
+    return {
+        "timeout": (settings.ARKHAMDB_CONNECT_TIMEOUT, settings.ARKHAMDB_READ_TIMEOUT),
+        "max_retries": settings.ARKHAMDB_MAX_RETRIES,
+        "rate_limit": settings.ARKHAMDB_RATE_LIMIT,
+        "rate_burst": settings.ARKHAMDB_RATE_BURST,
+        "cache": get_response_cache(),
+        "cache_ttls": settings.ARKHAMDB_RESPONSE_CACHE_TTLS,
+    }
+
+
+def get_arkhamdb_client() -> ArkhamDBClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ArkhamDBClient(
+                pool_size=settings.ARKHAMDB_POOL_SIZE, **_client_options()
+            )
+        return _client
+
+
+def get_async_arkhamdb_client() -> AsyncArkhamDBClient:
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        if (client := _async_clients.get(loop)) is None:
+            client = _async_clients[loop] = AsyncArkhamDBClient(
+                pool_size=settings.ARKHAMDB_ASYNC_POOL_SIZE, **_client_options()
+            )
+        return client
@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'miskatonic.settings')
 
 application = get_asgi_application()
+
+
+if settings.DECK_CARD_MATRIX_ENABLED:
+    from decks.matrix import refresh_in_background
+
+    refresh_in_background()
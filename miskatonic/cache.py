@@ -0,0 +1,166 @@
+import inspect
+from functools import wraps
+from threading import Lock
+from typing import Any, Callable
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+from ninja import Schema
+
+# Per cache name, like LocMemCache's own storage, so every thread's instance agrees
+_usage = {}
+
+_MISSING = object()
+
+
+class _Usage:
+    def __init__(self):
+        self.sizes: dict[str, int] = {}
+        self.total = 0
+
+
+class SizeBoundedLocMemCache(LocMemCache):
+    """
+    LocMemCache that also evicts the least recently used entries once the pickled
+    values take up more than OPTIONS["MAX_BYTES"], on top of the MAX_ENTRIES limit.
+    """
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        self._max_bytes = int(params.get("OPTIONS", {}).get("MAX_BYTES", 0))
+        self._usage = _usage.setdefault(name, _Usage())
+
+    def _set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        self._forget(key)
+        super()._set(key, value, timeout)
+        self._usage.sizes[key] = len(value)
+        self._usage.total += len(value)
+        while self._max_bytes and self._usage.total > self._max_bytes and self._cache:
+            # The least recently used entry is at the end
+            evicted_key, _ = self._cache.popitem()
+            del self._expire_info[evicted_key]
+            self._forget(evicted_key)
+
+    def _cull(self):
+        if self._cull_frequency == 0:
+            self._cache.clear()
+            self._expire_info.clear()
+            self._usage.sizes.clear()
+            self._usage.total = 0
+            return
+        for _ in range(len(self._cache) // self._cull_frequency):
+            key, _ = self._cache.popitem()
+            del self._expire_info[key]
+            self._forget(key)
+
+    def _delete(self, key):
+        self._forget(key)
+        return super()._delete(key)
+
+    def _forget(self, key) -> None:
+        self._usage.total -= self._usage.sizes.pop(key, 0)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._expire_info.clear()
+            self._usage.sizes.clear()
+            self._usage.total = 0
+
+    def size(self) -> int:
+        return self._usage.total
+
+
+class CacheMetrics:
+    """Hit and miss counters for each cached fetcher"""
+
+    def __init__(self):
+        self._counts: dict[str, dict[str, int]] = {}
+        self._lock = Lock()
+
+    def record(self, namespace: str, hit: bool) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(namespace, {"hits": 0, "misses": 0})
+            counts["hits" if hit else "misses"] += 1
+
+    def as_dict(self) -> dict[str, dict]:
+        with self._lock:
+            return {
+                namespace: {
+                    **counts,
+                    "hit_rate": counts["hits"] / (counts["hits"] + counts["misses"]),
+                }
+                for namespace, counts in self._counts.items()
+            }
+
+
+cache_metrics = CacheMetrics()
+
+
+def get_arkhamdb_cache():
+    return caches[settings.ARKHAMDB_CACHE_ALIAS]
+
+
+def make_key(namespace: str, args: tuple) -> str:
+    # Quoting keeps arbitrary arguments (e.g. usernames) within the cache key rules
+    return ":".join([namespace, *(quote(str(arg), safe="") for arg in args)])
+
+
+def cached_fetcher(
+    namespace: str,
+    schema: type[Schema] | None = None,
+    timeout=DEFAULT_TIMEOUT,
+) -> Callable:
+    """
+    Caches a fetcher's results in the ArkhamDB cache, keyed by its positional arguments.
+
+    Schemas are stored as plain dicts and rebuilt on the way out, so what is cached
+    is small and can be read by any process sharing the backend. Works for both
+    sync and async fetchers, and exceptions are never cached. The cache entry for
+    some arguments can be dropped with fetcher.cache_delete(*args).
+    """
+
+    def dump(result: Any) -> Any:
+        return result.dict() if schema is not None else result
+
+    def load(value: Any) -> Any:
+        return schema(**value) if schema is not None else value
+
+    def decorator(fetch: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fetch):
+
+            @wraps(fetch)
+            async def wrapper(*args):
+                cache = get_arkhamdb_cache()
+                key = make_key(namespace, args)
+                if (value := await cache.aget(key, _MISSING)) is not _MISSING:
+                    cache_metrics.record(namespace, hit=True)
+                    return load(value)
+                cache_metrics.record(namespace, hit=False)
+                result = await fetch(*args)
+                await cache.aset(key, dump(result), timeout)
+                return result
+
+        else:
+
+            @wraps(fetch)
+            def wrapper(*args):
+                cache = get_arkhamdb_cache()
+                key = make_key(namespace, args)
+                if (value := cache.get(key, _MISSING)) is not _MISSING:
+                    cache_metrics.record(namespace, hit=True)
+                    return load(value)
+                cache_metrics.record(namespace, hit=False)
+                result = fetch(*args)
+                cache.set(key, dump(result), timeout)
+                return result
+
+        wrapper.cache_delete = lambda *args: get_arkhamdb_cache().delete(
+            make_key(namespace, args)
+        )
+        return wrapper
+
+    return decorator
@@ -0,0 +1,55 @@
+"""
+Files built by one process and read by others, such as the synergy indexes and
+embeddings that management commands build and the API serves.
+"""
+
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from typing import IO, Callable, Generic, Iterator, TypeVar
+
+T = TypeVar("T")
+
+
+@contextmanager
+def atomic_write(path: Path, mode: str = "wb") -> Iterator[IO]:
+    """
+    Opens a file next to path to write to, and moves it into place once it's written
+    so readers never see half of it. Nothing is moved if writing raises.
+
+    The partial file is dotted, so directory scans that skip hidden files (such as
+    pyarrow's dataset discovery) don't pick it up either.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial_path = path.with_name(f".{path.name}")
+    try:
+        with open(partial_path, mode) as file:
+            yield file
+    except BaseException:
+        partial_path.unlink(missing_ok=True)
+        raise
+    partial_path.replace(path)
+
+
+class FileCache(Generic[T]):
+    """
+    What load() returns for a file, kept in memory and loaded again once the file's
+    modification time changes, e.g. when it is rebuilt by another process
+    """
+
+    def __init__(self, load: Callable[[Path], T]):
+        self._load = load
+        self._lock = Lock()
+        self._loaded: dict[Path, tuple[float, T]] = {}
+
+    def get(self, path: Path) -> T | None:
+        """The loaded file, None if it doesn't exist"""
+        try:
+            modified_at = path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            loaded = self._loaded.get(path)
+            if loaded is None or loaded[0] != modified_at:
+                loaded = self._loaded[path] = (modified_at, self._load(path))
+            return loaded[1]
@@ -0,0 +1,373 @@
+"""
+Where requests spend their time: database queries, ArkhamDB calls and named spans
+around the hot paths, per request and in process wide totals.
+
+Everything is off unless INSTRUMENTATION_ENABLED is set. The middleware then removes
+itself from the stack and instrumented() returns functions as they are, so a disabled
+build runs exactly the code it would without this module.
+
+Totals are kept per process, each worker serves its own at /api/metrics.
+"""
+
+import inspect
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from threading import Lock
+from typing import Callable
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.decorators import sync_and_async_middleware
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+SERVER_TIMING_HEADER = "Server-Timing"
+# Upper bounds of the duration histogram buckets, in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(DURATION_BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.buckets[bisect_left(DURATION_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+
+class RequestProfile:
+    """
+    What one request spent its time on. Shared with the threads the request hands
+    work to through sync_to_async, which copy the context it lives in.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.upstream_requests = 0
+        self.upstream_seconds = 0.0
+        self.spans: dict[str, float] = {}
+        self._lock = Lock()
+
+    def add_query(self, seconds: float) -> None:
+        with self._lock:
+            self.queries += 1
+            self.query_seconds += seconds
+
+    def add_upstream(self, seconds: float) -> None:
+        with self._lock:
+            self.upstream_requests += 1
+            self.upstream_seconds += seconds
+
+    def add_span(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def server_timing(self, total_seconds: float) -> str:
+        timings = [
+            f"total;dur={total_seconds * 1000:.1f}",
+            f'db;dur={self.query_seconds * 1000:.1f};desc="{self.queries} queries"',
+            f"arkhamdb;dur={self.upstream_seconds * 1000:.1f};"
+            f'desc="{self.upstream_requests} requests"',
+        ]
+        timings.extend(
+            f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.spans.items()
+        )
+        return ", ".join(timings)
+
+
+_request_profile: ContextVar[RequestProfile | None] = ContextVar(
+    "request_profile", default=None
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+    return f"{{{pairs}}}"
+
+
+class Metrics:
+    """Process wide totals, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.requests: dict[tuple, int] = {}
+        self.request_durations: dict[tuple, Histogram] = {}
+        self.request_queries: dict[tuple, int] = {}
+        self.request_query_seconds: dict[tuple, float] = {}
+        self.request_upstream_seconds: dict[tuple, float] = {}
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.upstream_durations: dict[str, Histogram] = {}
+        self.upstream_errors: dict[str, int] = {}
+        self.spans: dict[str, Histogram] = {}
+
+    def record_request(
+        self,
+        method: str,
+        route: str,
+        status: int,
+        seconds: float,
+        profile: RequestProfile,
+    ) -> None:
+        key = (method, route)
+        with self._lock:
+            self.requests[(*key, status)] = self.requests.get((*key, status), 0) + 1
+            self.request_durations.setdefault(key, Histogram()).observe(seconds)
+            self.request_queries[key] = (
+                self.request_queries.get(key, 0) + profile.queries
+            )
+            self.request_query_seconds[key] = (
+                self.request_query_seconds.get(key, 0.0) + profile.query_seconds
+            )
+            self.request_upstream_seconds[key] = (
+                self.request_upstream_seconds.get(key, 0.0) + profile.upstream_seconds
+            )
+
+    def record_query(self, seconds: float) -> None:
+        with self._lock:
+            self.queries += 1
+            self.query_seconds += seconds
+
+    def record_upstream(self, endpoint: str, seconds: float, error: bool) -> None:
+        with self._lock:
+            self.upstream_durations.setdefault(endpoint, Histogram()).observe(seconds)
+            self.upstream_errors[endpoint] = (
+                self.upstream_errors.get(endpoint, 0) + error
+            )
+
+    def record_span(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.spans.setdefault(name, Histogram()).observe(seconds)
+
+    def render(self) -> str:
+        lines = []
+
+        def family(name: str, kind: str, help_text: str) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def histogram(name: str, labels: dict, values: Histogram) -> None:
+            cumulative = 0
+            for bound, count in zip((*DURATION_BUCKETS, "+Inf"), values.buckets):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(**labels)} {values.sum}")
+            lines.append(f"{name}_count{_labels(**labels)} {values.count}")
+
+        with self._lock:
+            family("miskatonic_http_requests_total", "counter", "Requests served")
+            for (method, route, status), count in self.requests.items():
+                labels = _labels(method=method, route=route, status=status)
+                lines.append(f"miskatonic_http_requests_total{labels} {count}")
+            family(
+                "miskatonic_http_request_duration_seconds",
+                "histogram",
+                "Time to serve a request",
+            )
+            for (method, route), values in self.request_durations.items():
+                histogram(
+                    "miskatonic_http_request_duration_seconds",
+                    {"method": method, "route": route},
+                    values,
+                )
+            for name, totals, help_text in [
+                (
+                    "miskatonic_http_request_db_queries_total",
+                    self.request_queries,
+                    "Database queries run while serving requests",
+                ),
+                (
+                    "miskatonic_http_request_db_seconds_total",
+                    self.request_query_seconds,
+                    "Time spent in database queries while serving requests",
+                ),
+                (
+                    "miskatonic_http_request_arkhamdb_seconds_total",
+                    self.request_upstream_seconds,
+                    "Time spent waiting on ArkhamDB while serving requests",
+                ),
+            ]:
+                family(name, "counter", help_text)
+                for (method, route), total in totals.items():
+                    lines.append(f"{name}{_labels(method=method, route=route)} {total}")
+
+            family("miskatonic_db_queries_total", "counter", "Database queries run")
+            lines.append(f"miskatonic_db_queries_total {self.queries}")
+            family(
+                "miskatonic_db_seconds_total",
+                "counter",
+                "Time spent in database queries",
+            )
+            lines.append(f"miskatonic_db_seconds_total {self.query_seconds}")
+
+            family(
+                "miskatonic_arkhamdb_request_duration_seconds",
+                "histogram",
+                "Time taken by ArkhamDB requests, including failed attempts",
+            )
+            for endpoint, values in self.upstream_durations.items():
+                histogram(
+                    "miskatonic_arkhamdb_request_duration_seconds",
+                    {"endpoint": endpoint},
+                    values,
+                )
+            family(
+                "miskatonic_arkhamdb_request_errors_total",
+                "counter",
+                "ArkhamDB requests that failed or answered with an error",
+            )
+            for endpoint, errors in self.upstream_errors.items():
+                lines.append(
+                    f"miskatonic_arkhamdb_request_errors_total"
+                    f"{_labels(endpoint=endpoint)} {errors}"
+                )
+
+            family(
+                "miskatonic_span_duration_seconds",
+                "histogram",
+                "Time spent in instrumented functions",
+            )
+            for name, values in self.spans.items():
+                histogram("miskatonic_span_duration_seconds", {"span": name}, values)
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def record_query(seconds: float) -> None:
+    metrics.record_query(seconds)
+    if profile := _request_profile.get():
+        profile.add_query(seconds)
+
+
+def record_upstream(endpoint: str, seconds: float, error: bool) -> None:
+    if not settings.INSTRUMENTATION_ENABLED:
+        return
+    metrics.record_upstream(endpoint, seconds, error)
+    if profile := _request_profile.get():
+        profile.add_upstream(seconds)
+
+
+def record_span(name: str, seconds: float) -> None:
+    metrics.record_span(name, seconds)
+    if profile := _request_profile.get():
+        profile.add_span(name, seconds)
+
+
+@contextmanager
+def span(name: str):
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - started_at)
+
+
+def instrumented(name: str | None = None) -> Callable:
+    """
+    Times every call of a sync or async function as a span, named after the function
+    unless a name is given. Does nothing unless instrumentation is enabled at startup.
+    """
+
+    def decorator(function: Callable) -> Callable:
+        if not settings.INSTRUMENTATION_ENABLED:
+            return function
+        span_name = name or function.__name__
+
+        if inspect.iscoroutinefunction(function):
+
+            @wraps(function)
+            async def wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await function(*args, **kwargs)
+
+        else:
+
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with span(span_name):
+                    return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _time_query(execute, sql, params, many, context):
+    started_at = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record_query(time.perf_counter() - started_at)
+
+
+def _instrument_connection(sender, connection, **kwargs) -> None:
+    # Every thread opens its own connection, so this covers sync_to_async work too.
+    # The signal fires again whenever a connection is reopened.
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+def _finish(request, response, profile: RequestProfile, started_at: float):
+    seconds = time.perf_counter() - started_at
+    route = request.resolver_match.route if request.resolver_match else "unmatched"
+    metrics.record_request(
+        request.method, route, response.status_code, seconds, profile
+    )
+    if settings.INSTRUMENTATION_RESPONSE_HEADERS:
+        response[SERVER_TIMING_HEADER] = profile.server_timing(seconds)
+    return response
+
+
+@sync_and_async_middleware
+def instrumentation_middleware(get_response):
+    """Profiles each request, see RequestProfile"""
+    if not settings.INSTRUMENTATION_ENABLED:
+        raise MiddlewareNotUsed
+    connection_created.connect(
+        _instrument_connection, dispatch_uid="miskatonic.instrumentation"
+    )
+    for connection in connections.all(initialized_only=True):
+        _instrument_connection(None, connection)
+
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            started_at = time.perf_counter()
+            profile = RequestProfile()
+            token = _request_profile.set(profile)
+            try:
+                response = await get_response(request)
+            finally:
+                _request_profile.reset(token)
+            return _finish(request, response, profile, started_at)
+
+        return markcoroutinefunction(middleware)
+
+    def middleware(request):
+        started_at = time.perf_counter()
+        profile = RequestProfile()
+        token = _request_profile.set(profile)
+        try:
+            response = get_response(request)
+        finally:
+            _request_profile.reset(token)
+        return _finish(request, response, profile, started_at)
+
+    return middleware
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from miskatonic.nlp import NLTK_RESOURCES, download_nltk_resources
+
+
+class Command(BaseCommand):
+    help = "Download the NLTK data used for text processing into NLTK_DATA_DIR"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "resources",
+            nargs="*",
+            help=f"Resources to download, defaults to all of {', '.join(NLTK_RESOURCES)}",
+        )
+
+    def handle(self, *args, **options):
+        if unknown := set(options["resources"]) - set(NLTK_RESOURCES):
+            raise CommandError(f"Unknown resources: {', '.join(sorted(unknown))}")
+        resources = options["resources"] or list(NLTK_RESOURCES)
+        download_nltk_resources(resources)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Downloaded {', '.join(resources)} to {settings.NLTK_DATA_DIR}"
+            )
+        )
@@ -0,0 +1,274 @@
+import json
+import statistics
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, QuerySet
+from django.utils import timezone
+
+from cards.models import CardInfo
+from constants import CrawlStatus
+from decks.breakdown import decklist_breakdown_queryset
+from decks.constants import FIRST_ARKHAMDB_DECKLIST_DATE
+from decks.matrix import changed_decklists
+from decks.pagination import encode_cursor
+from decks.models import DeckCard, DeckList, DecklistCrawlCheckpoint
+from decks.schemas import DecklistsRequestSchema
+
+# Time differences under this are noise on any database
+MIN_REGRESSION_MS = 1.0
+
+
+def sample_parameters() -> dict:
+    """Realistic parameters for the queries, taken from the data that is there"""
+    top_investigator = (
+        DeckList.objects.values("investigator_name")
+        .annotate(decks=Count("deck_id"))
+        .order_by("-decks")
+        .first()
+    )
+    top_card_ids = list(
+        DeckCard.objects.values("card_data_id")
+        .annotate(decks=Count("deck_id"))
+        .order_by("-decks")
+        .values_list("card_data_id", flat=True)[:10]
+    )
+    deck_ids = list(
+        DeckList.objects.order_by("-deck_id").values_list("deck_id", flat=True)[:100]
+    )
+    return {
+        "investigator_name": (
+            top_investigator["investigator_name"]
+            if top_investigator
+            else "Roland Banks"
+        ),
+        "card_ids": top_card_ids or ["01001"],
+        "deck_ids": deck_ids or [0],
+        "since": timezone.now() - timedelta(days=1),
+    }
+
+
+def _breakdown_request(
+    parameters: dict, investigator: bool = True, cursor: str | None = None
+) -> DecklistsRequestSchema:
+    return DecklistsRequestSchema(
+        investigator_name=parameters["investigator_name"] if investigator else None,
+        card_ids=parameters["card_ids"],
+        num_entities=100,
+        cursor=cursor,
+    )
+
+
+def breakdown_by_investigator(parameters: dict) -> QuerySet:
+    return decklist_breakdown_queryset(_breakdown_request(parameters))
+
+
+def breakdown_all_investigators(parameters: dict) -> QuerySet:
+    return decklist_breakdown_queryset(
+        _breakdown_request(parameters, investigator=False)
+    )
+
+
+def breakdown_last_pages(parameters: dict) -> QuerySet:
+    return decklist_breakdown_queryset(
+        _breakdown_request(
+            parameters,
+            investigator=False,
+            cursor=encode_cursor(parameters["deck_ids"][-1]),
+        )
+    )
+
+
+def breakdown_with_matrix(parameters: dict) -> QuerySet:
+    return decklist_breakdown_queryset(
+        _breakdown_request(parameters), with_presence=False
+    )
+
+
+def card_info(parameters: dict) -> QuerySet:
+    return CardInfo.objects.filter(card_id=parameters["card_ids"][0])
+
+
+def save_decklists_known_cards(parameters: dict) -> QuerySet:
+    return CardInfo.objects.filter(card_id__in=parameters["card_ids"]).values_list(
+        "card_id", flat=True
+    )
+
+
+def matrix_changed_decks(parameters: dict) -> QuerySet:
+    return changed_decklists(parameters["since"])
+
+
+def matrix_deck_cards(parameters: dict) -> QuerySet:
+    return DeckCard.objects.filter(deck_id__in=parameters["deck_ids"]).values_list(
+        "deck_id", "card_data_id", "quantity"
+    )
+
+
+def crawl_completed_checkpoints(parameters: dict) -> QuerySet:
+    return DecklistCrawlCheckpoint.objects.filter(
+        date__gte=date.fromisoformat(FIRST_ARKHAMDB_DECKLIST_DATE),
+        date__lt=date.today(),
+        status=CrawlStatus.COMPLETE,
+    ).values_list("date", flat=True)
+
+
+# The queries the API runs, mirroring the code that runs them
+API_QUERIES: dict[str, Callable[[dict], QuerySet]] = {
+    query.__name__: query
+    for query in [
+        breakdown_by_investigator,
+        breakdown_all_investigators,
+        breakdown_last_pages,
+        breakdown_with_matrix,
+        card_info,
+        save_decklists_known_cards,
+        matrix_changed_decks,
+        matrix_deck_cards,
+        crawl_completed_checkpoints,
+    ]
+}
+
+
+def _plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def explain(queryset: QuerySet) -> dict:
+    """Runs EXPLAIN ANALYZE and summarises the plan"""
+    (result,) = json.loads(queryset.explain(format="json", analyze=True, buffers=True))
+    plan = result["Plan"]
+    return {
+        "execution_ms": result["Execution Time"],
+        "total_cost": plan["Total Cost"],
+        "scans": sorted(
+            {
+                f"{node['Node Type']} on {node['Relation Name']}"
+                + (f" using {node['Index Name']}" if "Index Name" in node else "")
+                for node in _plan_nodes(plan)
+                if "Relation Name" in node
+            }
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN ANALYZE the queries behind the API and flag regressions against a "
+        "saved baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "queries",
+            nargs="*",
+            help=f"Queries to explain, defaults to all of {', '.join(API_QUERIES)}",
+        )
+        parser.add_argument(
+            "--runs",
+            type=int,
+            default=5,
+            help="Number of times each query is run, the median time is reported",
+        )
+        parser.add_argument(
+            "--baseline",
+            type=Path,
+            default=Path(settings.BASE_DIR)
+            / "benchmarks"
+            / "query_plans_baseline.json",
+            help="Baseline to compare with",
+        )
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="Save these plans as the new baseline",
+        )
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            default=50.0,
+            help="Flag queries this many percent slower than the baseline",
+        )
+        parser.add_argument(
+            "--verbose-plans",
+            action="store_true",
+            help="Print the full text plan of each query",
+        )
+
+    def handle(self, *args, **options):
+        baseline = {}
+        if options["baseline"].exists():
+            baseline = json.loads(options["baseline"].read_text())
+
+        if unknown := set(options["queries"]) - set(API_QUERIES):
+            raise CommandError(f"Unknown queries: {', '.join(sorted(unknown))}")
+
+        parameters = sample_parameters()
+        profiles = {}
+        regressions = []
+        for name in options["queries"] or API_QUERIES:
+            queryset = API_QUERIES[name](parameters)
+            runs = [explain(queryset) for _ in range(options["runs"])]
+            profile = {
+                **runs[-1],
+                "execution_ms": statistics.median(run["execution_ms"] for run in runs),
+            }
+            profiles[name] = profile
+
+            line = (
+                f"{name:<32}{profile['execution_ms']:>10.2f}ms"
+                f"{profile['total_cost']:>12.1f}"
+            )
+            if name in baseline:
+                problems = self._regressions(
+                    profile, baseline[name], options["max_regression"]
+                )
+                line += f"  {self._change(profile, baseline[name])}"
+                if problems:
+                    regressions.append(name)
+                    line = self.style.ERROR(f"{line}  {'; '.join(problems)}")
+            self.stdout.write(line)
+            for scan in profile["scans"]:
+                self.stdout.write(f"    {scan}")
+            if options["verbose_plans"]:
+                self.stdout.write(queryset.explain(analyze=True))
+
+        if options["save_baseline"]:
+            options["baseline"].write_text(
+                json.dumps({**baseline, **profiles}, indent=2, sort_keys=True)
+            )
+            self.stdout.write(
+                self.style.SUCCESS(f"Saved baseline to {options['baseline']}")
+            )
+        elif regressions:
+            raise CommandError(f"Query plans regressed: {', '.join(regressions)}")
+
+    @staticmethod
+    def _regressions(profile: dict, baseline: dict, max_regression: float) -> list[str]:
+        problems = []
+        baseline_ms = baseline["execution_ms"]
+        if (
+            profile["execution_ms"] > baseline_ms * (1 + max_regression / 100)
+            and profile["execution_ms"] - baseline_ms > MIN_REGRESSION_MS
+        ):
+            problems.append(f"slower than {baseline_ms:.2f}ms")
+        # A relation that used to be read through an index is now scanned in full
+        new_seq_scans = {
+            scan
+            for scan in profile["scans"]
+            if scan.startswith("Seq Scan") and scan not in baseline["scans"]
+        }
+        if new_seq_scans:
+            problems.append(f"new {', '.join(sorted(new_seq_scans))}")
+        return problems
+
+    @staticmethod
+    def _change(profile: dict, baseline: dict) -> str:
+        if not baseline["execution_ms"]:
+            return "new"
+        return f"{(profile['execution_ms'] / baseline['execution_ms'] - 1) * 100:+.0f}%"
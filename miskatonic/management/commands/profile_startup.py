@@ -0,0 +1,163 @@
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter so nothing is imported yet. The URLconf is loaded too,
+# since that is what pulls in the API modules on the first request.
+PROFILE_SCRIPT = """
+import time
+started_at = time.perf_counter()
+import {module}
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(time.perf_counter() - started_at)
+"""
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+\d+ \|\s*(\S+)$")
+
+
+def profile_startup(module: str) -> dict:
+    """Cold start time of module and the import time spent in each top level package"""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            PROFILE_SCRIPT.format(module=module),
+        ],
+        cwd=settings.BASE_DIR,
+        env={**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE},
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        raise CommandError(f"Failed to import {module}:\n{result.stderr[-2000:]}")
+
+    packages = Counter()
+    for line in result.stderr.splitlines():
+        if match := IMPORT_TIME_LINE.match(line):
+            packages[match[2].split(".")[0]] += int(match[1]) / 1000
+    return {
+        "total_ms": float(result.stdout.strip().splitlines()[-1]) * 1000,
+        "packages": packages,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Profile the import time of a cold start of the app and compare it with a "
+        "saved baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--module",
+            default="miskatonic.wsgi",
+            help="Entry point to import, e.g. miskatonic.wsgi or miskatonic.asgi",
+        )
+        parser.add_argument(
+            "--runs",
+            type=int,
+            default=3,
+            help="Number of cold starts, the median is reported",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=15,
+            help="Number of packages to list",
+        )
+        parser.add_argument(
+            "--baseline",
+            type=Path,
+            default=Path(settings.BASE_DIR) / "benchmarks" / "startup_baseline.json",
+            help="Baseline to compare with",
+        )
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="Save this profile as the new baseline",
+        )
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            default=None,
+            help="Fail if the total is this many percent slower than the baseline",
+        )
+
+    def handle(self, *args, **options):
+        module = options["module"]
+        profiles = [profile_startup(module) for _ in range(options["runs"])]
+        package_names = {name for profile in profiles for name in profile["packages"]}
+        profile = {
+            "module": module,
+            "python": platform.python_version(),
+            "runs": len(profiles),
+            "total_ms": statistics.median(profile["total_ms"] for profile in profiles),
+            "packages": {
+                name: statistics.median(
+                    profile["packages"].get(name, 0.0) for profile in profiles
+                )
+                for name in package_names
+            },
+        }
+
+        baseline = None
+        if options["baseline"].exists():
+            baseline = json.loads(options["baseline"].read_text())
+            if baseline["module"] != module:
+                baseline = None
+
+        self.stdout.write(
+            f"Cold start of {module}: {profile['total_ms']:.0f}ms "
+            f"(median of {profile['runs']} runs)"
+            + (
+                f", baseline {baseline['total_ms']:.0f}ms "
+                f"({self._change(profile['total_ms'], baseline['total_ms'])})"
+                if baseline
+                else ""
+            )
+        )
+        top_packages = sorted(
+            profile["packages"].items(), key=lambda package: package[1], reverse=True
+        )[: options["top"]]
+        for name, import_ms in top_packages:
+            line = f"  {name:<30}{import_ms:>10.1f}ms"
+            if baseline:
+                baseline_ms = baseline["packages"].get(name, 0.0)
+                line += (
+                    f"{baseline_ms:>10.1f}ms  {self._change(import_ms, baseline_ms)}"
+                )
+            self.stdout.write(line)
+
+        if options["save_baseline"]:
+            options["baseline"].write_text(
+                json.dumps(profile, indent=2, sort_keys=True)
+            )
+            self.stdout.write(
+                self.style.SUCCESS(f"Saved baseline to {options['baseline']}")
+            )
+
+        max_regression = options["max_regression"]
+        if baseline and max_regression is not None:
+            regression = (profile["total_ms"] / baseline["total_ms"] - 1) * 100
+            if regression > max_regression:
+                raise CommandError(
+                    f"Cold start regressed by {regression:.0f}%, over the allowed "
+                    f"{max_regression:.0f}%"
+                )
+
+    @staticmethod
+    def _change(current_ms: float, baseline_ms: float) -> str:
+        if not baseline_ms:
+            return "new"
+        return f"{(current_ms / baseline_ms - 1) * 100:+.0f}%"
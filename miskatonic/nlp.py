@@ -0,0 +1,67 @@
+from functools import cache
+
+from django.conf import settings
+
+from exceptions import NLPResourceError
+
+# NLTK resource names and where they live under an NLTK data directory. The dockerfile
+# downloads the same ones.
+NLTK_RESOURCES = {
+    # word_tokenize reads the tables of punkt_tab, not the pickles of punkt
+    "punkt_tab": "tokenizers/punkt_tab",
+    "stopwords": "corpora/stopwords",
+}
+
+
+@cache
+def _nltk():
+    """
+    Imports NLTK on first use, pointed at the bundled data directory.
+
+    NLTK takes a while to import, so nothing imports it at module level.
+    """
+    import nltk
+
+    if str(settings.NLTK_DATA_DIR) not in nltk.data.path:
+        nltk.data.path.insert(0, str(settings.NLTK_DATA_DIR))
+    return nltk
+
+
+@cache
+def ensure_nltk_resource(name: str) -> str:
+    """
+    Makes sure an NLTK resource is available and returns its path. Resources are
+    looked up in NLTK_DATA_DIR (and NLTK's default locations) and only downloaded if
+    NLTK_DOWNLOAD_MISSING is set, so nothing touches the network by default.
+    """
+    nltk = _nltk()
+    try:
+        return nltk.data.find(NLTK_RESOURCES[name])
+    except LookupError:
+        if not settings.NLTK_DOWNLOAD_MISSING:
+            raise NLPResourceError(
+                f"NLTK resource {name} isn't in {settings.NLTK_DATA_DIR}, "
+                "run manage.py download_nltk_data"
+            )
+    download_nltk_resources([name])
+    return nltk.data.find(NLTK_RESOURCES[name])
+
+
+def download_nltk_resources(names: list[str] | None = None) -> None:
+    nltk = _nltk()
+    for name in names or NLTK_RESOURCES:
+        if not nltk.download(
+            name, download_dir=str(settings.NLTK_DATA_DIR), quiet=True
+        ):
+            raise NLPResourceError(f"Failed to download NLTK resource {name}")
+
+
+@cache
+def stopwords(language: str = "english") -> frozenset[str]:
+    ensure_nltk_resource("stopwords")
+    return frozenset(_nltk().corpus.stopwords.words(language))
+
+
+def word_tokenize(text: str) -> list[str]:
+    ensure_nltk_resource("punkt_tab")
+    return _nltk().word_tokenize(text)
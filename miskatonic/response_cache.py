@@ -0,0 +1,193 @@
+import json
+import sqlite3
+import time
+from dataclasses import dataclass
+from logging import getLogger
+from pathlib import Path
+from threading import Lock, local
+from urllib.parse import urlencode
+
+logger = getLogger(__name__)
+
+# Only the headers that callers or revalidation need are kept
+STORED_HEADERS = ("content-type", "etag", "last-modified")
+
+# Once over the size limit, evict down to this fraction of it
+EVICTION_TARGET = 0.9
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+"""
+
+
+def cache_key(url: str, params: dict | None = None) -> str:
+    if not params:
+        return url
+    return f"{url}?{urlencode(sorted(params.items()))}"
+
+
+@dataclass
+class CachedResponse:
+    status: int
+    headers: dict[str, str]
+    body: bytes
+    expires_at: float | None
+
+    @property
+    def immutable(self) -> bool:
+        return self.expires_at is None
+
+    def is_fresh(self) -> bool:
+        return self.immutable or self.expires_at > time.time()
+
+    def validators(self) -> dict[str, str]:
+        """Headers that turn a request for this response into a conditional one"""
+        validators = {}
+        if etag := self.headers.get("etag"):
+            validators["If-None-Match"] = etag
+        if last_modified := self.headers.get("last-modified"):
+            validators["If-Modified-Since"] = last_modified
+        return validators
+
+
+class ResponseCache:
+    """
+    Persistent cache of HTTP responses in a SQLite file, shared by every process
+    pointing at the same path.
+
+    Entries either expire after a TTL or are immutable (expires_at is NULL). Expired
+    entries are kept so they can be revalidated with a conditional request, and the
+    least recently used entries are evicted once the cache grows past max_bytes.
+    """
+
+    def __init__(self, path: str | Path, max_bytes: int):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._local = local()
+        self._size_lock = Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connection() as connection:
+            connection.executescript(SCHEMA)
+            self._size = connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections can't be shared between threads
+        if (connection := getattr(self._local, "connection", None)) is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> CachedResponse | None:
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT status, headers, body, expires_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                (time.time(), key),
+            )
+        status, headers, body, expires_at = row
+        return CachedResponse(status, json.loads(headers), body, expires_at)
+
+    def set(
+        self,
+        key: str,
+        endpoint: str,
+        status: int,
+        headers: dict[str, str],
+        body: bytes,
+        ttl: float | None,
+    ) -> None:
+        """Stores a response, a ttl of None marks it as immutable"""
+        now = time.time()
+        headers = {name: headers[name] for name in STORED_HEADERS if headers.get(name)}
+        with self._connection() as connection:
+            previous = connection.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    endpoint,
+                    status,
+                    json.dumps(headers),
+                    body,
+                    len(body),
+                    now,
+                    None if ttl is None else now + ttl,
+                    now,
+                ),
+            )
+        with self._size_lock:
+            self._size += len(body) - (previous[0] if previous else 0)
+            over_limit = self._size > self.max_bytes
+        if over_limit:
+            self.evict()
+
+    def touch(self, key: str, ttl: float | None) -> None:
+        """Restarts the TTL of an entry that was revalidated upstream"""
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute(
+                "UPDATE responses SET expires_at = ?, accessed_at = ? WHERE key = ?",
+                (None if ttl is None else now + ttl, now, key),
+            )
+
+    def evict(self) -> None:
+        """Drops the least recently used entries until the cache is back under its limit"""
+        target = int(self.max_bytes * EVICTION_TARGET)
+        with self._connection() as connection:
+            # Other processes write to the same file, so start from the real size
+            size = connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+            evicted = 0
+            for key, entry_size in connection.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at"
+            ).fetchall():
+                if size <= target:
+                    break
+                connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                size -= entry_size
+                evicted += 1
+        with self._size_lock:
+            self._size = size
+        logger.info(f"Evicted {evicted} responses from {self.path}")
+
+    def clear(self) -> None:
+        with self._connection() as connection:
+            connection.execute("DELETE FROM responses")
+        with self._size_lock:
+            self._size = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._connection() as connection:
+            entries, size, immutable = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), "
+                "COUNT(*) - COUNT(expires_at) FROM responses"
+            ).fetchone()
+        return {
+            "entries": entries,
+            "immutable_entries": immutable,
+            "size": size,
+            "max_bytes": self.max_bytes,
+        }
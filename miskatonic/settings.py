@@ -44,7 +44,9 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     "decks.apps.DecksConfig",
     "cards.apps.CardsConfig",
+    "jobs.apps.JobsConfig",
     "django_extensions",
+    "miskatonic",
 ]
 
 NOTEBOOK_ARGUMENTS = [
@@ -61,6 +63,7 @@ NOTEBOOK_ARGUMENTS = [
 ]
 
 MIDDLEWARE = [
+    "miskatonic.instrumentation.instrumentation_middleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -143,6 +146,138 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # NINJA_DOCS_VIEW = "redoc"
 
+# ArkhamDB integration
+
+# Point this at a local stub server to crawl without hitting arkhamdb.com
+ARKHAMDB_BASE_URL = os.getenv("ARKHAMDB_BASE_URL", "https://arkhamdb.com")
+
+# Shared ArkhamDB HTTP client, see miskatonic.arkhamdb
+ARKHAMDB_CONNECT_TIMEOUT = float(os.getenv("ARKHAMDB_CONNECT_TIMEOUT", "5"))
+ARKHAMDB_READ_TIMEOUT = float(os.getenv("ARKHAMDB_READ_TIMEOUT", "30"))
+ARKHAMDB_MAX_RETRIES = int(os.getenv("ARKHAMDB_MAX_RETRIES", "3"))
+# Requests per second, with bursts of up to ARKHAMDB_RATE_BURST requests (0 disables)
+ARKHAMDB_RATE_LIMIT = float(os.getenv("ARKHAMDB_RATE_LIMIT", "10"))
+ARKHAMDB_RATE_BURST = int(os.getenv("ARKHAMDB_RATE_BURST", "20"))
+ARKHAMDB_POOL_SIZE = int(os.getenv("ARKHAMDB_POOL_SIZE", "16"))
+# Connections per event loop for the async client used by the async endpoints
+ARKHAMDB_ASYNC_POOL_SIZE = int(os.getenv("ARKHAMDB_ASYNC_POOL_SIZE", "100"))
+
+# Persistent cache of ArkhamDB responses, see miskatonic.response_cache
+ARKHAMDB_RESPONSE_CACHE_ENABLED = (
+    os.getenv("ARKHAMDB_RESPONSE_CACHE_ENABLED", "true") == "true"
+)
+ARKHAMDB_RESPONSE_CACHE_PATH = os.getenv(
+    "ARKHAMDB_RESPONSE_CACHE_PATH",
+    str(BASE_DIR / "data" / "arkhamdb_responses.sqlite3"),
+)
+ARKHAMDB_RESPONSE_CACHE_MAX_BYTES = int(
+    os.getenv("ARKHAMDB_RESPONSE_CACHE_MAX_BYTES", str(2 * 1024**3))
+)
+# Seconds before a cached response is revalidated, endpoints not listed aren't cached
+ARKHAMDB_RESPONSE_CACHE_TTLS = {
+    "decklists_by_date": 60 * 60,
+    "decklist": 24 * 60 * 60,
+    "decklist_page": 6 * 60 * 60,
+    "user_page": 24 * 60 * 60,
+    "card": 24 * 60 * 60,
+}
+# Decklists published this many days ago or earlier are cached as immutable
+ARKHAMDB_HISTORICAL_AFTER_DAYS = int(os.getenv("ARKHAMDB_HISTORICAL_AFTER_DAYS", "7"))
+
+# Parsed ArkhamDB results (e.g. decklist likes/favorites), see miskatonic.cache. Any
+# Django backend works, e.g. django.core.cache.backends.filebased.FileBasedCache with
+# a directory as the location to share it between workers, or the database backend
+# after running createcachetable.
+ARKHAMDB_CACHE_ALIAS = "arkhamdb"
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    ARKHAMDB_CACHE_ALIAS: {
+        "BACKEND": os.getenv(
+            "ARKHAMDB_CACHE_BACKEND", "miskatonic.cache.SizeBoundedLocMemCache"
+        ),
+        "LOCATION": os.getenv("ARKHAMDB_CACHE_LOCATION", "arkhamdb"),
+        "TIMEOUT": int(os.getenv("ARKHAMDB_CACHE_TIMEOUT", str(6 * 60 * 60))),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("ARKHAMDB_CACHE_MAX_ENTRIES", "100000")),
+            # Only enforced by SizeBoundedLocMemCache
+            "MAX_BYTES": int(os.getenv("ARKHAMDB_CACHE_MAX_BYTES", str(64 * 1024**2))),
+        },
+    },
+}
+
+# Seconds between checks of whether cards changed, see cards.catalogue
+CARD_CATALOGUE_CHECK_SECONDS = int(os.getenv("CARD_CATALOGUE_CHECK_SECONDS", "5"))
+
+# Number of dates fetched concurrently when crawling decklists
+DECKLIST_CRAWLER_WORKERS = int(os.getenv("DECKLIST_CRAWLER_WORKERS", "8"))
+# Decklist pages scraped concurrently for their metadata, shared by every crawled date
+DECKLIST_CRAWLER_METADATA_WORKERS = int(
+    os.getenv("DECKLIST_CRAWLER_METADATA_WORKERS", "16")
+)
+
+# Background jobs, run by manage.py run_jobs, see jobs.worker
+
+# Jobs each worker process runs at once
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "2"))
+# Seconds an idle worker waits before looking for queued jobs again
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+# Seconds between a worker's heartbeats, which are also when cancellations are noticed
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "5"))
+# Running jobs without a heartbeat for this many seconds are requeued
+JOB_STALE_AFTER = int(os.getenv("JOB_STALE_AFTER", "120"))
+# Jobs whose worker stopped responding this many times are failed instead
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+# Deck analytics
+
+# NLTK data, downloaded by manage.py download_nltk_data (or when the docker image is
+# built, which points this outside the mounted source tree), see miskatonic.nlp
+NLTK_DATA_DIR = os.getenv("NLTK_DATA_DIR", str(BASE_DIR / "data" / "nltk"))
+# Download missing NLTK data on first use instead of failing
+NLTK_DOWNLOAD_MISSING = os.getenv("NLTK_DOWNLOAD_MISSING", "false") == "true"
+
+# Serve card presence from the in-memory deck/card matrix instead of DeckCard joins
+DECK_CARD_MATRIX_ENABLED = os.getenv("DECK_CARD_MATRIX_ENABLED", "false") == "true"
+DECK_CARD_MATRIX_REFRESH_SECONDS = int(
+    os.getenv("DECK_CARD_MATRIX_REFRESH_SECONDS", "300")
+)
+# Requests arriving while the server is still loading the matrix wait this long for
+# it, then are served without it
+DECK_CARD_MATRIX_LOAD_WAIT_SECONDS = int(
+    os.getenv("DECK_CARD_MATRIX_LOAD_WAIT_SECONDS", "30")
+)
+
+# Card synergy indexes, built by manage.py build_synergy_index
+SYNERGY_INDEX_DIR = os.getenv("SYNERGY_INDEX_DIR", str(BASE_DIR / "data" / "synergies"))
+# Number of synergies kept per card
+SYNERGY_INDEX_TOP_K = int(os.getenv("SYNERGY_INDEX_TOP_K", "50"))
+# Pairs of cards seen together in fewer decks than this are too noisy to rank
+SYNERGY_MIN_DECKS = int(os.getenv("SYNERGY_MIN_DECKS", "5"))
+
+# Card and deck embeddings, trained by manage.py train_card_embeddings
+CARD_EMBEDDINGS_DIR = os.getenv(
+    "CARD_EMBEDDINGS_DIR", str(BASE_DIR / "data" / "embeddings")
+)
+CARD_EMBEDDING_DIMENSIONS = int(os.getenv("CARD_EMBEDDING_DIMENSIONS", "64"))
+CARD_EMBEDDING_EPOCHS = int(os.getenv("CARD_EMBEDDING_EPOCHS", "10"))
+# Cards in fewer decks than this get no embedding
+CARD_EMBEDDING_MIN_DECKS = int(os.getenv("CARD_EMBEDDING_MIN_DECKS", "5"))
+# Clusters searched per similarity query, more is slower but misses fewer neighbours
+EMBEDDING_SEARCH_NPROBE = int(os.getenv("EMBEDDING_SEARCH_NPROBE", "8"))
+
+# Parquet export of the deck corpus, written by manage.py export_corpus
+CORPUS_EXPORT_DIR = os.getenv("CORPUS_EXPORT_DIR", str(BASE_DIR / "data" / "corpus"))
+
+# Request instrumentation, see miskatonic.instrumentation. Read at startup.
+INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION_ENABLED", "false") == "true"
+# Add a Server-Timing header with each response's breakdown
+INSTRUMENTATION_RESPONSE_HEADERS = (
+    os.getenv("INSTRUMENTATION_RESPONSE_HEADERS", "false") == "true"
+)
+
 # Create a LOGGING dictionary
 LOGGING = {
     # Use v1 of the logging config schema
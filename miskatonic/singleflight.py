@@ -0,0 +1,83 @@
+import asyncio
+import inspect
+from concurrent.futures import Future
+from functools import wraps
+from threading import Lock
+from typing import Any, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Calls in flight, by key. A call made while another with the same key is running
+    waits for that one and shares its result (or exception) instead of running again.
+
+    Threads share calls through futures, coroutines through tasks on their event loop.
+    A coroutine that is cancelled while waiting doesn't cancel the call it shares.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._calls: dict[Hashable, Future] = {}
+        self._tasks: dict[tuple, asyncio.Task] = {}
+
+    def do(self, key: Hashable, call: Callable, *args) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result()
+        try:
+            result = call(*args)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    async def ado(self, key: Hashable, call: Callable, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        # Tasks can only be awaited on their own loop
+        task_key = (loop, key)
+        with self._lock:
+            task = self._tasks.get(task_key)
+            if task is None:
+                task = self._tasks[task_key] = loop.create_task(call(*args))
+                task.add_done_callback(lambda _: self._forget(task_key))
+        return await asyncio.shield(task)
+
+    def _forget(self, task_key: tuple) -> None:
+        with self._lock:
+            del self._tasks[task_key]
+
+
+_single_flight = SingleFlight()
+
+
+def single_flight(namespace: str) -> Callable:
+    """
+    Shares concurrent calls of a sync or async fetcher, keyed by the namespace and its
+    positional arguments, so a burst of requests for the same thing fetches it once
+    """
+
+    def decorator(fetch: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fetch):
+
+            @wraps(fetch)
+            async def wrapper(*args):
+                return await _single_flight.ado((namespace, *args), fetch, *args)
+
+        else:
+
+            @wraps(fetch)
+            def wrapper(*args):
+                return _single_flight.do((namespace, *args), fetch, *args)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,77 @@
+import json
+from typing import Any, Iterable, Iterator
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+def iter_json_array(chunks: Iterable[str]) -> Iterator[Any]:
+    """
+    Yields the items of a top level JSON array one at a time as its text arrives.
+
+    Only the item being decoded (plus whatever is left of the current chunk) is held in
+    memory, so a large payload can be consumed while it is still being downloaded.
+    Raises ValueError if the payload is not a JSON array.
+    """
+    chunks = iter(chunks)
+    buffer = ""
+    position = 0
+    exhausted = False
+    started = False
+
+    def _fill() -> bool:
+        nonlocal buffer, position, exhausted
+        if exhausted:
+            return False
+        for chunk in chunks:
+            if chunk:
+                buffer = buffer[position:] + chunk
+                position = 0
+                return True
+        exhausted = True
+        return False
+
+    def _skip_whitespace() -> str | None:
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if not _fill():
+                return None
+
+    while True:
+        token = _skip_whitespace()
+        if not started:
+            if token != "[":
+                raise ValueError(f"Expected a JSON array, got {token!r}")
+            started = True
+            position += 1
+            if _skip_whitespace() == "]":
+                return
+            continue
+
+        try:
+            item, end = _decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as exc:
+            # Either the item is cut off at the end of the buffer or the payload is bad
+            if not _fill():
+                raise ValueError("Truncated JSON array") from exc
+            continue
+        # raw_decode accepts any valid prefix, so "1" out of "1.5" or "1e5" split
+        # across chunks. Only an item followed by "," or "]" is known to be whole.
+        following = end
+        while following < len(buffer) and buffer[following] in _WHITESPACE:
+            following += 1
+        if (following == len(buffer) or buffer[following] not in ",]") and _fill():
+            continue
+        position = end
+        yield item
+
+        separator = _skip_whitespace()
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError(f"Expected ',' or ']' in JSON array, got {separator!r}")
+        position += 1
@@ -0,0 +1,118 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+from miskatonic.files import FileCache, atomic_write
+from miskatonic.streaming import iter_json_array
+
+PAYLOAD = [
+    {"code": "01001", "name": 'Roland "Bob" Banks', "text": "line\nbreak \\ é"},
+    1.5,
+    -1e5,
+    12345,
+    True,
+    None,
+    "",
+    [],
+    {"nested": [1, {"a": "]"}]},
+]
+
+
+def _split_every(text: str, size: int) -> list[str]:
+    return [text[start : start + size] for start in range(0, len(text), size)]
+
+
+class IterJsonArrayTests(SimpleTestCase):
+    def test_yields_the_items_whatever_the_chunk_boundaries(self):
+        for text in (json.dumps(PAYLOAD), json.dumps(PAYLOAD, indent=2)):
+            for size in range(1, 12):
+                with self.subTest(size=size, indented="\n" in text):
+                    self.assertEqual(
+                        list(iter_json_array(_split_every(text, size))), PAYLOAD
+                    )
+
+    def test_numbers_split_across_chunks(self):
+        for chunks, expected in (
+            (["[1.", "5]"], [1.5]),
+            (["[1e", "5]"], [1e5]),
+            (["[1", "2, 3", "4]"], [12, 34]),
+            (["[-", "1 ", "]"], [-1]),
+            (["[1.5", "e-3", " ,2]"], [1.5e-3, 2]),
+            (["[tr", "ue, nu", "ll]"], [True, None]),
+        ):
+            with self.subTest(chunks=chunks):
+                self.assertEqual(list(iter_json_array(chunks)), expected)
+
+    def test_strings_and_escapes_split_across_chunks(self):
+        chunks = ['["a\\', '"b", "\\u00', 'e9", "c', '"]']
+        self.assertEqual(list(iter_json_array(chunks)), ['a"b', "é", "c"])
+
+    def test_splits_between_items(self):
+        chunks = ["[1", ",", " ", "2", "", "]"]
+        self.assertEqual(list(iter_json_array(chunks)), [1, 2])
+
+    def test_empty_array(self):
+        for chunks in (["[]"], [" [ ", " ] "], ["[", "", "]"]):
+            with self.subTest(chunks=chunks):
+                self.assertEqual(list(iter_json_array(chunks)), [])
+
+    def test_malformed_input_raises(self):
+        for chunks in (
+            [],
+            ["{}"],
+            ['"a"'],
+            ["[1 2]"],
+            ["[1,", "2"],
+            ["[1", ".x]"],
+            ['["unterminated'],
+            ["[1,]"],
+        ):
+            with self.subTest(chunks=chunks):
+                with self.assertRaises(ValueError):
+                    list(iter_json_array(chunks))
+
+
+class FilesTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def test_atomic_write_moves_the_file_into_place_once_written(self):
+        path = self.directory / "nested" / "index.json"
+
+        with atomic_write(path, "w") as file:
+            file.write("new")
+            self.assertFalse(path.exists())
+
+        self.assertEqual(path.read_text(), "new")
+        self.assertEqual(os.listdir(path.parent), ["index.json"])
+
+    def test_atomic_write_leaves_the_file_alone_when_writing_fails(self):
+        path = self.directory / "index.json"
+        path.write_text("old")
+
+        with self.assertRaises(ValueError):
+            with atomic_write(path, "w") as file:
+                file.write("half")
+                raise ValueError
+
+        self.assertEqual(path.read_text(), "old")
+        self.assertEqual(os.listdir(self.directory), ["index.json"])
+
+    def test_file_cache_loads_again_once_the_file_changes(self):
+        path = self.directory / "index.json"
+        loads = []
+        cache = FileCache(lambda path: loads.append(path) or path.read_text())
+
+        self.assertIsNone(cache.get(path))
+        path.write_text("first")
+        self.assertEqual(cache.get(path), "first")
+        self.assertEqual(cache.get(path), "first")
+        path.write_text("second")
+        os.utime(path, (0, 0))
+        self.assertEqual(cache.get(path), "second")
+        self.assertEqual(loads, [path, path])
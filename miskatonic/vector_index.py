@@ -0,0 +1,152 @@
+from pathlib import Path
+
+import numpy as np
+
+# Rows scored against the centroids at once while clustering
+ASSIGNMENT_BATCH_SIZE = 65536
+INDEX_ARRAYS = ["ids", "vectors", "centroids", "offsets", "id_order"]
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scales rows to unit length so dot products are cosine similarities"""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return (vectors / np.maximum(norms, np.finfo(np.float32).tiny)).astype(np.float32)
+
+
+def _nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.concatenate(
+        [
+            np.argmax(
+                vectors[start : start + ASSIGNMENT_BATCH_SIZE] @ centroids.T, axis=1
+            )
+            for start in range(0, len(vectors), ASSIGNMENT_BATCH_SIZE)
+        ]
+        or [np.empty(0, dtype=np.int64)]
+    )
+
+
+def spherical_kmeans(
+    vectors: np.ndarray, clusters: int, iterations: int, seed: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Unit length centroids of unit length vectors, and each vector's cluster"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)]
+    for _ in range(iterations):
+        assignments = _nearest_centroids(vectors, centroids)
+        sums = np.stack(
+            [
+                np.bincount(assignments, weights=column, minlength=clusters)
+                for column in vectors.T
+            ],
+            axis=1,
+        )
+        # Clusters that lost all their vectors restart from a random vector
+        empty = ~np.bincount(assignments, minlength=clusters).astype(bool)
+        sums[empty] = vectors[rng.choice(len(vectors), empty.sum(), replace=False)]
+        centroids = normalize(sums)
+    return centroids, _nearest_centroids(vectors, centroids)
+
+
+class VectorIndex:
+    """
+    Approximate nearest neighbour search by cosine similarity over an inverted file.
+
+    Vectors are clustered with spherical k-means and stored grouped by cluster, so a
+    query scores the centroids and then only the vectors of the nprobe closest
+    clusters, which are contiguous slices of the (memory-mapped) vector array.
+    """
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        vectors: np.ndarray,
+        centroids: np.ndarray,
+        offsets: np.ndarray,
+        id_order: np.ndarray,
+    ):
+        # ids and vectors are in cluster order, offsets[c]:offsets[c + 1] is cluster c
+        self.ids = ids
+        self.vectors = vectors
+        self.centroids = centroids
+        self.offsets = offsets
+        # ids[id_order] is sorted, for looking up rows by id
+        self.id_order = id_order
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(
+        cls,
+        ids: np.ndarray,
+        vectors: np.ndarray,
+        clusters: int | None = None,
+        iterations: int = 20,
+        seed: int = 0,
+    ) -> "VectorIndex":
+        vectors = normalize(vectors)
+        clusters = min(clusters or max(1, round(np.sqrt(len(vectors)))), len(vectors))
+        if not clusters:
+            centroids = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+            assignments = np.empty(0, dtype=np.int64)
+        else:
+            centroids, assignments = spherical_kmeans(
+                vectors, clusters, iterations, seed
+            )
+        order = np.argsort(assignments, kind="stable")
+        offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assignments, minlength=len(centroids)))
+        ids = np.asarray(ids)[order]
+        return cls(
+            ids=ids,
+            vectors=vectors[order],
+            centroids=centroids,
+            offsets=offsets,
+            id_order=np.argsort(ids, kind="stable"),
+        )
+
+    def save(self, directory: Path, prefix: str) -> None:
+        for name in INDEX_ARRAYS:
+            np.save(directory / f"{prefix}.{name}.npy", getattr(self, name))
+
+    @classmethod
+    def load(cls, directory: Path, prefix: str) -> "VectorIndex":
+        return cls(
+            **{
+                name: np.load(directory / f"{prefix}.{name}.npy", mmap_mode="r")
+                for name in INDEX_ARRAYS
+            }
+        )
+
+    def _row(self, item_id) -> int | None:
+        position = np.searchsorted(self.ids, item_id, sorter=self.id_order)
+        if position == len(self.ids):
+            return None
+        row = int(self.id_order[position])
+        return row if self.ids[row] == item_id else None
+
+    def vector(self, item_id) -> np.ndarray | None:
+        if (row := self._row(item_id)) is None:
+            return None
+        return np.asarray(self.vectors[row])
+
+    def search(
+        self, query: np.ndarray, k: int = 10, nprobe: int = 8, exclude=None
+    ) -> list[tuple]:
+        """Up to k (id, similarity) pairs closest to query, best first"""
+        if not len(self.ids):
+            return []
+        query = normalize(np.asarray(query, dtype=np.float32))
+        nprobe = min(nprobe, len(self.centroids))
+        probed = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        rows = np.concatenate(
+            [np.arange(self.offsets[c], self.offsets[c + 1]) for c in probed]
+        )
+        if exclude is not None and (excluded := self._row(exclude)) is not None:
+            rows = rows[rows != excluded]
+        if not len(rows):
+            return []
+        scores = self.vectors[rows] @ query
+        top = np.argpartition(-scores, min(k, len(rows)) - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return list(zip(self.ids[rows[top]].tolist(), scores[top].tolist()))